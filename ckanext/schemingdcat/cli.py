@@ -5,6 +5,11 @@ from __future__ import print_function
 import ckantoolkit as tk
 import click
 import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import requests
 
 import ckanext.schemingdcat.utils as utils
@@ -399,3 +404,171 @@ def update_stats(verbose):
     except Exception as e:
         log.error(f"An error occurred while updating the statistics table: {e}")
         raise click.ClickException(f"Failed to update statistics table: {e}")
+
+
+def _close_database_connections():
+    """
+    Closes the pooled database connections, so the forked search-index workers open their own ones.
+    """
+    import ckan.model as ckan_model
+
+    ckan_model.Session.remove()
+    ckan_model.meta.engine.dispose()
+
+
+def _index_packages(package_ids, force=False):
+    """
+    Indexes a shard of datasets with a single Solr commit at the end.
+
+    The datasets are read with `package_show`, so the `before_dataset_index` hooks of the
+    plugins (e.g. the schemingdcat index transformations) are applied.
+
+    Args:
+        package_ids (list): The ids of the datasets to index.
+        force (bool, optional): Continue with the rest of the shard if a dataset fails. Defaults to False.
+
+    Returns:
+        tuple: The number of indexed datasets and the list of (id, error) of the failed ones.
+    """
+    import ckan.model as ckan_model
+    from ckan.lib import search
+
+    package_index = search.index_for(ckan_model.Package)
+    context = {'model': ckan_model, 'ignore_auth': True, 'validate': False, 'use_cache': False}
+
+    indexed, errors = 0, []
+    try:
+        for package_id in package_ids:
+            try:
+                package_dict = tk.get_action('package_show')(dict(context), {'id': package_id})
+                package_index.update_dict(package_dict, defer_commit=True)
+                indexed += 1
+            except Exception as e:
+                if not force:
+                    raise
+                errors.append((package_id, str(e)))
+        search.commit()
+    finally:
+        ckan_model.Session.remove()
+
+    return indexed, errors
+
+
+def _get_indexed_package_ids(package_ids, batch_size=sdct_config.SEARCH_INDEX_SHARD_SIZE):
+    """
+    Returns the ids of the given datasets that are in the search index of this site.
+
+    Solr is queried for the candidate ids only, `batch_size` ids per query.
+
+    Args:
+        package_ids (list): The dataset ids.
+        batch_size (int, optional): Number of ids per query. Defaults to SEARCH_INDEX_SHARD_SIZE.
+
+    Returns:
+        set: The indexed dataset ids.
+    """
+    from ckan.lib import search
+
+    conn = search.make_connection()
+    site_id = tk.config.get('ckan.site_id')
+    indexed_ids = set()
+    for i in range(0, len(package_ids), batch_size):
+        batch = package_ids[i:i + batch_size]
+        ids_query = ' OR '.join('"{0}"'.format(package_id) for package_id in batch)
+        results = conn.search(
+            q='*:*',
+            fq=['+site_id:"{0}"'.format(site_id), '+entity_type:package', '+id:({0})'.format(ids_query)],
+            fl='id',
+            rows=len(batch),
+        )
+        indexed_ids.update(doc['id'] for doc in results.docs)
+
+    return indexed_ids
+
+
+def _get_package_ids_to_index(since=None, only_missing=False):
+    """
+    Returns the ids of the datasets to index.
+
+    Args:
+        since (datetime, optional): Only the datasets modified since (metadata_modified). Defaults to None.
+        only_missing (bool, optional): Only the datasets that are not in the search index. Defaults to False.
+
+    Returns:
+        list: The dataset ids.
+    """
+    import ckan.model as ckan_model
+
+    query = ckan_model.Session.query(ckan_model.Package.id) \
+        .filter(ckan_model.Package.state != 'deleted')
+    if since is not None:
+        query = query.filter(ckan_model.Package.metadata_modified >= since)
+    package_ids = [package_id for package_id, in query.order_by(ckan_model.Package.id)]
+
+    if only_missing and package_ids:
+        indexed_ids = _get_indexed_package_ids(package_ids)
+        package_ids = [package_id for package_id in package_ids if package_id not in indexed_ids]
+
+    return package_ids
+
+
+@schemingdcat.command('search-index')
+@click.option('-s', '--since', type=click.DateTime(), default=None, help='Only index the datasets modified (metadata_modified) since this date.')
+@click.option('-o', '--only-missing', is_flag=True, help='Only index the datasets that are not in the search index.')
+@click.option('-w', '--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help='Number of worker processes.')
+@click.option('-b', '--shard-size', type=click.IntRange(min=1), default=sdct_config.SEARCH_INDEX_SHARD_SIZE, show_default=True, help='Datasets indexed (and committed) by each worker task.')
+@click.option('-f', '--force', is_flag=True, help='Continue if a dataset can not be indexed.')
+def search_index(since, only_missing, workers, shard_size, force):
+    """
+    Rebuilds the search index of the datasets in parallel.
+
+    The dataset ids are split into shards that are indexed by a pool of worker processes,
+    with a single Solr commit per shard. The datasets are read with `package_show`, so the
+    `before_dataset_index` hooks (the schemingdcat index transformations) are applied as in
+    `ckan search-index rebuild`.
+
+    Args:
+        since (datetime): Only index the datasets modified since this date.
+        only_missing (bool): Only index the datasets that are not in the search index.
+        workers (int): Number of worker processes.
+        shard_size (int): Datasets indexed by each worker task.
+        force (bool): Continue if a dataset can not be indexed.
+
+    Returns:
+        None
+    """
+    package_ids = _get_package_ids_to_index(since, only_missing)
+    if not package_ids:
+        click.secho('No datasets to index.', fg=u'green')
+        return
+
+    shards = [package_ids[i:i + shard_size] for i in range(0, len(package_ids), shard_size)]
+    workers = min(workers, len(shards))
+    log.info('Indexing %s datasets in %s shards with %s workers...', len(package_ids), len(shards), workers)
+
+    start = time.perf_counter()
+    indexed, errors = 0, []
+    # Fork, so the workers inherit the loaded CKAN config and plugins, but not the database connections
+    _close_database_connections()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = [executor.submit(_index_packages, shard, force) for shard in shards]
+        try:
+            for future in as_completed(futures):
+                shard_indexed, shard_errors = future.result()
+                indexed += shard_indexed
+                errors.extend(shard_errors)
+                elapsed = time.perf_counter() - start
+                log.info('Indexed %s/%s datasets (%.1f datasets/s)', indexed, len(package_ids), indexed / elapsed if elapsed else 0)
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            raise click.ClickException(f'Failed to index the datasets: {e}')
+
+    for package_id, error in errors:
+        log.error('Error indexing dataset %s: %s', package_id, error)
+
+    elapsed = time.perf_counter() - start
+    click.secho(
+        f'Indexed {indexed} datasets in {elapsed:.1f} s ({indexed / elapsed if elapsed else 0:.1f} datasets/s), {len(errors)} errors.',
+        fg=u'green' if not errors else u'yellow'
+    )
@@ -25,6 +25,34 @@ __all__ = [
     'URL_FIELD_NAMES',
     'EMAIL_FIELD_NAMES',
     'XLS_HARVESTER_FIELDS_NOT_LIST',
+    'REMOTE_FILE_CHUNK_SIZE',
+    'REMOTE_FILE_SPOOL_MAX_SIZE',
+    'REMOTE_FILE_MAX_SIZE',
+    'REMOTE_FILE_TIMEOUT',
+    'REMOTE_VALIDATORS_STATE_KEY',
+    'SQL_WATERMARKS_STATE_KEY',
+    'CONTENT_HASH_EXTRA_KEY',
+    'DEFERRED_INDEX_EXTRA_KEY',
+    'HARVEST_OBJECTS_BATCH_SIZE',
+    'NAME_ALLOCATOR_BATCH_SIZE',
+    'HARVEST_JOB_CONTEXT_CACHE_SIZE',
+    'FORMAT_PROBE_TIMEOUT',
+    'FORMAT_PROBE_MAX_WORKERS',
+    'FORMAT_PROBE_BUDGET',
+    'FORMAT_PROBE_CACHE_TTL',
+    'FORMAT_PROBE_FAILED_TTL',
+    'FORMAT_PROBE_MEMORY_CACHE_SIZE',
+    'CKAN_HARVESTER_SEARCH_ROWS',
+    'CKAN_HARVESTER_SEARCH_MAX_ROWS',
+    'CKAN_HARVESTER_SEARCH_MAX_WORKERS',
+    'SQL_FETCH_SIZE',
+    'SQL_POOL_MIN_CONNECTIONS',
+    'SQL_POOL_MAX_CONNECTIONS',
+    'SQL_STATEMENT_TIMEOUT',
+    'SQL_CONNECT_BACKOFF',
+    'SQL_CONNECT_MAX_BACKOFF',
+    'SQLITE_MMAP_SIZE',
+    'SQLITE_CACHE_SIZE',
 
     # From metadata.py
     'OGC2CKAN_HARVESTER_MD_CONFIG',
@@ -65,7 +93,10 @@ __all__ = [
     'INVALID_CHARS',
     'TAGS_NORMALIZE_PATTERN',
     'ACCENT_MAP',
-    'COMMON_DATE_FORMATS'
+    'COMMON_DATE_FORMATS',
+    'SEARCH_INDEX_SHARD_SIZE',
+    'MEMBER_CAPACITY_CACHE_TTL',
+    'MEMBER_CAPACITY_CACHE_SIZE',
     
     # From harvest_csw.py
     'XLST_MAPPINGS_DIR',
@@ -99,6 +130,15 @@ __all__ = [
     'CQL_QUERY_DEFAULT',
     'CQL_SEARCH_TERM_DEFAULT',
     'OUTPUT_SCHEMA',
+    'CSW_PAGING_MAX_WORKERS',
+    'CSW_IDENTIFIERS_MAXRECORDS',
+    'CSW_MODIFIED_PROPERTY',
+    'CSW_QUERYABLE_PATTERN',
+    'CSW_INCREMENTAL_OVERLAP',
+    'CSW_EXTRACTION_CHUNKSIZE',
+    'XSLT_CACHE_DIR',
+    'XSLT_CACHE_TTL',
+    'XSLT_DOWNLOAD_TIMEOUT',
     'INSPIRE_HVD_CATEGORY',
     'INSPIRE_HVD_APPLICABLE_LEGISLATION',
 ]
\ No newline at end of file
@@ -44,4 +44,61 @@ URL_FIELD_NAMES = {
 EMAIL_FIELD_NAMES = ['publisher_email', 'maintainer_email', 'author_email', ]
 
 # Fields to be explicit excluded from the harvester list parser because they are not lists
-XLS_HARVESTER_FIELDS_NOT_LIST = ['access_rights']
\ No newline at end of file
+XLS_HARVESTER_FIELDS_NOT_LIST = ['access_rights']
+# Remote file downloads for harvesters.base._download_remote_file()
+REMOTE_FILE_CHUNK_SIZE = 1024 * 1024
+# Files up to this size are kept in memory, larger ones spill to a temporary file
+REMOTE_FILE_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+# Hard limit for a single remote file, downloads above it are aborted
+REMOTE_FILE_MAX_SIZE = 512 * 1024 * 1024
+REMOTE_FILE_TIMEOUT = 60
+
+# Harvest source state key of the remote validators (ETag, Last-Modified, SHA-256)
+REMOTE_VALIDATORS_STATE_KEY = 'remote_validators'
+SQL_WATERMARKS_STATE_KEY = 'sql_watermarks'
+
+# Harvest object extra with the SHA-256 of the gathered dataset, used to skip unchanged datasets
+CONTENT_HASH_EXTRA_KEY = 'content_hash'
+
+# Harvest object extra marking the objects imported in batch mode whose package is not indexed yet
+DEFERRED_INDEX_EXTRA_KEY = 'schemingdcat_deferred_index'
+
+# Number of rows per INSERT/UPDATE statement of harvesters.base._save_harvest_objects()
+HARVEST_OBJECTS_BATCH_SIZE = 1000
+
+# Number of name prefixes per query of lib.name_allocator.NameAllocator.preload()
+NAME_ALLOCATOR_BATCH_SIZE = 500
+
+# Number of harvest job contexts kept by each harvester process
+HARVEST_JOB_CONTEXT_CACHE_SIZE = 16
+
+# Resource format probing, see lib.format_prober.FormatProber
+# (connect, read) timeout of each HEAD request
+FORMAT_PROBE_TIMEOUT = (5, 10)
+FORMAT_PROBE_MAX_WORKERS = 8
+# Maximum seconds spent probing the resources of a dataset, the rest fall back to mimetypes
+FORMAT_PROBE_BUDGET = 30
+# Seconds a probed Content-Type is reused (7 days)
+FORMAT_PROBE_CACHE_TTL = 7 * 24 * 60 * 60
+# Seconds a failed probe is not retried
+FORMAT_PROBE_FAILED_TTL = 60 * 60
+FORMAT_PROBE_MEMORY_CACHE_SIZE = 10000
+
+# Remote CKAN harvester package_search paging
+CKAN_HARVESTER_SEARCH_ROWS = 100
+# Default ckan.search.rows_max of CKAN
+CKAN_HARVESTER_SEARCH_MAX_ROWS = 1000
+CKAN_HARVESTER_SEARCH_MAX_WORKERS = 8
+
+# Rows fetched at a time from the server-side cursor of the SQL harvesters
+SQL_FETCH_SIZE = 10000
+# PostgreSQL harvester connection pools (per connection URL) and retries
+SQL_POOL_MIN_CONNECTIONS = 1
+SQL_POOL_MAX_CONNECTIONS = 4
+SQL_STATEMENT_TIMEOUT = 600  # seconds
+SQL_CONNECT_BACKOFF = 1  # seconds, doubled after each failed try
+SQL_CONNECT_MAX_BACKOFF = 30  # seconds
+
+# SQLite harvester memory-mapped I/O and page cache (bytes)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE = 64 * 1024 * 1024
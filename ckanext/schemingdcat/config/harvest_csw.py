@@ -1,4 +1,6 @@
 import os
+import re
+import tempfile
 
 # Define the base directory of the repository dynamically
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
@@ -7,12 +9,27 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
 XLST_MAPPINGS_DIR = os.path.join(BASE_DIR, 'ckanext/schemingdcat/lib/csw_mapper/xslt/mappings')
 # GeoDCAT-AP official XSLT
 DEFAULT_XSLT_FILE = 'https://raw.githubusercontent.com/SEMICeu/iso-19139-to-dcat-ap/refs/heads/geodcat-ap-2.0.0/iso-19139-to-dcat-ap.xsl'
+# Local cache of remote XSLT stylesheets, if ckan.storage_path is not set (see xslt_transformer.get_xslt_cache_dir)
+XSLT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'schemingdcat_xslt')
+XSLT_CACHE_TTL = 86400  # seconds
+XSLT_DOWNLOAD_TIMEOUT = 30  # seconds
 
 # CSW processor configuration
 CSW_DEFAULT_LIMIT = None
 CQL_QUERY_DEFAULT = 'csw:AnyText'
 CQL_SEARCH_TERM_DEFAULT = None
 OUTPUT_SCHEMA = 'http://www.isotc211.org/2005/gmd'
+# GetRecords pages requested concurrently
+CSW_PAGING_MAX_WORKERS = 4
+# Records per page of the brief identifiers listing
+CSW_IDENTIFIERS_MAXRECORDS = 500
+# Incremental harvesting: queryable of the modification date and overlap (seconds) with the last job
+CSW_MODIFIED_PROPERTY = 'apiso:Modified'
+# Valid queryable names (optionally prefixed, e.g. apiso:Modified) for the raw CQL of the incremental mode
+CSW_QUERYABLE_PATTERN = re.compile(r'[A-Za-z_][\w.-]*(:[A-Za-z_][\w.-]*)?')
+CSW_INCREMENTAL_OVERLAP = 3600
+# Records sent at a time to each metadata extraction process
+CSW_EXTRACTION_CHUNKSIZE = 20
 
 # Define normalized protocol constants
 DOWNLOAD_PROTOCOL = "WWW:DOWNLOAD"
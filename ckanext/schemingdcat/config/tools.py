@@ -55,4 +55,11 @@ COMMON_DATE_FORMATS = [
     '%m/%d/%Y %H:%M:%S',  # Date with time
     '%Y-%m-%dT%H:%M:%S',  # ISO 8601 format
     '%Y-%m-%dT%H:%M:%SZ',  # ISO 8601 format with Zulu time indicator
-]
\ No newline at end of file
+]
+
+# Number of datasets indexed (and committed to Solr once) by each worker task of `ckan schemingdcat search-index`
+SEARCH_INDEX_SHARD_SIZE = 500
+
+# Organization capacities of the users used to show private fields (see lib.member_capacity)
+MEMBER_CAPACITY_CACHE_TTL = 60  # seconds
+MEMBER_CAPACITY_CACHE_SIZE = 10000
@@ -1,7 +1,27 @@
-from ckanext.schemingdcat.harvesters.base import SchemingDCATHarvester
-from ckanext.schemingdcat.harvesters.ckan import SchemingDCATCKANHarvester
-from ckanext.schemingdcat.harvesters.xls import SchemingDCATXLSHarvester
-from ckanext.schemingdcat.harvesters.sql.postgres import SchemingDCATPostgresHarvester
-from ckanext.schemingdcat.harvesters.csw import SchemingDCATCSWHarvester
+import importlib
 
-__all__ = ['SchemingDCATHarvester', 'SchemingDCATCKANHarvester', 'SchemingDCATXLSHarvester', 'SchemingDCATPostgresHarvester', 'SchemingDCATCSWHarvester']
\ No newline at end of file
+# The harvesters are imported on first access (PEP 562), so loading one harvester
+# entry point does not import the modules (and third-party dependencies) of the others.
+_HARVESTERS = {
+    'SchemingDCATHarvester': 'ckanext.schemingdcat.harvesters.base',
+    'SchemingDCATCKANHarvester': 'ckanext.schemingdcat.harvesters.ckan',
+    'SchemingDCATXLSHarvester': 'ckanext.schemingdcat.harvesters.xls',
+    'SchemingDCATPostgresHarvester': 'ckanext.schemingdcat.harvesters.sql.postgres',
+    'SchemingDCATSQLiteHarvester': 'ckanext.schemingdcat.harvesters.sql.sqlite',
+    'SchemingDCATCSWHarvester': 'ckanext.schemingdcat.harvesters.csw',
+}
+
+__all__ = ['SchemingDCATHarvester', 'SchemingDCATCKANHarvester', 'SchemingDCATXLSHarvester', 'SchemingDCATPostgresHarvester', 'SchemingDCATSQLiteHarvester', 'SchemingDCATCSWHarvester']
+
+
+def __getattr__(name):
+    if name not in _HARVESTERS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    harvester = getattr(importlib.import_module(_HARVESTERS[name]), name)
+    globals()[name] = harvester
+    return harvester
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,6 +1,9 @@
+import copy
 import logging
+import threading
 import uuid
-from functools import lru_cache
+from collections import OrderedDict
+from functools import lru_cache, wraps
 import json
 import os
 import re
@@ -9,14 +12,17 @@ from dateutil.parser import parse
 import six
 import hashlib
 import csv
+import tempfile
 
 import urllib.request
 from urllib.parse import urlparse
 from urllib.error import URLError, HTTPError
 import mimetypes
 import requests
+from sqlalchemy.orm import class_mapper
 
 import ckan.logic as logic
+from ckan.lib import search
 from ckan.model import Session
 from ckan.logic.schema import default_create_package_schema
 from ckan.lib.navl.validators import ignore_missing, ignore
@@ -26,8 +32,11 @@ from ckantoolkit import config
 
 from ckanext.harvest.harvesters import HarvesterBase
 from ckanext.harvest.logic.schema import unicode_safe
-from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
+from ckanext.harvest.model import HarvestObject, HarvestObjectExtra, HarvestObjectError, HarvestSource, HarvestJob
+from ckanext.schemingdcat.harvesters.model import HarvestSourceState
 from ckanext.schemingdcat.lib.field_mapping import FieldMappingValidator
+from ckanext.schemingdcat.lib.name_allocator import NameAllocator
+from ckanext.schemingdcat.lib.format_prober import get_format_prober
 from ckanext.schemingdcat.signals import schemingdcat_harvest_package_updated, schemingdcat_harvest_package_created
 
 from ckanext.schemingdcat.config import (
@@ -45,6 +54,15 @@ from ckanext.schemingdcat.config import (
     INVALID_CHARS,
     ACCENT_MAP,
     AUX_TAG_FIELDS,
+    REMOTE_FILE_CHUNK_SIZE,
+    REMOTE_FILE_SPOOL_MAX_SIZE,
+    REMOTE_FILE_MAX_SIZE,
+    REMOTE_FILE_TIMEOUT,
+    REMOTE_VALIDATORS_STATE_KEY,
+    CONTENT_HASH_EXTRA_KEY,
+    DEFERRED_INDEX_EXTRA_KEY,
+    HARVEST_OBJECTS_BATCH_SIZE,
+    HARVEST_JOB_CONTEXT_CACHE_SIZE,
     slugify_pat,
     field_mapping_extras_prefix,
     field_mapping_extras_prefix_symbol,
@@ -52,6 +70,146 @@ from ckanext.schemingdcat.config import (
 
 log = logging.getLogger(__name__)
 
+# Harvest job contexts of this process, by harvester class and job id (least recently used first)
+_harvest_job_contexts = OrderedDict()
+_harvest_job_contexts_lock = threading.Lock()
+
+
+def deferred_indexing(create_or_update_package):
+    """
+    Decorator for `_create_or_update_package` implementing the batch import mode.
+
+    If the `import_batch_size` option of the harvest source is set, the package is created or
+    updated with the `defer_commit` context and committed without indexing it (see
+    `SchemingDCATHarvester._commit_package`), and the harvest object is marked with the
+    DEFERRED_INDEX_EXTRA_KEY extra. Each fetch consumer indexes its touched packages with one
+    Solr commit every `import_batch_size` packages, and the packages left (the last batch of
+    each consumer) are indexed when the job is finished (see `index_finished_jobs_packages`).
+    """
+    @wraps(create_or_update_package)
+    def wrapper(self, package_dict, harvest_object, *args, **kwargs):
+        batch_size = self._get_import_batch_size()
+        if not batch_size:
+            return create_or_update_package(self, package_dict, harvest_object, *args, **kwargs)
+
+        if self._pending_index_ids is None:
+            self._pending_index_ids = []
+
+        result = None
+        try:
+            result = create_or_update_package(self, package_dict, harvest_object, *args, **kwargs)
+        finally:
+            if result is True and harvest_object.package_id:
+                self._defer_indexing(harvest_object)
+
+            if len(self._pending_index_ids) >= batch_size:
+                self._index_pending_packages()
+
+        return result
+
+    return wrapper
+
+
+def index_deferred_packages(harvest_object_ids):
+    """
+    Indexes the packages of harvest objects imported in batch mode with a single Solr commit.
+
+    The DEFERRED_INDEX_EXTRA_KEY extras of the objects are removed, and an indexing error is
+    saved as an import error of each object.
+
+    Args:
+        harvest_object_ids (list): The ids of the harvest objects.
+    """
+    if not harvest_object_ids:
+        return
+
+    harvest_objects = model.Session.query(HarvestObject) \
+        .filter(HarvestObject.id.in_(harvest_object_ids)) \
+        .all()
+    package_ids = list(dict.fromkeys(obj.package_id for obj in harvest_objects if obj.package_id))
+
+    try:
+        if package_ids:
+            search.rebuild(package_ids=package_ids, defer_commit=True)
+            search.commit()
+            log.info("Indexed %s harvested packages", len(package_ids))
+    except Exception as e:
+        log.error("Error indexing harvested packages %s: %s", package_ids, e)
+        for obj in harvest_objects:
+            HarvestObjectError(message='Error indexing the harvested package: {0}'.format(e), object=obj, stage='Import').save()
+    finally:
+        model.Session.query(HarvestObjectExtra) \
+            .filter(HarvestObjectExtra.harvest_object_id.in_(harvest_object_ids)) \
+            .filter(HarvestObjectExtra.key == DEFERRED_INDEX_EXTRA_KEY) \
+            .delete(synchronize_session=False)
+        model.Session.commit()
+
+
+def index_finished_jobs_packages():
+    """
+    Indexes the packages imported in batch mode by finished harvest jobs that are not indexed yet.
+
+    Called when the harvest jobs are run (`harvest_jobs_run`), which marks the jobs with no
+    objects left as finished.
+    """
+    harvest_object_ids = [
+        harvest_object_id for harvest_object_id, in
+        model.Session.query(HarvestObjectExtra.harvest_object_id)
+        .join(HarvestObject, HarvestObject.id == HarvestObjectExtra.harvest_object_id)
+        .join(HarvestJob, HarvestJob.id == HarvestObject.harvest_job_id)
+        .filter(HarvestObjectExtra.key == DEFERRED_INDEX_EXTRA_KEY)
+        .filter(HarvestJob.status == 'Finished')
+    ]
+
+    for i in range(0, len(harvest_object_ids), HARVEST_OBJECTS_BATCH_SIZE):
+        index_deferred_packages(harvest_object_ids[i:i + HARVEST_OBJECTS_BATCH_SIZE])
+
+
+class HarvestJobContext(object):
+    """
+    Values that are the same for all the harvest objects of a harvest job.
+
+    They are computed once per job by `SchemingDCATHarvester._get_harvest_job_context`
+    and reused by every `import_stage` call of the job.
+
+    Attributes:
+        harvest_job_id (str): The harvest job id.
+        config (dict): The parsed harvest source configuration.
+        owner_org (str): The organization of the harvest source.
+        site_user (dict): The site user.
+        local_schema (dict): The local dataset schema.
+        dataset_default_values (dict): Default dataset values from the config field mappings.
+        distribution_default_values (dict): Default distribution values from the config field mappings.
+        name_allocator (NameAllocator): The allocator of the names of the datasets created in the job.
+    """
+    def __init__(self, harvest_job_id, config, owner_org=None, site_user=None, local_schema=None,
+                 dataset_default_values=None, distribution_default_values=None, name_allocator=None):
+        self.harvest_job_id = harvest_job_id
+        self.config = config
+        self.owner_org = owner_org
+        self.site_user = site_user
+        self.local_schema = local_schema
+        self.dataset_default_values = dataset_default_values
+        self.distribution_default_values = distribution_default_values
+        self.name_allocator = name_allocator if name_allocator is not None else NameAllocator()
+
+    def copy(self):
+        """
+        Returns a copy of the context whose configuration and default values can be modified
+        without changing the cached context. The site user, local schema and name allocator
+        are shared.
+        """
+        return HarvestJobContext(
+            self.harvest_job_id,
+            copy.deepcopy(self.config),
+            owner_org=self.owner_org,
+            site_user=self.site_user,
+            local_schema=self.local_schema,
+            dataset_default_values=copy.deepcopy(self.dataset_default_values),
+            distribution_default_values=copy.deepcopy(self.distribution_default_values),
+            name_allocator=self.name_allocator,
+        )
+
 
 class SchemingDCATHarvester(HarvesterBase):
     """
@@ -73,6 +231,8 @@ class SchemingDCATHarvester(HarvesterBase):
     action_api_version = 3
     force_import = False
     _site_user = None
+    _harvest_job_context = None
+    _pending_index_ids = None
     _source_date_format = '%Y-%m-%d'
     _dataset_default_values = {}
     _distribution_default_values = {}
@@ -143,6 +303,178 @@ class SchemingDCATHarvester(HarvesterBase):
         else:
             self.config = {}
 
+    def _parse_source_config(self, harvest_source):
+        """
+        Returns the configuration of a harvest source, without setting it. Harvesters that
+        process the configuration in `_set_config` must override it.
+
+        Args:
+            harvest_source (HarvestSource): The harvest source.
+
+        Returns:
+            dict: The configuration.
+        """
+        return json.loads(harvest_source.config) if harvest_source.config else {}
+
+    def _get_harvest_job_context(self, harvest_job_id, harvest_source_id):
+        """
+        Returns the context of a harvest job, built once per job and process.
+
+        The last HARVEST_JOB_CONTEXT_CACHE_SIZE contexts are cached by harvester class and
+        job id. The harvester state is not modified, and a copy of the cached context is
+        returned (see `HarvestJobContext.copy`).
+
+        Args:
+            harvest_job_id (str): The harvest job id.
+            harvest_source_id (str): The harvest source id.
+
+        Returns:
+            HarvestJobContext: The harvest job context.
+        """
+        key = (type(self).__name__, harvest_job_id)
+        with _harvest_job_contexts_lock:
+            job_context = _harvest_job_contexts.get(key)
+            if job_context is not None:
+                _harvest_job_contexts.move_to_end(key)
+
+        if job_context is None:
+            job_context = self._build_harvest_job_context(harvest_job_id, harvest_source_id)
+            with _harvest_job_contexts_lock:
+                _harvest_job_contexts[key] = job_context
+                while len(_harvest_job_contexts) > HARVEST_JOB_CONTEXT_CACHE_SIZE:
+                    _harvest_job_contexts.popitem(last=False)
+
+        return job_context.copy()
+
+    def _build_harvest_job_context(self, harvest_job_id, harvest_source_id):
+        """
+        Builds the context of a harvest job, without modifying the harvester state.
+
+        Args:
+            harvest_job_id (str): The harvest job id.
+            harvest_source_id (str): The harvest source id.
+
+        Returns:
+            HarvestJobContext: The harvest job context.
+        """
+        harvest_source = HarvestSource.get(harvest_source_id)
+        config = self._parse_source_config(harvest_source)
+
+        source_dataset = model.Package.get(harvest_source_id)
+        owner_org = source_dataset.owner_org if source_dataset else None
+
+        site_user = p.toolkit.get_action("get_site_user")(
+            {"model": model, "ignore_auth": True}, {}
+        )
+
+        # Default values from the config field mappings
+        try:
+            dataset_default_values, distribution_default_values = self._get_default_values({
+                "dataset_field_mapping": self._standardize_field_mapping(config.get("dataset_field_mapping")),
+                "distribution_field_mapping": self._standardize_field_mapping(config.get("distribution_field_mapping")),
+            })
+        except Exception as e:
+            # Computed (and reported) again for each dataset
+            log.warning("Error generating default values from config field mappings: %s", e)
+            dataset_default_values = distribution_default_values = None
+
+        log.debug("Harvest job context created for job: %s", harvest_job_id)
+
+        return HarvestJobContext(
+            harvest_job_id,
+            config,
+            owner_org=owner_org,
+            site_user=site_user,
+            local_schema=self._get_local_schema(),
+            dataset_default_values=dataset_default_values,
+            distribution_default_values=distribution_default_values,
+        )
+
+    def _set_harvest_job_context(self, harvest_object):
+        """
+        Sets the configuration, local schema and site user of the harvester from the
+        context of the harvest job of the object.
+
+        Args:
+            harvest_object (HarvestObject): The harvest object to import.
+
+        Returns:
+            HarvestJobContext: The harvest job context.
+        """
+        job_context = self._get_harvest_job_context(
+            harvest_object.harvest_job_id, harvest_object.harvest_source_id
+        )
+        self.config = job_context.config
+        self.api_version = int(self.config.get("api_version", self.api_version))
+        self._local_schema = job_context.local_schema
+        self._site_user = job_context.site_user
+        self._harvest_job_context = job_context
+
+        return job_context
+
+    def _get_name_allocator(self):
+        """
+        Returns the name allocator of the current harvest job, so the names handed out
+        to the datasets created in the job are known by the next import stages.
+        """
+        if self._harvest_job_context is None:
+            return NameAllocator()
+
+        return self._harvest_job_context.name_allocator
+
+    def _get_import_batch_size(self):
+        """
+        Returns the `import_batch_size` option of the harvest source, 0 if the batch import mode is disabled.
+        """
+        if not self.config:
+            return 0
+
+        try:
+            return max(int(self.config.get("import_batch_size", 0)), 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _commit_package(self, context):
+        """
+        Commits the package created or updated by `_create_or_update_package`.
+
+        With the `defer_commit` context the package actions neither commit nor index the
+        package. The changes are flushed and the objects recorded by CKAN to notify the
+        search index on commit (`IDomainObjectModification`) are discarded, so only this
+        session skips the indexing.
+
+        Args:
+            context (dict): The context of the package action.
+        """
+        if context.get("defer_commit"):
+            session = model.Session()
+            session.flush()
+            if hasattr(session, "_object_cache"):
+                del session._object_cache
+
+        model.Session.commit()
+
+    def _defer_indexing(self, harvest_object):
+        """
+        Marks the harvest object as imported in batch mode, so its package is indexed with the
+        batch of this consumer or, if the batch is not completed, when the job is finished.
+        """
+        self._pending_index_ids.append(harvest_object.id)
+        model.Session.add(HarvestObjectExtra(
+            harvest_object_id=harvest_object.id,
+            key=DEFERRED_INDEX_EXTRA_KEY,
+            value=harvest_object.package_id,
+        ))
+        model.Session.commit()
+
+    def _index_pending_packages(self):
+        """
+        Indexes the packages imported in batch mode by this consumer with a single Solr commit.
+        """
+        harvest_object_ids = list(dict.fromkeys(self._pending_index_ids))
+        self._pending_index_ids = []
+        index_deferred_packages(harvest_object_ids)
+
     def _set_basic_validate_config(self, config):
         """
         Validates and sets the basic configuration for the harvester.
@@ -209,6 +541,11 @@ class SchemingDCATHarvester(HarvesterBase):
                 if not isinstance(config_obj["default_extras"], dict):
                     raise ValueError("default_extras must be a dictionary")
 
+            if "import_batch_size" in config_obj:
+                import_batch_size = config_obj["import_batch_size"]
+                if isinstance(import_batch_size, bool) or not isinstance(import_batch_size, int) or import_batch_size < 0:
+                    raise ValueError("import_batch_size must be a non-negative integer")
+
             if "user" in config_obj:
                 # Check if user exists
                 context = {"model": model, "user": p.toolkit.c.user}
@@ -979,6 +1316,92 @@ class SchemingDCATHarvester(HarvesterBase):
 
         return True
 
+    @staticmethod
+    def _strip_object_columns(data):
+        """
+        Trims the leading/trailing whitespaces of the text (object) columns of a DataFrame, in place.
+
+        Each column is stripped with a single vectorised `Series.str.strip()`, so (as before) the
+        values of those columns that are not strings become NaN.
+
+        Args:
+            data (pandas.DataFrame): The table to clean.
+
+        Returns:
+            pandas.DataFrame: The same table.
+        """
+        # Positions, so tables with duplicated column names are also cleaned
+        for position, dtype in enumerate(data.dtypes.values):
+            if dtype == object:
+                data.isetitem(position, data.iloc[:, position].str.strip())
+
+        return data
+
+    @staticmethod
+    def _group_records(data, key_colname):
+        """
+        Converts a table to records grouped by the value of a column.
+
+        The table is converted to dicts once and the groups are built from the row positions
+        of `groupby().indices`, instead of converting each group to a DataFrame and then to dicts.
+
+        Args:
+            data (pandas.DataFrame): The table to group.
+            key_colname (str): The column with the key of the groups.
+
+        Returns:
+            dict: The list of records of each key, in the order of the table.
+        """
+        records = data.to_dict('records')
+        return {
+            key: [records[position] for position in positions]
+            for key, positions in data.groupby(key_colname, sort=False).indices.items()
+        }
+
+    def _add_distributions_and_datadictionaries_to_datasets(self, table_datasets, table_distributions_grouped, table_datadictionaries_grouped, identifier_field='identifier', alternate_identifier_field='alternate_identifier', inspire_id_field='inspire_id', datadictionary_id_field="id"):
+        """
+        Add distributions (CKAN resources) and datadictionaries to each dataset object.
+
+        The records are the ones just created by the cleaning of the tables, so they are updated
+        in a single pass: the datadictionaries are added to each distribution once, and the
+        distributions of each dataset are looked up by its identifier.
+
+        Args:
+            table_datasets (list): List of dataset objects.
+            table_distributions_grouped (dict): Dictionary of distributions grouped by dataset identifier.
+            table_datadictionaries_grouped (dict): Dictionary of datadictionaries grouped by distribution identifier.
+            identifier_field (str, optional): Field name for the identifier. Defaults to 'identifier'.
+            alternate_identifier_field (str, optional): Field name for the alternate identifier. Defaults to 'alternate_identifier'.
+            inspire_id_field (str, optional): Field name for the inspire id. Defaults to 'inspire_id'.
+            datadictionary_id_field (str, optional): Field name for the datadictionary id. Defaults to 'id'.
+
+        Returns:
+            list: List of dataset objects with distributions (CKAN resources) and datadictionaries added.
+
+        Notes:
+            If 'dataset_id_field' is specified in the Harvester configuration, it will be used as the primary identifier field.
+            Otherwise, the function will fall back to using 'identifier_field', 'alternate_identifier_field', and 'inspire_id_field' in that order.
+        """
+        try:
+            dataset_id_field = self.config.get('dataset_id_field', None) if self.config else None
+            table_distributions_grouped = table_distributions_grouped or {}
+
+            for distributions in table_distributions_grouped.values():
+                for distribution in distributions:
+                    distribution['datadictionaries'] = table_datadictionaries_grouped.get(distribution[datadictionary_id_field], []) if table_datadictionaries_grouped else []
+
+            for dataset in table_datasets:
+                if dataset_id_field:
+                    dataset_id = dataset.get(dataset_id_field)
+                else:
+                    dataset_id = dataset.get(identifier_field) or dataset.get(alternate_identifier_field) or dataset.get(inspire_id_field)
+                dataset['resources'] = list(table_distributions_grouped.get(dataset_id, []))
+
+            return table_datasets
+        except Exception as e:
+            log.error("Error while adding distributions and datadictionaries to datasets: %s", str(e))
+            raise
+
     def _clean_extras(self, dataset_dict, keys_to_clean):
         """
         Remove specified keys from extras and move their values to dataset_dict.
@@ -1114,6 +1537,362 @@ class SchemingDCATHarvester(HarvesterBase):
 
         return True
 
+    def _download_remote_file(self, url, validators=None, max_size=REMOTE_FILE_MAX_SIZE, spool_max_size=REMOTE_FILE_SPOOL_MAX_SIZE, timeout=REMOTE_FILE_TIMEOUT, ssl_verify=True):
+        """
+        Downloads a remote file once into a bounded temporary buffer.
+
+        The content is streamed in chunks into a `SpooledTemporaryFile`, so small files
+        stay in memory and larger ones spill to disk. Downloads bigger than `max_size`
+        are aborted.
+
+        If `validators` from a previous download are provided, the request is sent as a
+        conditional request (`If-None-Match`/`If-Modified-Since`) and the SHA-256 of the
+        payload is compared with the stored one.
+
+        Args:
+            url (str): The URL of the remote file.
+            validators (dict, optional): The `etag`, `last_modified` and `sha256` of a previous download.
+            max_size (int, optional): Maximum size in bytes of the remote file.
+            spool_max_size (int, optional): Size in bytes kept in memory before spilling to disk.
+            timeout (int, optional): Timeout in seconds for the connection and each read.
+            ssl_verify (bool, optional): Whether to verify the SSL certificate. Defaults to True.
+
+        Returns:
+            tuple: The buffer with the file content, positioned at the start, and the validators
+                of the response. The buffer is None if the remote file has not been modified.
+                The caller is responsible for closing it.
+
+        Raises:
+            RemoteResourceError: If the file cannot be downloaded or exceeds `max_size`.
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout, verify=ssl_verify) as response:
+                if response.status_code == 304:
+                    log.debug("Remote file %s not modified", url)
+                    buffer.close()
+                    return None, validators
+
+                response.raise_for_status()
+                response_validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+                for chunk in response.iter_content(chunk_size=REMOTE_FILE_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise RemoteResourceError(
+                            f"Remote file {url} exceeds the maximum size of {max_size} bytes"
+                        )
+                    sha256.update(chunk)
+                    buffer.write(chunk)
+
+        except requests.exceptions.RequestException as e:
+            buffer.close()
+            raise RemoteResourceError(f"Could not download remote file {url}: {e}")
+        except RemoteResourceError:
+            buffer.close()
+            raise
+
+        response_validators['sha256'] = sha256.hexdigest()
+        log.debug("Downloaded %s bytes from %s", size, url)
+
+        if validators.get('sha256') == response_validators['sha256']:
+            log.debug("Remote file %s unchanged (same SHA-256)", url)
+            buffer.close()
+            return None, response_validators
+
+        buffer.seek(0)
+
+        return buffer, response_validators
+
+    @staticmethod
+    def _get_source_hash(harvest_source):
+        """
+        Returns a SHA-256 of the harvest source URL and configuration.
+
+        Args:
+            harvest_source (HarvestSource): The harvest source.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        source = f"{harvest_source.url}\n{harvest_source.config or ''}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _get_remote_validators(self, harvest_job):
+        """
+        Retrieves the validators (ETag, Last-Modified, SHA-256) of the remote source stored by
+        the last error-free job of the harvest source.
+
+        Validators are ignored if `force_all` is set, if the harvest source URL or configuration
+        changed, or if the job that stored them is not the last error-free job.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+
+        Returns:
+            dict or None: The stored validators, or None if the source must be fully fetched.
+        """
+        if self.config and self.config.get("force_all", False):
+            return None
+
+        state = HarvestSourceState.get(harvest_job.source.id, REMOTE_VALIDATORS_STATE_KEY)
+        if not state:
+            return None
+
+        if state.get("source_hash") != self._get_source_hash(harvest_job.source):
+            log.debug("Harvest source URL or config changed, ignoring remote validators")
+            return None
+
+        last_error_free_job = self.last_error_free_job(harvest_job)
+        if not last_error_free_job or state.get("harvest_job_id") != last_error_free_job.id:
+            log.debug("Remote validators were not stored by the last error-free job, ignoring them")
+            return None
+
+        return state.get("validators")
+
+    def _save_remote_validators(self, harvest_job, validators):
+        """
+        Stores the validators of the remote source for the current harvest job.
+
+        They are only used by the next job if this one finishes without errors.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+            validators (dict): The validators of the remote source.
+        """
+        if not validators:
+            return
+
+        HarvestSourceState.set(
+            harvest_job.source.id,
+            REMOTE_VALIDATORS_STATE_KEY,
+            {
+                "harvest_job_id": harvest_job.id,
+                "source_hash": self._get_source_hash(harvest_job.source),
+                "validators": validators,
+            }
+        )
+
+    @classmethod
+    def _get_content_hash(cls, dataset, harvest_source):
+        """
+        Returns a canonical SHA-256 of a gathered dataset dict.
+
+        Keys are sorted so the hash does not depend on the order of the dict, and the
+        harvest source URL and configuration are included so a new configuration
+        (e.g. `default_extras`) updates all the datasets. The `name` is left out, as it
+        is generated from the title at gather time and gets a suffix if it is already taken.
+
+        Args:
+            dataset (dict): The cleaned dataset dict stored in the harvest object.
+            harvest_source (HarvestSource): The harvest source.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        dataset = {key: value for key, value in dataset.items() if key != "name"}
+        content = json.dumps(dataset, sort_keys=True, separators=(",", ":"), default=str)
+        sha256 = hashlib.sha256(cls._get_source_hash(harvest_source).encode("utf-8"))
+        sha256.update(content.encode("utf-8"))
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _get_current_content_hashes(harvest_source_id):
+        """
+        Retrieves the content hashes of the current, successfully imported, harvest objects of a source.
+
+        Args:
+            harvest_source_id (str): The harvest source id.
+
+        Returns:
+            dict: A dictionary mapping each GUID to its content hash.
+        """
+        query = model.Session.query(HarvestObject.guid, HarvestObjectExtra.value) \
+            .join(HarvestObjectExtra, HarvestObjectExtra.harvest_object_id == HarvestObject.id) \
+            .filter(HarvestObject.current == True) \
+            .filter(HarvestObject.state == "COMPLETE") \
+            .filter(HarvestObject.harvest_source_id == harvest_source_id) \
+            .filter(HarvestObjectExtra.key == CONTENT_HASH_EXTRA_KEY)
+
+        return {guid: content_hash for guid, content_hash in query}
+
+    def _get_changed_guids(self, harvest_job, change, datasets_to_harvest):
+        """
+        Hashes the gathered datasets and removes from the GUIDs to change the ones whose dataset
+        is identical to the one of the current harvest object.
+
+        All the GUIDs are considered changed if `force_all` is set.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+            change (set): The GUIDs in both the DB and the remote source.
+            datasets_to_harvest (dict): The gathered datasets, by GUID.
+
+        Returns:
+            tuple: The changed GUIDs (set) and the content hash of each gathered GUID (dict).
+        """
+        content_hashes = {guid: self._get_content_hash(dataset, harvest_job.source) for guid, dataset in datasets_to_harvest.items()}
+        if not change or (self.config and self.config.get("force_all", False)):
+            return change, content_hashes
+
+        current_hashes = self._get_current_content_hashes(harvest_job.source.id)
+        changed = {
+            guid for guid in change
+            if guid not in current_hashes or current_hashes[guid] != content_hashes.get(guid)
+        }
+        log.debug(f'unchanged ({len(change) - len(changed)})')
+
+        return changed, content_hashes
+
+    def _save_harvest_objects(self, harvest_job, harvest_objects, batch_size=HARVEST_OBJECTS_BATCH_SIZE):
+        """
+        Saves the harvest objects of the gather stage and their extras in a single transaction.
+
+        Objects and extras are inserted with batched statements instead of one `save()` (and
+        commit) per object. The objects of a deleted dataset are only flagged as not current
+        once its package is deleted in the import stage (see `_delete_package`).
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+            harvest_objects (list): A list of dicts with the keys `guid`, `status` ('new',
+                'change' or 'delete') and optionally `content`, `package_id` and `extras`
+                (a dict of extra keys and values).
+            batch_size (int, optional): The number of rows per statement. Defaults to HARVEST_OBJECTS_BATCH_SIZE.
+
+        Returns:
+            list: The ids of the harvest objects, in the same order.
+        """
+        harvest_object_table = class_mapper(HarvestObject).mapped_table
+        harvest_object_extra_table = class_mapper(HarvestObjectExtra).mapped_table
+        gathered = datetime.utcnow()
+
+        ids = []
+        object_rows = []
+        extra_rows = []
+        for harvest_object in harvest_objects:
+            object_id = str(uuid.uuid4())
+            ids.append(object_id)
+            object_rows.append({
+                "id": object_id,
+                "guid": harvest_object["guid"],
+                "current": False,
+                "gathered": gathered,
+                "content": harvest_object.get("content"),
+                "state": "WAITING",
+                "retry_times": 0,
+                "harvest_job_id": harvest_job.id,
+                "harvest_source_id": harvest_job.source.id,
+                "package_id": harvest_object.get("package_id"),
+            })
+
+            extras = {"status": harvest_object["status"]}
+            extras.update(harvest_object.get("extras") or {})
+            for key, value in extras.items():
+                extra_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "harvest_object_id": object_id,
+                    "key": key,
+                    "value": value,
+                })
+
+        try:
+            for i in range(0, len(object_rows), batch_size):
+                Session.execute(harvest_object_table.insert(), object_rows[i:i + batch_size])
+
+            for i in range(0, len(extra_rows), batch_size):
+                Session.execute(harvest_object_extra_table.insert(), extra_rows[i:i + batch_size])
+
+            Session.commit()
+        except Exception:
+            Session.rollback()
+            raise
+
+        log.debug("Saved %s harvest objects and %s extras", len(object_rows), len(extra_rows))
+
+        return ids
+
+    def _build_harvest_objects(self, new, change, delete, datasets_to_harvest, guid_to_package_id, content_hashes):
+        """
+        Builds the harvest objects of the gather stage (see `_save_harvest_objects`).
+
+        The objects to delete are only built if the `override_local_datasets` option is set, as
+        the import stage would not delete their packages otherwise.
+
+        Args:
+            new (set): The GUIDs of the datasets to create.
+            change (set): The GUIDs of the datasets to update.
+            delete (set): The GUIDs of the datasets no longer in the remote source.
+            datasets_to_harvest (dict): The gathered datasets, by GUID.
+            guid_to_package_id (dict): The package id of the GUIDs already harvested.
+            content_hashes (dict): The content hash of the gathered datasets, by GUID.
+
+        Returns:
+            list: The harvest objects dicts.
+        """
+        harvest_objects = []
+        for status, guids in (('new', new), ('change', change)):
+            for guid in guids:
+                dataset = datasets_to_harvest.get(guid)
+                if not dataset:
+                    log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
+                    continue
+
+                harvest_object = {
+                    'guid': guid,
+                    'status': status,
+                    'content': json.dumps(dataset),
+                    'extras': {CONTENT_HASH_EXTRA_KEY: content_hashes[guid]},
+                }
+                if status == 'change':
+                    harvest_object['package_id'] = guid_to_package_id[guid]
+                harvest_objects.append(harvest_object)
+
+        if self.config.get("override_local_datasets", False) is not True:
+            if delete:
+                log.info('The override_local_datasets configuration is not set. %s datasets no longer in the remote source are not deleted', len(delete))
+            return harvest_objects
+
+        # Datasets to delete are no longer in the remote source, so there is no content to store
+        for guid in delete:
+            harvest_objects.append({
+                'guid': guid,
+                'status': 'delete',
+                'package_id': guid_to_package_id[guid],
+            })
+
+        return harvest_objects
+
+    def _delete_package(self, harvest_object, context):
+        """
+        Deletes the package of a 'delete' harvest object, and then flags the harvest objects of
+        its GUID as not current.
+
+        Args:
+            harvest_object (HarvestObject): The 'delete' harvest object.
+            context (dict): The context of the `package_delete` action.
+        """
+        context.update({
+            'ignore_auth': True,
+        })
+        p.toolkit.get_action('package_delete')(context, {'id': harvest_object.package_id})
+
+        model.Session.query(HarvestObject) \
+            .filter(HarvestObject.harvest_source_id == harvest_object.harvest_source_id) \
+            .filter(HarvestObject.guid == harvest_object.guid) \
+            .update({'current': False}, synchronize_session=False)
+        model.Session.commit()
+
     # TODO: Implement this method
     def _load_datadictionaries(self, harvest_job, datadictionaries):
         return True
@@ -1343,10 +2122,10 @@ class SchemingDCATHarvester(HarvesterBase):
         """
         Infers the format and encoding of a file from its URL.
 
-        This function sends a HEAD request to the URL and checks the 'content-type'
-        header to determine the file's format and encoding. If the 'content-type'
-        header is not found or an exception occurs, it falls back to guessing the
-        format and encoding based on the URL's extension.
+        This function gets the 'content-type' header of the URL from the shared format
+        prober (cached, or with a HEAD request) to determine the file's format and
+        encoding. If the 'content-type' header is not found or an exception occurs,
+        it falls back to guessing the format and encoding based on the URL's extension.
 
         Args:
             url (str): The URL of the file.
@@ -1361,8 +2140,7 @@ class SchemingDCATHarvester(HarvesterBase):
             return None, None, None
 
         try:
-            response = requests.head(url, allow_redirects=True)
-            content_type = response.headers.get('content-type')
+            content_type = get_format_prober().get_content_type(url)
             if content_type:
                 mimetype, *encoding = content_type.split(';')
                 format = mimetype.split('/')[-1]
@@ -1450,6 +2228,26 @@ class SchemingDCATHarvester(HarvesterBase):
         a dictionary value that maps field names to their configurations, which may include 'languages'
         for multilingual fields and 'field_value' for default values.
       """
+      # Create default values for dataset and distribution
+      self._dataset_default_values, self._distribution_default_values = self._get_default_values(field_mappings)
+
+      # Log if there are no default values
+      if not self._dataset_default_values:
+        log.info('No default values for dataset.')
+      if not self._distribution_default_values:
+        log.info('No default values for distribution.')
+
+    @staticmethod
+    def _get_default_values(field_mappings):
+      """
+      Returns the default dataset and distribution values of the field mappings (see `create_default_values`).
+
+      Args:
+        field_mappings (dict): A dictionary with the "dataset_field_mapping" and "distribution_field_mapping".
+
+      Returns:
+        tuple: The dataset and distribution default values.
+      """
       def extract_default_values(field_mapping):
         default_values = {}
         for key, value in (field_mapping or {}).items():
@@ -1460,15 +2258,10 @@ class SchemingDCATHarvester(HarvesterBase):
               default_values[key] = value['field_value']
         return default_values
 
-      # Create default values for dataset and distribution
-      self._dataset_default_values = extract_default_values(field_mappings.get("dataset_field_mapping"))
-      self._distribution_default_values = extract_default_values(field_mappings.get("distribution_field_mapping"))
-
-      # Log if there are no default values
-      if not self._dataset_default_values:
-        log.info('No default values for dataset.')
-      if not self._distribution_default_values:
-        log.info('No default values for distribution.')
+      return (
+        extract_default_values(field_mappings.get("dataset_field_mapping")),
+        extract_default_values(field_mappings.get("distribution_field_mapping")),
+      )
 
     def _update_package_dict_with_config_mapping_default_values(self, package_dict):
       """
@@ -1488,21 +2281,27 @@ class SchemingDCATHarvester(HarvesterBase):
       Returns:
         dict: The updated package dictionary.
       """         
-      field_mappings = {
-            'dataset_field_mapping': self._standardize_field_mapping(self.config.get("dataset_field_mapping")),
-            'distribution_field_mapping': self._standardize_field_mapping(self.config.get("distribution_field_mapping")),
-            'datadictionary_field_mapping': None
-        }
+      job_context = self._harvest_job_context
+      if job_context is not None and job_context.config is self.config and job_context.dataset_default_values is not None:
+        # Already created for the harvest job
+        self._dataset_default_values = job_context.dataset_default_values
+        self._distribution_default_values = job_context.distribution_default_values
+      else:
+        field_mappings = {
+              'dataset_field_mapping': self._standardize_field_mapping(self.config.get("dataset_field_mapping")),
+              'distribution_field_mapping': self._standardize_field_mapping(self.config.get("distribution_field_mapping")),
+              'datadictionary_field_mapping': None
+          }
 
-      # Create default values dict from config mappings.
-      try:
-        self.create_default_values(field_mappings)
-        
-      except Exception as e:
-        raise ReadError(
-            "Error generating default values from config field mappings. Error: %s"
-            % (str(e))
-        )
+        # Create default values dict from config mappings.
+        try:
+          self.create_default_values(field_mappings)
+          
+        except Exception as e:
+          raise ReadError(
+              "Error generating default values from config field mappings. Error: %s"
+              % (str(e))
+          )
 
       def update_dict_with_defaults(target_dict, default_values):
         for key, default_value in default_values.items():
@@ -1556,11 +2355,10 @@ class SchemingDCATHarvester(HarvesterBase):
             return True
 
         # Local harvest source organization
-        source_package_dict = p.toolkit.get_action("package_show")(
-            context.copy(), {"id": harvest_object.source.id}
+        job_context = self._get_harvest_job_context(
+            harvest_object.harvest_job_id, harvest_object.harvest_source_id
         )
-        local_org = source_package_dict.get("owner_org")
-        package_dict["owner_org"] = local_org
+        package_dict["owner_org"] = job_context.owner_org
         
         if not package_dict.get("id") or package_dict.get("id") is None and package_dict.get("identifier"):
             package_dict["id"] = package_dict["identifier"]
@@ -1596,6 +2394,11 @@ class SchemingDCATHarvester(HarvesterBase):
 
         # Resources defaults
         if package_dict["resources"]:
+            # Probe at once the URLs of the resources whose format must be inferred
+            get_format_prober().probe_many(
+                resource.get("url") for resource in package_dict["resources"]
+                if isinstance(resource, dict) and not self._get_resource_informat(resource)
+            )
             package_dict["resources"] = [
                 self._update_resource_dict(resource)
                 for resource in package_dict["resources"]
@@ -1810,18 +2613,16 @@ class SchemingDCATHarvester(HarvesterBase):
         # Use dictionary comprehension to create a copy and obfuscate in one step
         return {key: (default_secret_value if key in secrets else value) for key, value in input_dict.items()}
 
-    def _get_ckan_format(self, resource):
-        """Get the CKAN format information for a distribution.
+    @staticmethod
+    def _get_resource_informat(resource):
+        """Get the format of a distribution from its format, title, URL or description.
 
         Args:
             resource (dict): A dictionary containing information about the distribution.
 
         Returns:
-            dict: The updated distribution information.
+            str: The format (lowercase), or None if it must be inferred from the URL.
         """
-
-        encoding = "UTF-8"
-
         informat = resource.get("format", "").lower() if isinstance(resource.get("format"), str) else None
 
         if informat is None:
@@ -1835,6 +2636,22 @@ class SchemingDCATHarvester(HarvesterBase):
                 None,
             )
 
+        return informat
+
+    def _get_ckan_format(self, resource):
+        """Get the CKAN format information for a distribution.
+
+        Args:
+            resource (dict): A dictionary containing information about the distribution.
+
+        Returns:
+            dict: The updated distribution information.
+        """
+
+        encoding = "UTF-8"
+
+        informat = self._get_resource_informat(resource)
+
         format, mimetype = (informat, OGC2CKAN_MD_FORMATS[informat][1]) if informat in OGC2CKAN_MD_FORMATS else (informat, None)
 
         if format is None or format == "":
@@ -1979,6 +2796,7 @@ class SchemingDCATHarvester(HarvesterBase):
     
         return package_dict
 
+    @deferred_indexing
     def _create_or_update_package(
         self, package_dict, harvest_object, package_dict_form="rest"
     ):
@@ -2046,6 +2864,8 @@ class SchemingDCATHarvester(HarvesterBase):
                 "api_version": api_version,
                 "schema": schema,
                 "ignore_auth": True,
+                # In batch import mode the package is indexed later, see `deferred_indexing`
+                "defer_commit": bool(self._get_import_batch_size()),
             }
 
             if self.config and self.config.get("clean_tags", True):
@@ -2180,10 +3000,11 @@ class SchemingDCATHarvester(HarvesterBase):
                 context.pop("__auth_audit", None)
 
                 # Set name for new package to prevent name conflict, see issue #117
+                name_allocator = self._get_name_allocator()
                 if package_dict.get("name", None):
-                    package_dict["name"] = self._gen_new_name(package_dict["name"])
+                    package_dict["name"] = name_allocator.allocate(package_dict["name"])
                 else:
-                    package_dict["name"] = self._gen_new_name(package_dict["title"])
+                    package_dict["name"] = name_allocator.allocate(package_dict["title"])
 
                 for resource in package_dict.get("resources", []):
                     if resource["url"] is None or resource["url"] == "" or "url" not in resource:
@@ -2238,7 +3059,7 @@ class SchemingDCATHarvester(HarvesterBase):
                     )
                     return False
 
-            Session.commit()
+            self._commit_package(context)
 
             return True
 
@@ -6,8 +6,12 @@ import re
 from urllib.parse import urlencode
 from ckanext.harvest.model import HarvestObject
 import datetime
+import itertools
 import ckan.plugins as p
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RequestException
 
 import ckan.model as model
@@ -25,6 +29,11 @@ from ckanext.schemingdcat.harvesters.base import (
 from ckanext.schemingdcat.lib.field_mapping import FieldMappingValidator
 from ckanext.schemingdcat.interfaces import ISchemingDCATHarvester
 from ckanext.schemingdcat.helpers import schemingdcat_get_dataset_schema_field_names
+from ckanext.schemingdcat.config import (
+    CKAN_HARVESTER_SEARCH_ROWS,
+    CKAN_HARVESTER_SEARCH_MAX_ROWS,
+    CKAN_HARVESTER_SEARCH_MAX_WORKERS
+)
 
 log = logging.getLogger(__name__)
 
@@ -43,6 +52,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
         }
 
     _names_taken = []
+    _http_session = None
 
     def _get_action_api_offset(self):
         return "/api/%d/action" % self.action_api_version
@@ -184,6 +194,14 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
 
                 config = json.dumps({**config_obj, mapping_name: field_mapping})
 
+        if 'search_rows' in config_obj:
+            if not isinstance(config_obj['search_rows'], int) or not 0 < config_obj['search_rows'] <= CKAN_HARVESTER_SEARCH_MAX_ROWS:
+                raise ValueError(f'search_rows must be an integer between 1 and {CKAN_HARVESTER_SEARCH_MAX_ROWS}')
+
+        if 'search_workers' in config_obj:
+            if not isinstance(config_obj['search_workers'], int) or not 0 < config_obj['search_workers'] <= CKAN_HARVESTER_SEARCH_MAX_WORKERS:
+                raise ValueError(f'search_workers must be an integer between 1 and {CKAN_HARVESTER_SEARCH_MAX_WORKERS}')
+
         if 'default_extras' in config_obj:
             if not isinstance(config_obj['default_extras'], dict):
                 raise ValueError('default_extras must be a dictionary')
@@ -273,8 +291,8 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
             )
 
             try:
-                pkg_dicts = self._search_for_datasets(
-                    remote_ckan_base_url, fq_terms + [fq_since_last_time]
+                pkg_dicts_pages, first_page = self._peek_search_pages(
+                    self._search_for_datasets(remote_ckan_base_url, fq_terms + [fq_since_last_time])
                 )
             except SearchError as e:
                 log.info(
@@ -284,7 +302,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 )
                 get_all_packages = True
 
-            if not get_all_packages and not pkg_dicts:
+            if not get_all_packages and not first_page:
                 log.info(
                     "No datasets have been updated on the remote "
                     "CKAN instance since the last harvest job %s",
@@ -296,7 +314,9 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
         if get_all_packages:
             # Request all remote packages
             try:
-                pkg_dicts = self._search_for_datasets(remote_ckan_base_url, fq_terms)
+                pkg_dicts_pages, first_page = self._peek_search_pages(
+                    self._search_for_datasets(remote_ckan_base_url, fq_terms)
+                )
             except SearchError as e:
                 log.info("Searching for all datasets gave an error: %s", e)
                 self._save_gather_error(
@@ -305,7 +325,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                     harvest_job,
                 )
                 return None
-        if not pkg_dicts:
+        if not first_page:
             self._save_gather_error(
                 "No datasets found at CKAN: %s" % remote_ckan_base_url, harvest_job
             )
@@ -328,10 +348,12 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
         except ReadError as e:
             self._save_gather_error('Error generating default values for dataset/distribution config field mappings: {0}'.format(e), harvest_job)
 
-        # Create harvest objects for each dataset
+        # Create harvest objects for each dataset. The pages are requested while the objects
+        # are saved, so after an error the objects already saved are returned (with the gather
+        # error) to be imported, instead of leaving them waiting forever
+        package_ids = set()
+        object_ids = []
         try:
-            package_ids = set()
-            object_ids = []
 
             # Check if the content_dict colnames correspond to the local schema
             try:
@@ -354,7 +376,9 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 )
                 return []
 
-            for pkg_dict in pkg_dicts:
+            # The pages are consumed as they are requested, so only one page of
+            # remote datasets is kept in memory
+            for pkg_dict in itertools.chain.from_iterable(pkg_dicts_pages):
                 if pkg_dict["id"] in package_ids:
                     log.info(
                         "Discarding duplicate dataset %s - probably due "
@@ -376,7 +400,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                     #log.debug('Standardized package dict: %s', pkg_dict)
                 except RemoteSchemaError as e:
                     self._save_gather_error('Error standarize remote dataset: {0}'.format(e), harvest_job)
-                    return []
+                    return object_ids
                                         
                 package_ids.add(pkg_dict["id"])
 
@@ -386,9 +410,19 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 obj.save()
                 object_ids.append(obj.id)
 
+            log.debug('Number of elements in remote CKAN: %s', len(object_ids))
+
+            return object_ids
+        except SearchError as e:
+            self._save_gather_error(
+                "Unable to search remote CKAN for datasets:%s url:%s"
+                "terms:%s" % (e, remote_ckan_base_url, fq_terms),
+                harvest_job,
+            )
             return object_ids
         except Exception as e:
             self._save_gather_error("%r" % e, harvest_job)
+            return object_ids
 
     def _get_content(self, url):
             headers = {}
@@ -402,7 +436,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 log.warning('SSL Verify is set to False. SSL certificate verification is disabled.')
 
             try:
-                http_request = requests.get(url, headers=headers, verify=ssl_verify)
+                http_request = self._get_http_session().get(url, headers=headers, verify=ssl_verify)
             except HTTPError as e:
                 raise ContentFetchError(
                     "HTTP error: %s %s" % (e.response.status_code, e.request.url)
@@ -413,13 +447,171 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 raise ContentFetchError("HTTP general exception: %s" % e)
             return http_request.text
 
+    def _get_http_session(self):
+        """
+        Returns the keep-alive HTTP session used for the requests to the remote CKAN.
+
+        The connection pool is sized for the `search_workers` concurrent requests.
+        """
+        if self._http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CKAN_HARVESTER_SEARCH_MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._http_session = session
+
+        return self._http_session
+
+    def _get_search_page(self, base_search_url, params):
+        """Requests a page of a package_search on the remote CKAN.
+
+        Args:
+            base_search_url (str): The package_search URL of the remote CKAN.
+            params (dict): The package_search parameters, including `rows` and `start`.
+
+        Returns:
+            tuple: The raw content, the total number of results and the results of the page.
+
+        Raises:
+            SearchError: If the request fails or the response is not valid.
+        """
+        url = base_search_url + "?" + urlencode(params)
+        log.debug("Searching for CKAN datasets: %s", url)
+
+        try:
+            content = self._get_content(url)
+        except ContentFetchError as e:
+            raise SearchError(
+                "Error sending request to search remote "
+                "CKAN instance %s using URL %r. Error: %s"
+                % (base_search_url, url, e)
+            )
+
+        try:
+            response_dict = json.loads(content)
+        except ValueError:
+            raise SearchError(
+                "Response from remote CKAN was not JSON: %r" % content
+            )
+        try:
+            result = response_dict.get("result", {})
+            pkg_dicts_page = result.get("results", [])
+        except (ValueError, AttributeError):
+            raise SearchError(
+                "Response JSON did not contain "
+                "result/results: %r" % response_dict
+            )
+
+        return content, result.get("count", 0), pkg_dicts_page
+
+    def _search_pages(self, base_search_url, params, workers=1):
+        """Yields the pages of a package_search on the remote CKAN.
+
+        With one worker the pages are requested one after the other until an empty
+        page is returned. With more workers, the offsets of the remaining pages are
+        computed from the `count` of the first page and up to `workers` pages are
+        requested concurrently (keeping at most 2 * `workers` pages in flight), then
+        the pages after the last offset are requested as usual, in case datasets
+        were added while paging.
+
+        Args:
+            base_search_url (str): The package_search URL of the remote CKAN.
+            params (dict): The package_search parameters, including `rows` and `start`.
+            workers (int, optional): The number of concurrent requests. Defaults to 1.
+
+        Yields:
+            list: The package dicts of each page, in order.
+        """
+        params = dict(params)
+        rows = int(params["rows"])
+        start = int(params["start"])
+
+        if workers > 1:
+            content, count, pkg_dicts_page = self._get_search_page(base_search_url, params)
+            yield pkg_dicts_page
+
+            if not pkg_dicts_page:
+                return
+
+            if len(pkg_dicts_page) < rows and start + len(pkg_dicts_page) < count:
+                # The remote CKAN limits the rows per page (ckan.search.rows_max)
+                log.info("Remote CKAN returned %s of %s rows per page", len(pkg_dicts_page), rows)
+                rows = len(pkg_dicts_page)
+                params["rows"] = str(rows)
+
+            def get_page(page_start):
+                return self._get_search_page(base_search_url, dict(params, start=str(page_start)))[2]
+
+            offsets = iter(range(start + rows, count, rows))
+            start = start + rows
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for page_start in offsets:
+                    pending.append(executor.submit(get_page, page_start))
+                    if len(pending) >= workers * 2:
+                        break
+
+                while pending:
+                    pkg_dicts_page = pending.popleft().result()
+                    page_start = next(offsets, None)
+                    if page_start is not None:
+                        pending.append(executor.submit(get_page, page_start))
+                    start += rows
+                    yield pkg_dicts_page
+
+        previous_content = None
+        while True:
+            params["start"] = str(start)
+            content, count, pkg_dicts_page = self._get_search_page(base_search_url, params)
+
+            if previous_content and content == previous_content:
+                raise SearchError("The paging doesn't seem to work. URL: %s" % base_search_url)
+            previous_content = content
+
+            yield pkg_dicts_page
+
+            if len(pkg_dicts_page) == 0:
+                break
+
+            start += rows
+
+    @staticmethod
+    def _peek_search_pages(pkg_dicts_pages):
+        """Requests the first page of a dataset search.
+
+        This way the search errors and an empty result are detected before
+        consuming the rest of the pages.
+
+        Args:
+            pkg_dicts_pages (generator): The pages returned by `_search_for_datasets`.
+
+        Returns:
+            tuple: An iterator with all the pages (including the first one) and the first page.
+
+        Raises:
+            SearchError: If the first page could not be requested.
+        """
+        first_page = next(pkg_dicts_pages, [])
+        return itertools.chain([first_page], pkg_dicts_pages), first_page
+
     def _search_for_datasets(self, remote_ckan_base_url, fq_terms=None):
-        """Does a dataset search on a remote CKAN and returns the results.
+        """Does a dataset search on a remote CKAN and yields the results page by page.
 
         Deals with paging to return all the results, not just the first page.
+        The pages have `search_rows` rows and are requested by `search_workers`
+        concurrent requests (see `_search_pages`). Only the ids of the datasets
+        already yielded are kept, so the memory used does not grow with the
+        remote catalogue.
+
+        The search is lazy: SearchError is raised while consuming the pages.
+
+        Yields:
+            list: The package dicts of each page, without the datasets found on previous pages.
         """
         base_search_url = remote_ckan_base_url + self._get_search_api_offset()
-        params = {"rows": "100", "start": "0"}
+        rows = min(int(self.config.get("search_rows", CKAN_HARVESTER_SEARCH_ROWS)), CKAN_HARVESTER_SEARCH_MAX_ROWS)
+        workers = min(int(self.config.get("search_workers", 1)), CKAN_HARVESTER_SEARCH_MAX_WORKERS)
+        params = {"rows": str(rows), "start": "0"}
         # There is the worry that datasets will be changed whilst we are paging
         # through them.
         # * In SOLR 4.7 there is a cursor, but not using that yet
@@ -446,39 +638,9 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
         if fq_terms:
             params["fq"] = " ".join(fq_terms)
 
-        pkg_dicts = []
         pkg_ids = set()
-        previous_content = None
-
-        while True:
-            url = base_search_url + "?" + urlencode(params)
-            log.debug("Searching for CKAN datasets: %s", url)
-
-            try:
-                content = self._get_content(url)
-            except ContentFetchError as e:
-                raise SearchError(
-                    "Error sending request to search remote "
-                    "CKAN instance %s using URL %r. Error: %s"
-                    % (remote_ckan_base_url, url, e)
-                )
-
-            if previous_content and content == previous_content:
-                raise SearchError("The paging doesn't seem to work. URL: %s" % url)
-            try:
-                response_dict = json.loads(content)
-            except ValueError:
-                raise SearchError(
-                    "Response from remote CKAN was not JSON: %r" % content
-                )
-            try:
-                pkg_dicts_page = response_dict.get("result", {}).get("results", [])
-            except ValueError:
-                raise SearchError(
-                    "Response JSON did not contain "
-                    "result/results: %r" % response_dict
-                )
 
+        for pkg_dicts_page in self._search_pages(base_search_url, params, workers):
             # Weed out any datasets found on previous pages (should datasets be
             # changing while we page)
             ids_in_page = set(p["id"] for p in pkg_dicts_page)
@@ -489,16 +651,8 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
                 ]
             pkg_ids |= ids_in_page
 
-            pkg_dicts.extend(pkg_dicts_page)
-
-            if len(pkg_dicts_page) == 0:
-                break
-
-            params["start"] = str(int(params["start"]) + int(params["rows"]))
-
-        log.debug('Number of elements in remote CKAN: %s', len(pkg_dicts))
-
-        return pkg_dicts
+            if pkg_dicts_page:
+                yield pkg_dicts_page
 
     def fetch_stage(self, harvest_object):
         # Nothing to do here - we got the package dict in the search in the
@@ -560,7 +714,7 @@ class SchemingDCATCKANHarvester(SchemingDCATHarvester):
             )
             return False
 
-        self._set_config(harvest_object.job.source.config)
+        self._set_harvest_job_context(harvest_object)
 
         try:
             package_dict = json.loads(harvest_object.content)
@@ -3,6 +3,8 @@ import logging
 import traceback
 import uuid
 import dateutil
+import datetime
+import os
 import time
 import pprint
 
@@ -11,18 +13,16 @@ from ckan import model
 from ckan.logic import NotFound, get_action
 from ckan import logic
 
-from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
+from ckanext.harvest.model import HarvestObject
 from ckanext.spatial.harvesters.csw import CSWHarvester
 
-from ckanext.dcat.processors import RDFParserException, RDFParser
+from ckanext.dcat.processors import RDFParser
 
 from ckanext.schemingdcat.harvesters.base import (
     SchemingDCATHarvester,
     RemoteSchemaError,
     ReadError,
 )
-from ckanext.schemingdcat.lib.csw.processor import SchemingDCATCatalogueServiceWeb
-from ckanext.schemingdcat.lib.csw.csw_metadata_extractor import CSWMetadataExtractor
 from ckanext.schemingdcat.lib.csw.csw_harvester_utils import (
     is_valid_url,
     get_organization_slug_for_harvest_source,
@@ -36,10 +36,13 @@ from ckanext.schemingdcat.config import (
     INSPIRE_HVD_CATEGORY,
     INSPIRE_HVD_APPLICABLE_LEGISLATION,
     PROTOCOL_MAPPING,
-    FORMAT_STANDARDIZATION
+    FORMAT_STANDARDIZATION,
+    CSW_MODIFIED_PROPERTY,
+    CSW_QUERYABLE_PATTERN,
+    CSW_INCREMENTAL_OVERLAP
 )
-from ckanext.schemingdcat.lib.csw_mapper.xslt_transformer import XSLTTransformer
 from ckanext.schemingdcat.lib.field_mapping import FieldMappingValidator
+from ckanext.schemingdcat.lib.name_allocator import NameAllocator
 from ckanext.schemingdcat.interfaces import ISchemingDCATHarvester
 from ckanext.schemingdcat.helpers import schemingdcat_get_dataset_schema_required_field_names,  schemingdcat_get_dataset_schema_field_names, schemingdcat_get_ckan_site_url
 
@@ -66,7 +69,6 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         
     csw = None
     existing_dataset_identifiers = []
-    _names_taken = []
     _schema_required_fields = []
 
     def validate_config(self, config):
@@ -108,6 +110,18 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         if 'cql_use_like' in config_obj:
             if not isinstance(config_obj['cql_use_like'], bool):
                 raise ValueError('cql_use_like must be boolean')
+
+        if 'extraction_workers' in config_obj:
+            if not isinstance(config_obj['extraction_workers'], int) or config_obj['extraction_workers'] < 1:
+                raise ValueError('extraction_workers must be a positive integer')
+
+        if 'incremental' in config_obj:
+            if not isinstance(config_obj['incremental'], bool):
+                raise ValueError('incremental must be boolean')
+
+        if 'modified_property' in config_obj:
+            if not isinstance(config_obj['modified_property'], str) or not CSW_QUERYABLE_PATTERN.fullmatch(config_obj['modified_property']):
+                raise ValueError('modified_property must be a string, e.g. "apiso:Modified" or "dct:modified"')
         
         if 'legal_basis_url' in config_obj:
             if config_obj['legal_basis_url'] is not None and not is_valid_url(config_obj['legal_basis_url']):
@@ -258,9 +272,34 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
 
         return config
     
+    def _parse_source_config(self, harvest_source):
+        """
+        Returns the configuration of a harvest source, see `_parse_config`.
+
+        Args:
+            harvest_source (HarvestSource): The harvest source.
+
+        Returns:
+            dict: The configuration.
+        """
+        return self._parse_config(harvest_source.config, harvest_source.id)
+
     def _set_config(self, config_str, harvest_source_id):
         """
-        Set the harvester configuration and extract default values from field mappings.
+        Set the harvester configuration, see `_parse_config`.
+
+        Args:
+            config_str (str): JSON configuration string
+            harvest_source_id (str): Harvest source identifier
+
+        Returns:
+            None
+        """
+        self.config = self._parse_config(config_str, harvest_source_id)
+
+    def _parse_config(self, config_str, harvest_source_id):
+        """
+        Parse the harvester configuration and extract default values from field mappings.
         Ensures safe default values even if errors occur during processing.
         
         Args:
@@ -268,11 +307,11 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             harvest_source_id (str): Harvest source identifier
             
         Returns:
-            None
+            dict: The configuration.
         """
         # Initialize empty config with safe defaults
-        self.config = {}
-        self.config['config_default_values'] = {
+        config = {}
+        config['config_default_values'] = {
             'dataset': {},
             'distribution': {}
         }
@@ -280,31 +319,31 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         # Parse config if provided
         if config_str:
             try:
-                self.config = json.loads(config_str)
+                config = json.loads(config_str)
             except json.JSONDecodeError as e:
                 log.error('Invalid JSON configuration: %s', str(e))
-                return
+                return config
     
         # Set organization
         try:
             organization_slug = get_organization_slug_for_harvest_source(harvest_source_id)
-            self.config['organization'] = organization_slug
+            config['organization'] = organization_slug
         except Exception as e:
             log.error('Error getting organization: %s', str(e))
        
         # Generate field mappings from config
-        if not any(key in self.config for key in ['dataset_field_mapping', 'distribution_field_mapping']):
+        if not any(key in config for key in ['dataset_field_mapping', 'distribution_field_mapping']):
             log.debug('No field mappings found in configuration')
-            return
+            return config
             
         try:
             # Standardize the field_mapping           
             field_mappings = {
                 'dataset_field_mapping': self._standardize_field_mapping(
-                    self.config.get("dataset_field_mapping", {})
+                    config.get("dataset_field_mapping", {})
                 ),
                 'distribution_field_mapping': self._standardize_field_mapping(
-                    self.config.get("distribution_field_mapping", {})
+                    config.get("distribution_field_mapping", {})
                 ),
                 'datadictionary_field_mapping': None
             }
@@ -321,9 +360,9 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             
             # Only update if we successfully extracted values
             if extracted_defaults['dataset'] or extracted_defaults['distribution']:
-                self.config['config_default_values'] = extracted_defaults
+                config['config_default_values'] = extracted_defaults
                 log.debug('Generated default values from field mappings: %s', 
-                         self.config['config_default_values'])
+                         config['config_default_values'])
     
         except RemoteSchemaError as e:
             log.error('Error standardizing field mapping: %s', str(e))
@@ -334,7 +373,9 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         except Exception as e:
             log.error('Unexpected error processing field mappings: %s', str(e))
         
-        log.debug('Using final config: %r', self.config)
+        log.debug('Using final config: %r', config)
+
+        return config
     
     def modify_package_dict(self, package_dict, harvest_object):
         '''
@@ -401,6 +442,10 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         csw_url = harvest_job.source.url.rstrip("/")
 
         log.debug('In SchemingDCATCSWHarvester OWSLib-gather_stage with harvest source: %s and URL: %s', harvest_source_title, csw_url)
+        # OWSLib, lxml and shapely are only imported when a job is gathered, not when the harvester is loaded
+        from ckanext.schemingdcat.lib.csw.processor import SchemingDCATCatalogueServiceWeb
+        from ckanext.schemingdcat.lib.csw.csw_metadata_extractor import extract_records
+
         self._set_config(harvest_job.source.config, harvest_job.source.id)
 
         try:
@@ -410,12 +455,28 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
                 log.warning('SSL Verify is set to False. SSL certificate verification is disabled.')
 
             csw_client = SchemingDCATCatalogueServiceWeb(url=csw_url, ssl_verify=ssl_verify)
-            csw_extractor = CSWMetadataExtractor(debug=DEBUG_MODE)
+            query_filter = {
+                'cql': self.config.get('cql', None),
+                'cql_query': self.config.get('cql_query', None),
+                'cql_search_term': self.config.get('cql_search_term', None),
+                'cql_use_like': self.config.get('cql_use_like', False),
+            }
+
+            # In incremental mode only the records modified since the last error-free job
+            # are requested, and the deleted ones are detected with a brief listing
+            modified_since = self._get_modified_since(harvest_job)
+            listed_identifiers = None
+            if modified_since:
+                log.info('Searching for CSW records modified since: %s', modified_since)
+                try:
+                    listed_identifiers = csw_client.get_csw_identifiers(**query_filter)
+                except Exception as e:
+                    log.warning('Unable to list the CSW record identifiers, no datasets will be deleted: %s', e)
+
             gathered_identifiers = csw_client.get_csw_records(
-                cql=self.config.get('cql', None),
-                cql_query=self.config.get('cql_query', None),
-                cql_search_term=self.config.get('cql_search_term', None),
-                cql_use_like=self.config.get('cql_use_like', False)
+                modified_since=modified_since,
+                modified_property=self.config.get('modified_property', CSW_MODIFIED_PROPERTY),
+                **query_filter
             )
 
             # Limit to first 25 records for testing
@@ -432,12 +493,23 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             )
             return []
         except Exception as e:
+            # A gather error also keeps the job from being the last error-free job, so the
+            # records of a failed incremental query are requested again by the next job
             self._save_gather_error(
                 'Unable to get content for URL: {}: {} / {}'.format(csw_url, str(e), traceback.format_exc()),
                 harvest_job
             )
             return []
 
+        # Skip the extraction if the records have not changed since the last error-free job
+        # (in incremental mode only the modified records are gathered, so there is nothing to compare)
+        remote_validators = None if modified_since else {'sha256': csw_client.get_records_hash(gathered_identifiers)}
+        previous_validators = self._get_remote_validators(harvest_job)
+        if remote_validators and previous_validators and previous_validators.get('sha256') == remote_validators['sha256']:
+            log.info('The CSW records of the harvest source "%s" have not changed since the last error-free job. No changes to harvest.', harvest_source_title)
+            self._save_remote_validators(harvest_job, remote_validators)
+            return []
+
         # Get the previous guids for this source
         query = \
             model.Session.query(HarvestObject.guid, HarvestObject.package_id) \
@@ -454,29 +526,31 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         log.debug('Extract CSW XML records using OWSLib')
         
         parser_datasets = []
-        
-        # Extract CSW XML records using OWSLib
+
+        records = []
         for id in gathered_identifiers:
             try:
-                log.debug("Fetching CSW record for ID: %s", id)
-                csw_metadata, csw_record_xml = csw_client.get_metadata_record(id)
-                
-                # Extract all metadata
-                complete_metadata = csw_extractor.extract_from_csw(csw_metadata, csw_record_xml)
-                
+                records.append((id, csw_client.get_metadata_record(id)[0]))
+            except Exception as e:
+                self._save_gather_error(f'Error processing record {id}: {str(e)}', harvest_job)
+
+        # Extract CSW XML records using OWSLib, in parallel processes if extraction_workers > 1
+        extraction_workers = min(self.config.get('extraction_workers', 1), os.cpu_count() or 1)
+        for id, complete_metadata, error in extract_records(records, extraction_workers, debug=DEBUG_MODE):
+            if error or not complete_metadata:
+                self._save_gather_error(f'Error processing record {id}: {error or "no metadata extracted"}', harvest_job)
+                continue
+
+            try:
                 for harvester in p.PluginImplementations(SchemingDCATHarvester):
                     complete_metadata, after_parsing_errors = harvester.after_parsing(complete_metadata, harvest_job)
 
                     for error_msg in after_parsing_errors:
                         self._save_gather_error(error_msg, harvest_job)
-                
 
                 parser_datasets.append(complete_metadata)
                 log.debug('Append record: %s', complete_metadata.get('title'))
 
-                if not complete_metadata:
-                    return None
-
             except Exception as e:
                 self._save_gather_error(f'Error processing record {id}: {str(e)}', harvest_job)
                 continue
@@ -496,6 +570,10 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             skipped_datasets = 0  # Counter for omitted datasets
             identifier_counts = {}  # To track the frequency of identifiers
 
+            # Load the existing names of the datasets without a name in a single query
+            name_allocator = NameAllocator()
+            name_allocator.preload(dataset.get('title') for dataset in parser_datasets if not dataset.get('name'))
+
             for dataset in parser_datasets:
                 #log.debug('dataset: %s', dataset['title'])
 
@@ -504,11 +582,9 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
                 
                 try:
                     if not dataset.get('name'):
-                        dataset['name'] = self._gen_new_name(dataset['title'])
-                    while dataset['name'] in self._names_taken:
-                        suffix = sum(name.startswith(dataset['name'] + '-') for name in self._names_taken) + 1
-                        dataset['name'] = '{}-{}'.format(dataset['name'], suffix)
-                    self._names_taken.append(dataset['name'])
+                        dataset['name'] = name_allocator.allocate(dataset['title'])
+                    else:
+                        dataset['name'] = name_allocator.reserve(dataset['name'])
         
                     # If the dataset has no identifier, use an UUID
                     if not dataset.get('identifier'):
@@ -585,8 +661,20 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         # Check guids to create/update/delete
         new = guids_in_harvest - guids_in_db
         # Get objects/datasets to delete (ie in the DB but not in the source)
-        delete = set(guids_in_db) - set(guids_in_harvest)
+        if not modified_since:
+            delete = set(guids_in_db) - set(guids_in_harvest)
+        elif listed_identifiers:
+            delete = set(guids_in_db) - guids_in_harvest - {self._clean_identifier(id) for id in listed_identifiers}
+        else:
+            # The listing failed (or is empty), so the deleted records are unknown
+            delete = set()
+        # In debug mode only the first records are gathered, so the rest must not be deleted
+        if DEBUG_MODE:
+            delete = set()
         change = guids_in_db & guids_in_harvest
+
+        # Skip the datasets that are identical to the ones already imported
+        change, content_hashes = self._get_changed_guids(harvest_job, change, datasets_to_harvest)
         
         log.debug(f"Number of skipped datasets: {skipped_datasets}")
         log.debug(f'guids_in_harvest ({len(guids_in_harvest)})')
@@ -595,48 +683,24 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         log.debug(f'delete ({len(delete)})')
         log.debug(f'change ({len(change)})')
         
-        ids = []
-        for guid in new:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    extras=[HarvestObjectExtra(key='status', value='new')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in change:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='change')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in delete:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='delete')])
-                model.Session.query(HarvestObject).\
-                    filter_by(guid=guid).\
-                    update({'current': False}, False)
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
+        harvest_objects = self._build_harvest_objects(new, change, delete, datasets_to_harvest, guid_to_package_id, content_hashes)
+
+        try:
+            ids = self._save_harvest_objects(harvest_job, harvest_objects)
+        except Exception as e:
+            self._save_gather_error('Error saving the harvest objects: %r / %s' % (e, traceback.format_exc()), harvest_job)
+            return []
         
         log.debug('Number of elements in parser_datasets: %s and object_ids: %s', len(parser_datasets), len(ids))
-        
+
+        # Store the records hash, it is used by the next job if this one is error-free
+        if remote_validators:
+            self._save_remote_validators(harvest_job, remote_validators)
+
         # Log parser_datasets/ ids
         #self._log_export_parser_datasets_and_ids(harvest_source_title, parser_datasets, ids)
 
-        return [id_dict['id'] for id_dict in ids]
+        return ids
 
     #TODO: Disable until https://github.com/SEMICeu/iso-19139-to-dcat-ap
     def _gather_with_xsl(self, harvest_job):
@@ -666,6 +730,10 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         csw_url = harvest_job.source.url.rstrip("/")
 
         log.debug('In SchemingDCATCSWHarvester XSLT-gather_stage with harvest source: %s and URL: %s', harvest_source_title, csw_url)
+        # Lazy imports, see _gather_with_owslib
+        from ckanext.schemingdcat.lib.csw.processor import SchemingDCATCatalogueServiceWeb
+        from ckanext.schemingdcat.lib.csw_mapper.xslt_transformer import XSLTTransformer
+
         self._set_config(harvest_job.source.config, harvest_job.source.id)
         
         try:
@@ -732,23 +800,29 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             )
             return []
 
-        self._names_taken = []
         
         parser = RDFParser()
         log.debug('Load profiles TO RDFParser: %s', DEFAULT_RDF_PROFILES)
         parser._profiles = parser._load_profiles(DEFAULT_RDF_PROFILES)
 
-        # Transform CSW XML records to RDF
+        records = []
         for id in gathered_identifiers:
             try:
-                csw_record_xml = csw_client.get_record_by_id(id)
-                transformed_xml = transformer.transform(csw_record_xml)
-                try:
-                    parser.parse(transformed_xml, _format='xml')
-                except RDFParserException as e:
-                    self._save_gather_error('Error parsing the RDF file: {0}'.format(e), harvest_job)
-                    return []
+                records.append((id, csw_client.get_metadata_record(id)[1]))
+            except Exception as e:
+                self._save_gather_error(f'Error processing record {id}: {str(e)}', harvest_job)
+
+        # Transform CSW XML records to RDF with the compiled stylesheet, adding the triples
+        # straight to the graph of the parser (no serialization and parsing again). The graph
+        # is taken for each record, as after_parsing may return a different parser
+        for id, xml_content in records:
+            try:
+                transformer.transform(xml_content, graph=parser.g)
+            except Exception as e:
+                self._save_gather_error(f'Error processing record {id}: {str(e)}', harvest_job)
+                continue
 
+            try:
                 for harvester in p.PluginImplementations(SchemingDCATHarvester):
                     parser, after_parsing_errors = harvester.after_parsing(parser, harvest_job)
 
@@ -778,6 +852,10 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             skipped_datasets = 0  # Counter for omitted datasets
             identifier_counts = {}  # To track the frequency of identifiers
 
+            # Load the existing names of the datasets without a name in a single query
+            name_allocator = NameAllocator()
+            name_allocator.preload(dataset.get('title') for dataset in parser_datasets if not dataset.get('name'))
+
             for dataset in parser_datasets:
                 #log.debug('dataset: %s', dataset['title'])
 
@@ -786,11 +864,9 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
                 
                 try:
                     if not dataset.get('name'):
-                        dataset['name'] = self._gen_new_name(dataset['title'])
-                    while dataset['name'] in self._names_taken:
-                        suffix = sum(name.startswith(dataset['name'] + '-') for name in self._names_taken) + 1
-                        dataset['name'] = '{}-{}'.format(dataset['name'], suffix)
-                    self._names_taken.append(dataset['name'])
+                        dataset['name'] = name_allocator.allocate(dataset['title'])
+                    else:
+                        dataset['name'] = name_allocator.reserve(dataset['name'])
         
                     # If the dataset has no identifier, use an UUID
                     if not dataset.get('identifier'):
@@ -866,7 +942,13 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         new = guids_in_harvest - guids_in_db
         # Get objects/datasets to delete (ie in the DB but not in the source)
         delete = set(guids_in_db) - set(guids_in_harvest)
+        # In debug mode only the first records are gathered, so the rest must not be deleted
+        if DEBUG_MODE:
+            delete = set()
         change = guids_in_db & guids_in_harvest
+
+        # Skip the datasets that are identical to the ones already imported
+        change, content_hashes = self._get_changed_guids(harvest_job, change, datasets_to_harvest)
         
         log.debug(f"Number of skipped datasets: {skipped_datasets}")
         log.debug(f'guids_in_harvest ({len(guids_in_harvest)})')
@@ -875,48 +957,20 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         log.debug(f'delete ({len(delete)})')
         log.debug(f'change ({len(change)})')
         
-        ids = []
-        for guid in new:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    extras=[HarvestObjectExtra(key='status', value='new')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in change:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='change')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in delete:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='delete')])
-                model.Session.query(HarvestObject).\
-                    filter_by(guid=guid).\
-                    update({'current': False}, False)
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
+        harvest_objects = self._build_harvest_objects(new, change, delete, datasets_to_harvest, guid_to_package_id, content_hashes)
+
+        try:
+            ids = self._save_harvest_objects(harvest_job, harvest_objects)
+        except Exception as e:
+            self._save_gather_error('Error saving the harvest objects: %r / %s' % (e, traceback.format_exc()), harvest_job)
+            return []
         
         log.debug('Number of elements in parser_datasets: %s and object_ids: %s', len(parser_datasets), len(ids))
         
         # Log parser_datasets/ ids
         #self._log_export_parser_datasets_and_ids(harvest_source_title, parser_datasets, ids)
 
-        return [id_dict['id'] for id_dict in ids]
+        return ids
   
     def fetch_stage(self, harvest_object):
         # Nothing to do here - we got the package dict in the search in the gather stage
@@ -952,7 +1006,7 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
             log.error('No harvest object received')
             return False   
         
-        self._set_config(harvest_object.source.config, harvest_object.source.id)
+        self._set_harvest_job_context(harvest_object)
         
         if self.force_import:
             status = 'change'
@@ -968,11 +1022,7 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         if status == 'delete':
             override_local_datasets = self.config.get("override_local_datasets", False)
             if override_local_datasets is True:
-                # Delete package
-                context.update({
-                    'ignore_auth': True,
-                })
-                p.toolkit.get_action('package_delete')(context, {'id': harvest_object.package_id})
+                self._delete_package(harvest_object, context)
                 log.info('The override_local_datasets configuration is %s. Package %s deleted with GUID: %s' % (override_local_datasets, harvest_object.package_id, harvest_object.guid))
 
                 return True
@@ -1180,6 +1230,31 @@ class SchemingDCATCSWHarvester(CSWHarvester, SchemingDCATHarvester):
         return package_dict
 
     # Aux methods
+    def _get_modified_since(self, harvest_job):
+        """
+        Gets the date from which the records are requested in incremental mode.
+
+        It is the start of the gather stage of the last error-free job minus
+        CSW_INCREMENTAL_OVERLAP seconds, in case the local and remote clocks differ.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+
+        Returns:
+            str: The date in ISO 8601 (UTC), or None if all the records must be requested.
+        """
+        if not self.config.get('incremental', False) or self.config.get('force_all', False):
+            return None
+
+        last_error_free_job = self.last_error_free_job(harvest_job)
+        log.debug('Last error-free job: %r', last_error_free_job)
+        if not last_error_free_job or not last_error_free_job.gather_started:
+            return None
+
+        # gather_started is UTC
+        since = last_error_free_job.gather_started - datetime.timedelta(seconds=CSW_INCREMENTAL_OVERLAP)
+        return since.strftime('%Y-%m-%dT%H:%M:%SZ')
+
     def _get_existing_datasets(self, gathered_identifiers):
         """Check if datasets with the given identifiers exist and add them to existing_dataset_identifiers.
     
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from ckan import model
+from ckan.model.domain_object import DomainObject
+
+log = logging.getLogger(__name__)
+
+harvest_source_state_table = None
+resource_format_cache_table = None
+
+
+def setup():
+    """
+    Sets up the harvest source state and resource format cache tables for SchemingDCAT harvesters
+    if they do not already exist.
+
+    The harvest source state table stores small JSON documents per harvest source (e.g. remote
+    validators or high-water marks) that must survive between harvest jobs. The resource format
+    cache table stores the Content-Type of the resource URLs probed by the harvesters.
+
+    Returns:
+        None
+    """
+    if harvest_source_state_table is not None:
+        # Already defined (and created) by this process
+        return
+
+    define_tables()
+
+    if not harvest_source_state_table.exists():
+        harvest_source_state_table.create(checkfirst=True)
+        log.debug('SchemingDCAT harvest source state table defined in DB')
+
+    if not resource_format_cache_table.exists():
+        resource_format_cache_table.create(checkfirst=True)
+        log.debug('SchemingDCAT resource format cache table defined in DB')
+    elif 'url_hash' not in {column['name'] for column in sa.inspect(model.meta.engine).get_columns(resource_format_cache_table.name)}:
+        # Cache of a previous version keyed on the URL, its entries are probed again
+        resource_format_cache_table.drop()
+        resource_format_cache_table.create()
+        log.debug('SchemingDCAT resource format cache table recreated in DB')
+
+
+class HarvestSourceState(DomainObject):
+    """
+    Represents a state value of a harvest source within the database.
+    """
+
+    @classmethod
+    def get(cls, harvest_source_id, key):
+        """
+        Retrieves the state value stored for a harvest source.
+
+        Args:
+            harvest_source_id (str): The harvest source id.
+            key (str): The state key.
+
+        Returns:
+            The decoded JSON value, or `None` if there is no state stored.
+        """
+        setup()
+        state = model.Session.query(cls).autoflush(False) \
+            .filter_by(harvest_source_id=harvest_source_id, key=key) \
+            .first()
+
+        if state is None:
+            return None
+
+        try:
+            return json.loads(state.value)
+        except ValueError:
+            log.warning('Invalid harvest source state "%s" for source %s', key, harvest_source_id)
+            return None
+
+    @classmethod
+    def set(cls, harvest_source_id, key, value):
+        """
+        Stores (or replaces) the state value of a harvest source and commits it.
+
+        Args:
+            harvest_source_id (str): The harvest source id.
+            key (str): The state key.
+            value: A JSON serializable value.
+        """
+        setup()
+        state = model.Session.query(cls) \
+            .filter_by(harvest_source_id=harvest_source_id, key=key) \
+            .first()
+
+        if state is None:
+            state = cls()
+            state.harvest_source_id = harvest_source_id
+            state.key = key
+            model.Session.add(state)
+
+        state.value = json.dumps(value)
+        state.modified = datetime.utcnow()
+        model.Session.commit()
+
+    @classmethod
+    def delete(cls, harvest_source_id, key=None):
+        """
+        Removes the state of a harvest source, only for `key` if provided.
+
+        Args:
+            harvest_source_id (str): The harvest source id.
+            key (str, optional): The state key. Defaults to None (all keys).
+        """
+        setup()
+        query = model.Session.query(cls).filter_by(harvest_source_id=harvest_source_id)
+        if key:
+            query = query.filter_by(key=key)
+
+        query.delete(synchronize_session=False)
+        model.Session.commit()
+
+
+class ResourceFormatCache(DomainObject):
+    """
+    Represents the Content-Type of a resource URL probed by the harvesters.
+
+    The entries are keyed on the SHA-256 hash of the URL, as long URLs (e.g. WMS GetCapabilities
+    requests) overflow the index of a text key. They are read and written with their own
+    connection, so a failure does not abort (and a write does not commit) the transaction of
+    the harvest object being imported in `model.Session`.
+    """
+
+    @staticmethod
+    def hash_url(url):
+        """
+        Returns the SHA-256 hex digest of a URL, the key of its entry.
+        """
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_many(cls, urls, max_age):
+        """
+        Retrieves the cached Content-Type of the given URLs.
+
+        Args:
+            urls (list): The resource URLs.
+            max_age (int): The maximum age of the entries, in seconds.
+
+        Returns:
+            dict: A dictionary mapping each cached URL to its Content-Type.
+        """
+        if not urls:
+            return {}
+
+        setup()
+        urls_by_hash = {cls.hash_url(url): url for url in urls}
+        min_modified = datetime.utcnow() - timedelta(seconds=max_age)
+        table = resource_format_cache_table
+        query = sa.select([table.c.url_hash, table.c.content_type]) \
+            .where(table.c.url_hash.in_(list(urls_by_hash.keys()))) \
+            .where(table.c.modified >= min_modified)
+
+        with model.meta.engine.connect() as connection:
+            return {urls_by_hash[url_hash]: content_type for url_hash, content_type in connection.execute(query)}
+
+    @classmethod
+    def set_many(cls, content_types):
+        """
+        Stores (or replaces) the Content-Type of the given URLs in their own transaction.
+
+        Args:
+            content_types (dict): A dictionary mapping each URL to its Content-Type.
+        """
+        if not content_types:
+            return
+
+        setup()
+        now = datetime.utcnow()
+        statement = postgresql.insert(resource_format_cache_table).values([
+            {'url_hash': cls.hash_url(url), 'url': url, 'content_type': content_type, 'modified': now}
+            for url, content_type in content_types.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=['url_hash'],
+            set_={'url': statement.excluded.url, 'content_type': statement.excluded.content_type, 'modified': statement.excluded.modified},
+        )
+
+        with model.meta.engine.begin() as connection:
+            connection.execute(statement)
+
+
+def define_tables():
+    """
+    Defines the harvest source state and resource format cache tables in the database and maps them
+    to the `HarvestSourceState` and `ResourceFormatCache` classes.
+    """
+    global harvest_source_state_table
+    global resource_format_cache_table
+
+    harvest_source_state_table = sa.Table(
+        'schemingdcat_harvest_source_state',
+        model.meta.metadata,
+        sa.Column('harvest_source_id', sa.types.UnicodeText, primary_key=True, nullable=False),
+        sa.Column('key', sa.types.UnicodeText, primary_key=True, nullable=False),
+        sa.Column('value', sa.types.UnicodeText, nullable=False),
+        sa.Column('modified', sa.types.DateTime, nullable=False, default=datetime.utcnow),
+    )
+
+    model.meta.mapper(
+        HarvestSourceState,
+        harvest_source_state_table,
+    )
+
+    resource_format_cache_table = sa.Table(
+        'schemingdcat_resource_format_cache',
+        model.meta.metadata,
+        sa.Column('url_hash', sa.types.Unicode(64), primary_key=True, nullable=False),
+        sa.Column('url', sa.types.UnicodeText, nullable=False),
+        sa.Column('content_type', sa.types.UnicodeText, nullable=False),
+        sa.Column('modified', sa.types.DateTime, nullable=False, default=datetime.utcnow),
+    )
+
+    model.meta.mapper(
+        ResourceFormatCache,
+        resource_format_cache_table,
+    )
@@ -15,13 +15,18 @@ from ckan.logic.schema import default_create_package_schema
 from ckan.lib.navl.validators import ignore_missing, ignore
 
 from ckanext.harvest.logic.schema import unicode_safe
-from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
+from ckanext.harvest.model import HarvestObject
 
-from ckanext.schemingdcat.harvesters.base import SchemingDCATHarvester
+from ckanext.schemingdcat.harvesters.base import SchemingDCATHarvester, deferred_indexing
+from ckanext.schemingdcat.harvesters.model import HarvestSourceState
 from ckanext.schemingdcat.interfaces import ISchemingDCATHarvester, ISQLHarvester
 from ckanext.schemingdcat.lib.sql_field_mapping import SqlFieldMappingValidator as FieldMappingValidator
+from ckanext.schemingdcat.lib.name_allocator import NameAllocator
 from ckanext.schemingdcat.config import (
-    AUX_TAG_FIELDS
+    AUX_TAG_FIELDS,
+    SQL_FETCH_SIZE,
+    SQL_STATEMENT_TIMEOUT,
+    SQL_WATERMARKS_STATE_KEY
 )
 
 log = logging.getLogger(__name__)
@@ -29,6 +34,7 @@ log = logging.getLogger(__name__)
 
 class DatabaseManager(ABC):
     _retry = 5
+    statement_timeout = SQL_STATEMENT_TIMEOUT
     
     @abstractmethod
     def connect(self):
@@ -46,6 +52,22 @@ class DatabaseManager(ABC):
     def execute_query(self, query):
         pass
 
+    def execute_query_chunks(self, query, chunk_size=SQL_FETCH_SIZE):
+        """
+        Executes a query and yields its results in chunks.
+
+        Database managers that support server-side cursors override it, so the results
+        are never loaded at once. By default the whole result is yielded as one chunk.
+
+        Args:
+            query (str): The query to execute.
+            chunk_size (int, optional): The number of rows of each chunk. Defaults to SQL_FETCH_SIZE.
+
+        Yields:
+            tuple: The rows of the chunk and the column names.
+        """
+        yield self.execute_query(query)
+
 class SchemingDCATSQLHarvester(SchemingDCATHarvester):
     """
     A base harvester for harvesting metadata from SQL databases using the SchemingDCAT extension.
@@ -64,17 +86,24 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         'sqlite': {
             'name': 'sqlite',
             'title': 'SQLite',
-            'active': False,
+            'active': True,
         }
     }
     _database_type = None
     _credentials = None
+    # SQLite databases are local files, without credentials
+    _credentials_required = True
     _connection = None
     _engine = None
     _metadata = None
     _session = None
     _auth = True
     _queries = {}
+    # Incremental harvests: high-water marks of the last error-free job (None for a full harvest),
+    # the ones read by this job and the identifiers of all the remote datasets
+    _watermarks = None
+    _new_watermarks = None
+    _remote_identifiers = None
     data = None
     config = None
     _field_mapping_info = {
@@ -145,9 +174,25 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
             
             if not isinstance(credentials['port'], int):
                 raise ValueError('"port" must be an integer')
-        else:
+        elif self._credentials_required:
             raise ValueError("credentials must exist and be a dictionary with the following structure: {'user': 'username', 'password': 'password', 'host': 'hostname', 'port': port_number, 'db': 'database'}")
 
+        if 'fetch_size' in config_obj:
+            if not isinstance(config_obj['fetch_size'], int) or config_obj['fetch_size'] < 1:
+                raise ValueError('fetch_size must be a positive integer')
+
+        if 'statement_timeout' in config_obj:
+            if not isinstance(config_obj['statement_timeout'], int) or config_obj['statement_timeout'] < 1:
+                raise ValueError('statement_timeout must be a positive integer (seconds)')
+
+        if 'incremental' in config_obj:
+            incremental = config_obj['incremental']
+            if not isinstance(incremental, dict) or not all(
+                isinstance(table, str) and len(table.split('.')) == 2 and isinstance(column, str) and column
+                for table, column in incremental.items()
+            ):
+                raise ValueError('incremental must be a dictionary of "<schema>.<table>": "<column>"')
+
         # Check if 'field_mapping_schema_version' exists in the config
         field_mapping_schema_version_error_message = f'Insert the schema version: "field_mapping_schema_version: <version>", one of: {", ".join(map(str, self._field_mapping_validator_versions))} . More info: https://github.com/mjanez/ckanext-schemingdcat?tab=readme-ov-file#remote-google-sheetonedrive-excel-metadata-upload-harvester'
         if 'field_mapping_schema_version' not in config_obj:
@@ -193,7 +238,6 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         harvest_source_title = harvest_job.source.title
         source_url = harvest_job.source.url    
         content_dicts = {}
-        self._names_taken = []
         
         log.debug('In SchemingDCATSQLHarvester gather_stage with harvest source: %s and database URL: %s', harvest_source_title, source_url)
         
@@ -208,7 +252,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
             self._database_type = self.config.get("database_type")
             self._auth = self.config.get("auth")
             self._credentials = self.config.get("credentials")
-            credential_keys = ', '.join(self._credentials .keys())
+            credential_keys = ', '.join((self._credentials or {}).keys())
             log.debug('Loaded credentials with keys: %s', credential_keys)
             dataset_id_colname = self.config.get("dataset_id_colname", "dataset_id")
         else:
@@ -269,9 +313,21 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
                 if not field_mappings:
                     return []
 
+        # High-water marks of the last error-free job, if the harvest is incremental
+        self._watermarks = self._get_watermarks(harvest_job)
+        self._new_watermarks = None
+        self._remote_identifiers = None
+        if self._watermarks is not None:
+            log.info('Incremental harvest of the rows modified since: %s', self._watermarks)
+
         # Read database
         if self.db_manager is not None:
-            self.db_manager.check_connection(conn_url)
+            self.db_manager.statement_timeout = self.config.get('statement_timeout', SQL_STATEMENT_TIMEOUT) if self.config else SQL_STATEMENT_TIMEOUT
+            try:
+                self.db_manager.check_connection(conn_url)
+            except ValueError as e:
+                self._save_gather_error('Unable to connect to the database {0}: {1}'.format(self.obfuscate_credentials_in_url(conn_url), e), harvest_job)
+                return []
             log.debug('Connection is ready.')
             content_dicts = self._read_remote_database(field_mappings, conn_url)
             #log.debug('content_dicts %s', content_dicts)
@@ -294,54 +350,14 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         except ReadError as e:
             self._save_gather_error('Error generating default values for dataset/distribution config field mappings: {0}'.format(e), harvest_job)
         
-        # Check if the content_dicts colnames correspond to the local schema
-        try:
-            #log.debug('content_dicts: %s', content_dicts)
-            # Standardizes the field names
-            content_dicts['datasets'], remote_dataset_field_mapping = self._standardize_df_fields_from_field_mapping(content_dicts['datasets'], field_mappings.get('dataset_field_mapping'))
-            content_dicts['distributions'], remote_distribution_field_mapping = self._standardize_df_fields_from_field_mapping(content_dicts['distributions'], field_mappings.get('distribution_field_mapping'))
-            
-            # Validate field names
-            remote_dataset_field_names = set(content_dicts['datasets'].columns)
-            remote_resource_field_names = set(content_dicts['distributions'].columns)
-
-            self._validate_remote_schema(remote_dataset_field_names=remote_dataset_field_names, remote_ckan_base_url=None, remote_resource_field_names=remote_resource_field_names, remote_dataset_field_mapping=remote_dataset_field_mapping, remote_distribution_field_mapping=remote_distribution_field_mapping)
-
-        except RemoteSchemaError as e:
-            self._save_gather_error('Error validating remote schema: {0}'.format(e), harvest_job)
-            return []
-        
-        # before_cleaning interface
-        for harvester in p.PluginImplementations(ISQLHarvester):
-            if hasattr(harvester, 'before_cleaning'):
-                content_dicts, before_cleaning_errors = harvester.before_cleaning(content_dicts, harvest_job, self.config)
-
-                for error_msg in before_cleaning_errors:
-                    self._save_gather_error(error_msg, harvest_job)
+        if self._watermarks is not None and content_dicts.get('datasets') is None:
+            log.info('No datasets modified since the last harvest')
+            clean_datasets = []
+        else:
+            clean_datasets = self._get_clean_datasets(content_dicts, conn_url, field_mappings, harvest_job)
+            if clean_datasets is None:
+                return []
 
-        # Clean tables
-        try:
-            clean_datasets = self._process_content(content_dicts, conn_url, field_mappings)
-            log.debug('"%s" remote database cleaned successfully.', self._database_types_supported[self._database_type]['title'])
-            clean_datasets = self._update_dict_lists(clean_datasets)
-            #log.debug('clean_datasets: %s', clean_datasets)
-            log.debug('Update dict string lists. Number of datasets imported: %s', len(clean_datasets))
-            
-        except Exception as e:
-            self._save_gather_error('Error cleaning the remote database: {0}'.format(e), harvest_job)
-            return []
-    
-        # after_cleaning interface
-        for harvester in p.PluginImplementations(ISQLHarvester):
-            if hasattr(harvester, 'after_cleaning'):
-                clean_datasets, after_cleaning_errors = harvester.after_cleaning(clean_datasets)
-        
-                for error_msg in after_cleaning_errors:
-                    self._save_gather_error(error_msg, harvest_job)
-        
-        # Log the length of clean_datasets after after_cleaning
-        log.debug(f"Length of clean_datasets after_cleaning ISQLHarvester: {len(clean_datasets)}")
-        
         # Add datasets to the database
         try:
             log.debug('Adding datasets to DB')
@@ -349,7 +365,11 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
             source_dataset = model.Package.get(harvest_job.source.id)
             skipped_datasets = 0  # Counter for omitted datasets
             identifier_counts = {}  # To track the frequency of identifiers
-        
+
+            # Load the existing names of the datasets without a name in a single query
+            name_allocator = NameAllocator()
+            name_allocator.preload(dataset.get('title') for dataset in clean_datasets if not dataset.get('name'))
+
             for dataset in clean_datasets:
                 #log.debug('dataset: %s', dataset)
 
@@ -358,11 +378,9 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
                 
                 try:
                     if not dataset.get('name'):
-                        dataset['name'] = self._gen_new_name(dataset['title'])
-                    while dataset['name'] in self._names_taken:
-                        suffix = sum(name.startswith(dataset['name'] + '-') for name in self._names_taken) + 1
-                        dataset['name'] = '{}-{}'.format(dataset['name'], suffix)
-                    self._names_taken.append(dataset['name'])
+                        dataset['name'] = name_allocator.allocate(dataset['title'])
+                    else:
+                        dataset['name'] = name_allocator.reserve(dataset['name'])
         
                     # If the dataset has no identifier, use an UUID
                     if not dataset.get('identifier'):
@@ -416,8 +434,18 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         # Check guids to create/update/delete
         new = guids_in_harvest - guids_in_db
         # Get objects/datasets to delete (ie in the DB but not in the source)
-        delete = set(guids_in_db) - set(guids_in_harvest)
+        if self._watermarks is None:
+            delete = set(guids_in_db) - set(guids_in_harvest)
+        elif self._remote_identifiers is not None:
+            # Incremental harvest: only the modified rows were read, so the datasets to delete
+            # are the ones missing from the key-only listing of the remote datasets
+            delete = set(guids_in_db) - self._remote_identifiers
+        else:
+            delete = set()
         change = guids_in_db & guids_in_harvest
+
+        # Skip the datasets that are identical to the ones already imported
+        change, content_hashes = self._get_changed_guids(harvest_job, change, datasets_to_harvest)
         
         log.debug(f"Number of skipped datasets: {skipped_datasets}")
         log.debug(f'guids_in_harvest ({len(guids_in_harvest)})')
@@ -426,49 +454,87 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         log.debug(f'delete ({len(delete)})')
         log.debug(f'change ({len(change)})')
         
-        ids = []
-        for guid in new:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    extras=[HarvestObjectExtra(key='status', value='new')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in change:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='change')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in delete:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='delete')])
-                model.Session.query(HarvestObject).\
-                    filter_by(guid=guid).\
-                    update({'current': False}, False)
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
+        harvest_objects = self._build_harvest_objects(new, change, delete, datasets_to_harvest, guid_to_package_id, content_hashes)
+
+        try:
+            ids = self._save_harvest_objects(harvest_job, harvest_objects)
+        except Exception as e:
+            self._save_gather_error('Error saving the harvest objects: %r / %s' % (e, traceback.format_exc()), harvest_job)
+            return []
+
+        # Used by the next job only if this one finishes without errors
+        self._save_watermarks(harvest_job, self._new_watermarks)
         
         log.debug('Number of elements in clean_datasets: %s and object_ids: %s', len(clean_datasets), len(ids))
         
         # Log clean_datasets/ ids
         #self._log_export_clean_datasets_and_ids(harvest_source_title, clean_datasets, ids)
 
-        return [id_dict['id'] for id_dict in ids]
+        return ids
     
+    def _get_clean_datasets(self, content_dicts, conn_url, field_mappings, harvest_job):
+        """
+        Validates the remote schema of the content read from the database and cleans it.
+
+        Args:
+            content_dicts (dict): The DataFrames read from the database.
+            conn_url (str): The connection URL of the database.
+            field_mappings (dict): The standardized field mappings.
+            harvest_job (HarvestJob): The harvest job object.
+
+        Returns:
+            list: The cleaned datasets, or None if the content could not be validated or cleaned.
+        """
+        # Check if the content_dicts colnames correspond to the local schema
+        try:
+            #log.debug('content_dicts: %s', content_dicts)
+            # Standardizes the field names
+            content_dicts['datasets'], remote_dataset_field_mapping = self._standardize_df_fields_from_field_mapping(content_dicts['datasets'], field_mappings.get('dataset_field_mapping'))
+            content_dicts['distributions'], remote_distribution_field_mapping = self._standardize_df_fields_from_field_mapping(content_dicts['distributions'], field_mappings.get('distribution_field_mapping'))
+            
+            # Validate field names
+            remote_dataset_field_names = set(content_dicts['datasets'].columns)
+            remote_resource_field_names = set(content_dicts['distributions'].columns)
+
+            self._validate_remote_schema(remote_dataset_field_names=remote_dataset_field_names, remote_ckan_base_url=None, remote_resource_field_names=remote_resource_field_names, remote_dataset_field_mapping=remote_dataset_field_mapping, remote_distribution_field_mapping=remote_distribution_field_mapping)
+
+        except RemoteSchemaError as e:
+            self._save_gather_error('Error validating remote schema: {0}'.format(e), harvest_job)
+            return None
+        
+        # before_cleaning interface
+        for harvester in p.PluginImplementations(ISQLHarvester):
+            if hasattr(harvester, 'before_cleaning'):
+                content_dicts, before_cleaning_errors = harvester.before_cleaning(content_dicts, harvest_job, self.config)
+
+                for error_msg in before_cleaning_errors:
+                    self._save_gather_error(error_msg, harvest_job)
+
+        # Clean tables
+        try:
+            clean_datasets = self._process_content(content_dicts, conn_url, field_mappings)
+            log.debug('"%s" remote database cleaned successfully.', self._database_types_supported[self._database_type]['title'])
+            clean_datasets = self._update_dict_lists(clean_datasets)
+            #log.debug('clean_datasets: %s', clean_datasets)
+            log.debug('Update dict string lists. Number of datasets imported: %s', len(clean_datasets))
+            
+        except Exception as e:
+            self._save_gather_error('Error cleaning the remote database: {0}'.format(e), harvest_job)
+            return None
+    
+        # after_cleaning interface
+        for harvester in p.PluginImplementations(ISQLHarvester):
+            if hasattr(harvester, 'after_cleaning'):
+                clean_datasets, after_cleaning_errors = harvester.after_cleaning(clean_datasets)
+        
+                for error_msg in after_cleaning_errors:
+                    self._save_gather_error(error_msg, harvest_job)
+        
+        # Log the length of clean_datasets after after_cleaning
+        log.debug(f"Length of clean_datasets after_cleaning ISQLHarvester: {len(clean_datasets)}")
+
+        return clean_datasets
+
     def fetch_stage(self, harvest_object):
         # Nothing to do here - we got the package dict in the search in the gather stage
         return True
@@ -500,7 +566,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
             log.error('No harvest object received')
             return False   
         
-        self._set_config(harvest_object.source.config)
+        self._set_harvest_job_context(harvest_object)
         
         if self.force_import:
             status = 'change'
@@ -516,11 +582,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         if status == 'delete':
             override_local_datasets = self.config.get("override_local_datasets", False)
             if override_local_datasets is True:
-                # Delete package
-                context.update({
-                    'ignore_auth': True,
-                })
-                p.toolkit.get_action('package_delete')(context, {'id': harvest_object.package_id})
+                self._delete_package(harvest_object, context)
                 log.info('The override_local_datasets configuration is %s. Package %s deleted with GUID: %s' % (override_local_datasets, harvest_object.package_id, harvest_object.guid))
 
                 return True
@@ -685,6 +747,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         return result
 
     #TODO: método para crear/actualizar los datasets e importado por otros harvesters
+    @deferred_indexing
     def _create_or_update_package(
         self, package_dict, harvest_object, package_dict_form="rest"
     ):
@@ -753,6 +816,8 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
                 "api_version": api_version,
                 "schema": schema,
                 "ignore_auth": True,
+                # In batch import mode the package is indexed later, see `deferred_indexing`
+                "defer_commit": bool(self._get_import_batch_size()),
             }
 
             if self.config and self.config.get("clean_tags", True):
@@ -884,10 +949,11 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
                 context.pop("__auth_audit", None)
 
                 # Set name for new package to prevent name conflict, see issue #117
+                name_allocator = self._get_name_allocator()
                 if package_dict.get("name", None):
-                    package_dict["name"] = self._gen_new_name(package_dict["name"])
+                    package_dict["name"] = name_allocator.allocate(package_dict["name"])
                 else:
-                    package_dict["name"] = self._gen_new_name(package_dict["title"])
+                    package_dict["name"] = name_allocator.allocate(package_dict["title"])
 
                 for resource in package_dict.get("resources", []):
                     if resource["url"] is None or resource["url"] == "" or "url" not in resource:
@@ -939,7 +1005,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
                     )
                     return False
 
-            Session.commit()
+            self._commit_package(context)
 
             return True
 
@@ -958,6 +1024,60 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         return None
 
     # DB methods
+    def _get_watermarks(self, harvest_job):
+        """
+        Gets the high-water marks stored by the last error-free job of the source.
+
+        The harvest is incremental only if the `incremental` option is set, `force_all` is not,
+        and the marks were stored by the last error-free job with the same URL and configuration.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+
+        Returns:
+            dict or None: The high-water marks by table, or None if the source must be fully harvested.
+        """
+        if not self.config or not self.config.get('incremental') or self.config.get('force_all', False):
+            return None
+
+        state = HarvestSourceState.get(harvest_job.source.id, SQL_WATERMARKS_STATE_KEY)
+        if not state:
+            return None
+
+        if state.get('source_hash') != self._get_source_hash(harvest_job.source):
+            log.debug('Harvest source URL or config changed, ignoring the high-water marks')
+            return None
+
+        last_error_free_job = self.last_error_free_job(harvest_job)
+        if not last_error_free_job or state.get('harvest_job_id') != last_error_free_job.id:
+            log.debug('High-water marks were not stored by the last error-free job, ignoring them')
+            return None
+
+        return state.get('watermarks')
+
+    def _save_watermarks(self, harvest_job, watermarks):
+        """
+        Stores the high-water marks read by the current harvest job.
+
+        They are only used by the next job if this one finishes without errors.
+
+        Args:
+            harvest_job (HarvestJob): The current harvest job.
+            watermarks (dict): The high-water marks by table.
+        """
+        if not watermarks:
+            return
+
+        HarvestSourceState.set(
+            harvest_job.source.id,
+            SQL_WATERMARKS_STATE_KEY,
+            {
+                'harvest_job_id': harvest_job.id,
+                'source_hash': self._get_source_hash(harvest_job.source),
+                'watermarks': watermarks,
+            }
+        )
+
     def _save_queries(self):
         raise NotImplementedError("The _save_queries method must be defined in the subclass for the specific database type: {}".format(self._database_type))
 
@@ -1030,7 +1150,7 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         data.columns = data.columns.str.strip().str.replace('\n', '').str.replace('\t', '')
 
         # Remove all fields that are a nan float and trim all spaces of the values
-        data = data.apply(lambda x: x.str.strip() if x.dtype == 'object' else x)
+        data = self._strip_object_columns(data)
         data = data.fillna(value='')
 
         # Convert table to list of dicts
@@ -1051,8 +1171,8 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
         if dataset_id_colname is None:
             dataset_id_colname = 'dataset_id'
 
-        # Select only the columns of type 'object' and apply the strip() method to them
-        data.loc[:, data.dtypes == object] = data.select_dtypes(include=['object']).apply(lambda x: x.str.strip())
+        # Trim all spaces of the values of the columns of type 'object'
+        data = self._strip_object_columns(data)
 
         # Remove rows where dataset_id_colname is None or an empty string
         try:
@@ -1063,44 +1183,11 @@ class SchemingDCATSQLHarvester(SchemingDCATHarvester):
 
         if not data.empty:
             # Group distributions by dataset_id and convert to list of dicts
-            return data.groupby(dataset_id_colname).apply(lambda x: x.to_dict('records')).to_dict()
+            return self._group_records(data, dataset_id_colname)
         else:
             log.debug('No distributions loaded. Check "distribution.%s" fields', dataset_id_colname)
             return None
 
-    def _add_distributions_and_datadictionaries_to_datasets(self, table_datasets, table_distributions_grouped, table_datadictionaries_grouped, identifier_field='identifier', alternate_identifier_field='alternate_identifier', inspire_id_field='inspire_id', datadictionary_id_field="id"):
-        """
-        Add distributions (CKAN resources) and datadictionaries to each dataset object.
-
-        Args:
-            table_datasets (list): List of dataset objects.
-            table_distributions_grouped (dict): Dictionary of distributions grouped by dataset identifier.
-            table_datadictionaries_grouped (dict): Dictionary of datadictionaries grouped by dataset identifier.
-            identifier_field (str, optional): Field name for the identifier. Defaults to 'identifier'.
-            alternate_identifier_field (str, optional): Field name for the alternate identifier. Defaults to 'alternate_identifier'.
-            inspire_id_field (str, optional): Field name for the inspire id. Defaults to 'inspire_id'.
-            datadictionary_id_field (str, optional): Field name for the datadictionary id. Defaults to 'id'.
-
-        Returns:
-            list: List of dataset objects with distributions (CKAN resources) and datadictionaries added.
-        """
-        try:
-            return [
-                {
-                    **d,
-                    'resources': [
-                        {**dr, 'datadictionaries': table_datadictionaries_grouped.get(dr[datadictionary_id_field], []) if table_datadictionaries_grouped else []}
-                        for dr in table_distributions_grouped.get(
-                            d.get(identifier_field) or d.get(alternate_identifier_field) or d.get(inspire_id_field), []
-                        )
-                    ]
-                }
-                for d in table_datasets
-            ]
-        except Exception as e:
-            log.error("Error while adding distributions and datadictionaries to datasets: %s", str(e))
-            raise
-
     def _update_dict_lists(self, data):
         """
         Update the dictionary lists in the given data.
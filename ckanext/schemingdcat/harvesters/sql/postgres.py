@@ -1,9 +1,9 @@
 import logging
+import threading
 import time
 import uuid
 
-import pandas as pd
-import psycopg2
+import ckan.plugins as p
 
 from ckanext.schemingdcat.utils import (
     normalize_temporal_dates,
@@ -12,62 +12,197 @@ from ckanext.schemingdcat.utils import (
     sql_clauses
 )
 from ckanext.schemingdcat.harvesters.sql.base import SchemingDCATSQLHarvester, DatabaseManager
+from ckanext.schemingdcat.interfaces import ISQLHarvester
+from ckanext.schemingdcat.config import (
+    SQL_FETCH_SIZE,
+    SQL_POOL_MIN_CONNECTIONS,
+    SQL_POOL_MAX_CONNECTIONS,
+    SQL_CONNECT_BACKOFF,
+    SQL_CONNECT_MAX_BACKOFF
+)
 
 log = logging.getLogger(__name__)
 
 
+# Connection pools by connection URL, shared by the gathers of the process
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+
 class PostgresDatabaseManager(DatabaseManager):
+    """
+    Runs the harvest queries on PostgreSQL databases.
+
+    Connections are taken from a pool per connection URL (shared by all the gathers of the
+    process) with exponential backoff, and run read-only transactions with a statement timeout.
+    All the queries of a gather run on the connection taken by `connect` until `disconnect`
+    returns it to the pool.
+    """
     connection = None
+    _pool = None
 
-    def connect(self, conn_url):
-        try:
-            self.connection = psycopg2.connect(conn_url)
-        except psycopg2.Error as e:
-            raise ValueError('Error connecting to the database: %s', e)
+    def _get_pool(self, conn_url):
+        """
+        Returns the connection pool of a connection URL, creating it if needed.
+        """
+        from psycopg2.pool import ThreadedConnectionPool
+
+        pool_key = (conn_url, self.statement_timeout)
+        with _connection_pools_lock:
+            pool = _connection_pools.get(pool_key)
+            if pool is None or pool.closed:
+                pool = ThreadedConnectionPool(
+                    SQL_POOL_MIN_CONNECTIONS,
+                    SQL_POOL_MAX_CONNECTIONS,
+                    dsn=conn_url,
+                    options='-c statement_timeout=%s' % (int(self.statement_timeout) * 1000),
+                )
+                _connection_pools[pool_key] = pool
+
+        return pool
+
+    def _get_connection(self, conn_url):
+        """
+        Takes a connection from the pool, discarding the ones closed by the server.
+        """
+        pool = self._get_pool(conn_url)
+        connection = pool.getconn()
+        if connection.closed:
+            pool.putconn(connection, close=True)
+            connection = pool.getconn()
+
+        # The harvester only reads, so the transactions are read-only
+        connection.set_session(readonly=True, autocommit=False)
+
+        return pool, connection
+
+    def connect(self, conn_url, retry=None):
+        """
+        Takes a pooled connection to the database, retrying with exponential backoff.
+
+        Args:
+            conn_url (str): The connection URL.
+            retry (int, optional): The number of retries. Defaults to the `_retry` of the manager.
+
+        Raises:
+            ValueError: If no connection could be established.
+        """
+        import psycopg2
+        from psycopg2.pool import PoolError
+
+        if self.connection is not None:
+            return
 
-    def check_connection(self, conn_url, retry=None):
         if retry is None:
             retry = self._retry
-        elif retry == 0:
-            log.info('Giving up after 5 tries...')
-            raise ValueError('Unable to connect to the database after %s retries.', retry)
 
-        try:
-            connection = psycopg2.connect(conn_url)
-        except psycopg2.Error as e:
-            log.debug(str(e))
-            log.info('Unable to connect to the database, waiting...')
-            time.sleep(10)
-            self.check_connection(conn_url, retry=retry - 1)
-        else:
-            connection.close()
-    
+        delay = SQL_CONNECT_BACKOFF
+        for attempt in range(retry + 1):
+            try:
+                self._pool, self.connection = self._get_connection(conn_url)
+                return
+            except (psycopg2.Error, PoolError) as e:
+                log.debug(str(e))
+                if attempt == retry:
+                    log.info('Giving up after %s tries...', retry + 1)
+                    raise ValueError('Unable to connect to the database after %s retries: %s' % (retry, e))
+
+                log.info('Unable to connect to the database, retrying in %s seconds...', delay)
+                time.sleep(delay)
+                delay = min(delay * 2, SQL_CONNECT_MAX_BACKOFF)
+
+    def check_connection(self, conn_url, retry=None):
+        """
+        Checks that the database is reachable, taking the pooled connection used by the gather.
+        """
+        self.connect(conn_url, retry)
+
     def disconnect(self):
-        if self.connection:
-            self.connection.close()
+        """
+        Ends the transaction and returns the connection to the pool.
+        """
+        if self.connection is None:
+            return
+
+        try:
+            if not self.connection.closed:
+                self.connection.rollback()
+            self._pool.putconn(self.connection, close=bool(self.connection.closed))
+        except Exception as e:
+            log.debug('Error returning the connection to the pool: %s', e)
+        finally:
             self.connection = None
+            self._pool = None
 
     def execute_query(self, query):
+        import psycopg2
+
         if not self.connection:
-            try:
-                self.connect()
-            except psycopg2.Error as e: 
-                raise ValueError('Database connection is not established: %s' % e)
+            raise ValueError('Database connection is not established')
+
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query)
-            
-            # Always select queries, only fetchall is required.
-            results = cursor.fetchall()
-            
-            # Obtener los nombres de las columnas de la consulta
-            column_names = [desc[0] for desc in cursor.description]
-            
-            cursor.close()
-            
+            with self.connection.cursor() as cursor:
+                cursor.execute(query)
+
+                # Always select queries, only fetchall is required.
+                results = cursor.fetchall()
+
+                # Obtener los nombres de las columnas de la consulta
+                column_names = [desc[0] for desc in cursor.description]
+
             # Retornar tanto los resultados como los nombres de las columnas
             return results, column_names
         except psycopg2.Error as e:
+            self.connection.rollback()
+            raise ValueError('Error executing query: %s' % e)
+
+    def execute_query_chunks(self, query, chunk_size=SQL_FETCH_SIZE):
+        """
+        Executes a query with a server-side (named) cursor and yields its results in chunks,
+        so the whole result set is never loaded in memory.
+
+        A leading `SET search_path` statement is executed first with a regular cursor, as a
+        named cursor only accepts a single SELECT.
+
+        Args:
+            query (str): The query to execute.
+            chunk_size (int, optional): The number of rows fetched at a time. Defaults to SQL_FETCH_SIZE.
+
+        Yields:
+            tuple: The rows of the chunk and the column names.
+        """
+        import psycopg2
+
+        if not self.connection:
+            raise ValueError('Database connection is not established')
+
+        statements = query.split(';', 1)
+        if len(statements) == 2 and statements[0].strip().upper().startswith('SET '):
+            set_statement, query = statements
+        else:
+            set_statement = None
+
+        try:
+            if set_statement:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(set_statement)
+
+            with self.connection.cursor(name='schemingdcat_%s' % uuid.uuid4().hex) as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(query)
+
+                column_names = None
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if column_names is None:
+                        column_names = [desc[0] for desc in cursor.description]
+                    if not rows:
+                        break
+                    yield rows, column_names
+
+            self.connection.commit()
+        except psycopg2.Error as e:
+            self.connection.rollback()
             raise ValueError('Error executing query: %s' % e)
 
 # TODO: PostgreSQL Harvester
@@ -85,8 +220,15 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
             'description': 'A PostgreSQL database harvester for CKAN'
         }
     
-    db_manager = PostgresDatabaseManager()
+    db_manager = None
     harvester_type = 'postgres'
+    # Cleaned records of the datasets and distributions read chunk by chunk, see `_read_remote_database`
+    _streamed_records = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Each harvester instance holds its own gather connection, the pools are shared
+        self.db_manager = PostgresDatabaseManager()
         
     def _generate_conn_url(self):
         '''
@@ -119,22 +261,39 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
             field_mappings (dict): Dictionary defining database fields mapping to desired structure.
             conn_url (str): Connection URL for the remote database.
 
+        Without ISQLHarvester plugins, which receive the DataFrames read, the datasets and
+        distributions are cleaned chunk by chunk and only their records (grouped by dataset, for
+        the distributions) are kept in `_streamed_records`. Their DataFrames then only hold the
+        columns, to validate the remote schema.
+
         Returns:
             dict: Dictionary containing lists of data categorized by keys in field_mappings, with data as pd.DataFrames or None.
 
         Raises:
             ValueError: If database connection cannot be established.
         """
-                
-        if not self.db_manager.connection:
-            try:
-                self.db_manager.connect(conn_url)
-            except psycopg2.Error as e:
-                raise ValueError(f"Database connection is not established: {e}") from e
-        
-        # Create queries
-        self._save_queries(field_mappings)
-        log.debug('Field mappings queries: %s', self._queries)
+        # Lazy import: the harvester is also loaded by web workers that never harvest
+        import pandas as pd
+
+        # Reuse the connection taken by check_connection, all the queries run on it
+        self.db_manager.connect(conn_url)
+
+        try:
+            # The new high-water marks are read before the rows, so no modification is missed
+            incremental_tables = self.config.get('incremental') if self.config else None
+            if incremental_tables:
+                self._new_watermarks = self._read_watermarks(incremental_tables)
+
+            # Create queries
+            self._save_queries(field_mappings)
+            log.debug('Field mappings queries: %s', self._queries)
+
+            # Key-only listing of the remote datasets, to reconcile deletions of incremental harvests
+            if self._watermarks is not None:
+                self._remote_identifiers = self._read_remote_identifiers(field_mappings.get('dataset_field_mapping'))
+        except Exception:
+            self.db_manager.disconnect()
+            raise
         
         # Mapping for content categories
         content_category_mapping = {
@@ -143,27 +302,41 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
             "datadictionary_field_mapping": "datadictionaries"
         }
         
+        # The results are read with a server-side cursor, fetch_size rows at a time, and each
+        # chunk is converted to a DataFrame, so the rows are never all loaded as tuples
+        fetch_size = self.config.get('fetch_size', SQL_FETCH_SIZE) if self.config else SQL_FETCH_SIZE
+
+        self._streamed_records = {} if not list(p.PluginImplementations(ISQLHarvester)) else None
+        streamed_columns = {}
+
         content_dicts = {value: [] for value in content_category_mapping.values()}
-        for mapping, query in self._queries.items():
-            results, column_names = self.db_manager.execute_query(query)
-            results_df = pd.DataFrame(results, columns=column_names, dtype=str).fillna('')
-
-            # # Exporting the DataFrame to a CSV file
-            # log.debug('export to output.csv')
-            # filename = f'output_{mapping}.csv'
-            # results_df.to_csv(filename, index=False)
-            
-            # Map the result to the correct category in the results dictionary
-            # Only add results_df if it is not empty
-            if mapping in content_category_mapping and not results_df.empty:
-                content_dicts[content_category_mapping[mapping]].append(results_df)
-                            
-        self.db_manager.disconnect()
+        try:
+            for mapping, query in self._queries.items():
+                if mapping not in content_category_mapping:
+                    continue
+
+                key = content_category_mapping[mapping]
+                for results, column_names in self.db_manager.execute_query_chunks(query, fetch_size):
+                    results_df = pd.DataFrame(results, columns=column_names, dtype=str).fillna('')
+
+                    # Only add results_df if it is not empty
+                    if results_df.empty:
+                        continue
+
+                    if self._streamed_records is not None and key in ('datasets', 'distributions'):
+                        streamed_columns[key] = column_names
+                        self._add_streamed_records(key, results_df)
+                    else:
+                        content_dicts[key].append(results_df)
+        finally:
+            self.db_manager.disconnect()
         
         # Convert lists of DataFrames to single DataFrames for each category
         for key in content_dicts:
-            if content_dicts[key]:
-                concatenated_df = pd.concat(content_dicts[key], ignore_index=True)
+            if key in streamed_columns:
+                content_dicts[key] = pd.DataFrame(columns=streamed_columns[key])
+            elif content_dicts[key]:
+                concatenated_df = pd.concat(content_dicts[key], ignore_index=True, copy=False)
                 # Assign None if the concatenated DataFrame is empty
                 content_dicts[key] = concatenated_df if not concatenated_df.empty else None
             else:
@@ -171,6 +344,23 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
         
         return content_dicts
 
+    def _add_streamed_records(self, key, data):
+        """
+        Cleans a chunk of datasets or distributions and adds its records to `_streamed_records`.
+
+        Args:
+            key (str): 'datasets' or 'distributions'.
+            data (pandas.DataFrame): The chunk read from the database.
+        """
+        if key == 'datasets':
+            self._streamed_records.setdefault(key, []).extend(self._clean_table_datasets(data))
+            return
+
+        dataset_id_colname = self._field_mapping_info['distribution_field_mapping'].get('parent_resource_id')
+        distributions_grouped = self._streamed_records.setdefault(key, {})
+        for dataset_id, records in (self._clean_table_distributions(data, dataset_id_colname) or {}).items():
+            distributions_grouped.setdefault(dataset_id, []).extend(records)
+
     def _process_content(self, content_dicts, conn_url, field_mapping):
         """
         Processes the SQL query content_dicts based on the field_mapping, handling multilingual fields by appending -lang to the original field name for each available language.
@@ -178,12 +368,19 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
         
         log.debug('In SchemingDCATPostgresHarvester process_content: %s', self.obfuscate_credentials_in_url(conn_url))
         
+        streamed_records = self._streamed_records or {}
+
         # Clean datasets
-        table_datasets = self._clean_table_datasets(content_dicts['datasets'])
+        if 'datasets' in streamed_records:
+            table_datasets = streamed_records['datasets']
+        else:
+            table_datasets = self._clean_table_datasets(content_dicts['datasets'])
         
         # Clean distributions
         dataset_id_colname = self._field_mapping_info['distribution_field_mapping'].get('parent_resource_id')
-        if content_dicts.get('distributions') is not None and not content_dicts['distributions'].empty:
+        if streamed_records.get('distributions'):
+            table_distributions_grouped = streamed_records['distributions']
+        elif content_dicts.get('distributions') is not None and not content_dicts['distributions'].empty:
             table_distributions_grouped = self._clean_table_distributions(content_dicts['distributions'], dataset_id_colname)
         else:
             log.debug('No distributions loaded. Check "distribution.%s" fields', dataset_id_colname)
@@ -256,6 +453,9 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
             ValueError: For required but None field mappings.
             RuntimeError: For errors in query construction.
         """
+        # Incremental harvests only read the rows modified since the last high-water marks
+        predicates = self._get_incremental_predicates(field_mappings) if self._watermarks is not None else {}
+
         try:
             for query_type, field_mapping in field_mappings.items():
                 # Retrieve the mapping info for the current query type
@@ -270,7 +470,7 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
                 elif not mapping_info["required"] and field_mapping is None:
                     continue
 
-                query = self._build_query(field_mapping)
+                query = self._build_query(field_mapping, predicates.get(query_type))
                 # Ensure that self._queries[query_type] is a dictionary
                 if query_type not in self._queries:
                     self._queries[query_type] = {}
@@ -279,7 +479,7 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
         except Exception as e:
             raise RuntimeError("Error generating queries") from e
 
-    def _build_query(self, field_mapping):
+    def _build_query(self, field_mapping, where=None):
       """
       Constructs a SQL query based on the provided field mapping, considering both direct field names
       and nested field names within language-specific dictionaries.
@@ -289,6 +489,7 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
           the database schema, table, and column names, as well as foreign key references
           and whether the field is a primary key. Field names can be direct strings or nested
           within language-specific dictionaries under a 'languages' key.
+        where (str, optional): A predicate to filter the rows (e.g. the high-water mark of incremental harvests). Defaults to None.
 
       Returns:
         str: A SQL query string constructed based on the field mapping.
@@ -324,6 +525,8 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
         # Assuming schema and table are defined; this might need adjustment based on actual use case
         base_query = f"SELECT {', '.join(query_components['selects'])} FROM {schema}.{table}"
         full_query = ' '.join([search_path, base_query] + query_components['joins'])
+        if where:
+          full_query = f"{full_query} WHERE {where}"
 
         log.debug('full_query:%s', full_query)
 
@@ -332,6 +535,141 @@ class SchemingDCATPostgresHarvester(SchemingDCATSQLHarvester):
       except Exception as e:
         raise RuntimeError("Error generating SQL query") from e
     
+    @staticmethod
+    def _get_mapping_table(field_mapping):
+        """
+        Returns the `<schema>.<table>` the query of a field mapping selects from (the table of its last field).
+        """
+        table = None
+        for details in (field_mapping or {}).values():
+            field_names = [details.get('field_name')] + [lang_details.get('field_name') for lang_details in details.get('languages', {}).values()]
+            for field_name in field_names:
+                if isinstance(field_name, str):
+                    table = field_name.rsplit('.', 1)[0]
+
+        return table
+
+    @staticmethod
+    def _get_mapping_column(field_mapping, field):
+        """
+        Returns the `<schema>.<table>.<column>` mapped to a field, if it is a single column.
+        """
+        field_name = (field_mapping or {}).get(field, {}).get('field_name')
+        return field_name if isinstance(field_name, str) and len(field_name.split('.')) == 3 else None
+
+    @staticmethod
+    def _quote_literal(value):
+        """
+        Returns a value as a SQL literal, strings are quoted.
+        """
+        if isinstance(value, (int, float)):
+            return str(value)
+
+        return "'%s'" % str(value).replace("'", "''")
+
+    def _get_watermark_predicate(self, table, column):
+        """
+        Returns the predicate of the rows of a table modified after its high-water mark.
+        """
+        watermark = self._watermarks.get(table)
+        if watermark is None:
+            # The table was empty in the last harvest, all its rows are new
+            return f"{table}.{column} IS NOT NULL"
+
+        return f"{table}.{column} > {self._quote_literal(watermark)}"
+
+    def _get_incremental_predicates(self, field_mappings):
+        """
+        Builds the predicates of the queries of an incremental harvest.
+
+        The datasets are read if their row is modified or, if the distributions table is also
+        incremental, if any of their distributions is modified. All the distributions of the
+        datasets read are selected, so updated datasets keep their unmodified resources. The link
+        between both tables is the `f_key_references` of the distribution parent field (or the
+        dataset `identifier` column).
+
+        Args:
+            field_mappings (dict): The standardized field mappings.
+
+        Returns:
+            dict: The predicate of each field mapping query that must be filtered.
+        """
+        incremental_tables = self.config.get('incremental', {})
+        dataset_mapping = field_mappings.get('dataset_field_mapping')
+        distribution_mapping = field_mappings.get('distribution_field_mapping')
+        dataset_table = self._get_mapping_table(dataset_mapping)
+        distribution_table = self._get_mapping_table(distribution_mapping)
+
+        if dataset_table not in incremental_tables:
+            log.warning('The dataset table %s is not in the "incremental" option, reading all its rows', dataset_table)
+            return {}
+
+        dataset_predicates = [self._get_watermark_predicate(dataset_table, incremental_tables[dataset_table])]
+
+        # Link between the distributions and the dataset table
+        parent_column = self._get_mapping_column(distribution_mapping, self._field_mapping_info['distribution_field_mapping']['parent_resource_id'])
+        dataset_key = None
+        if parent_column:
+            references = distribution_mapping[self._field_mapping_info['distribution_field_mapping']['parent_resource_id']].get('f_key_references') or []
+            dataset_key = references[0] if references else self._get_mapping_column(dataset_mapping, 'identifier')
+            if dataset_key and dataset_key.rsplit('.', 1)[0] != dataset_table:
+                dataset_key = None
+
+        if dataset_key and distribution_table in incremental_tables:
+            distribution_predicate = self._get_watermark_predicate(distribution_table, incremental_tables[distribution_table])
+            dataset_predicates.append(f"{dataset_key} IN (SELECT {parent_column} FROM {distribution_table} WHERE {distribution_predicate})")
+
+        dataset_predicate = ' OR '.join(dataset_predicates)
+        predicates = {'dataset_field_mapping': dataset_predicate}
+        if dataset_key:
+            predicates['distribution_field_mapping'] = f"{parent_column} IN (SELECT {dataset_key} FROM {dataset_table} WHERE {dataset_predicate})"
+        elif distribution_mapping:
+            log.warning('No link between the distributions and the dataset table %s, reading all the distributions', dataset_table)
+
+        return predicates
+
+    def _read_watermarks(self, incremental_tables):
+        """
+        Reads the current high-water mark (the maximum of the modification column) of each incremental table.
+
+        Args:
+            incremental_tables (dict): The modification column by `<schema>.<table>`.
+
+        Returns:
+            dict: The high-water mark of each table (a number or a string), or None if the table is empty.
+        """
+        watermarks = {}
+        for table, column in incremental_tables.items():
+            results, _ = self.db_manager.execute_query(f"SELECT MAX({table}.{column}) FROM {table}")
+            watermark = results[0][0] if results else None
+            # Numbers are kept as numbers, other values (e.g. timestamps) are compared as strings
+            watermarks[table] = watermark if watermark is None or isinstance(watermark, (int, float)) else str(watermark)
+
+        log.debug('High-water marks: %s', watermarks)
+        return watermarks
+
+    def _read_remote_identifiers(self, dataset_mapping):
+        """
+        Reads the identifiers of all the remote datasets with a key-only query.
+
+        Args:
+            dataset_mapping (dict): The standardized dataset field mapping.
+
+        Returns:
+            set or None: The identifiers, or None if `identifier` is not mapped to a column (no dataset is deleted).
+        """
+        identifier_column = self._get_mapping_column(dataset_mapping, 'identifier')
+        if not identifier_column:
+            log.warning('"identifier" is not mapped to a column, the deleted datasets are not reconciled')
+            return None
+
+        identifiers = set()
+        table = identifier_column.rsplit('.', 1)[0]
+        for results, _ in self.db_manager.execute_query_chunks(f"SELECT {identifier_column} FROM {table}"):
+            identifiers.update(str(row[0]).strip() for row in results if row[0] is not None)
+
+        return identifiers
+
     def _build_select_clause(self, schema, table, column, alias):
         """
         Builds a SELECT clause for a SQL query.
@@ -1,28 +1,140 @@
 import logging
+import os
 import sqlite3
+import time
+from urllib.parse import urlparse, unquote, quote
 
-from ckanext.schemingdcat.harvesters.sql.base import SchemingDCATSQLHarvester, DatabaseManager
+from ckantoolkit import config
+
+from ckanext.schemingdcat.harvesters.sql.base import DatabaseManager
+from ckanext.schemingdcat.harvesters.sql.postgres import SchemingDCATPostgresHarvester
+from ckanext.schemingdcat.config import (
+    SQL_FETCH_SIZE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE
+)
 
 log = logging.getLogger(__name__)
 
+# Number of SQLite virtual machine instructions between statement timeout checks
+SQLITE_PROGRESS_INSTRUCTIONS = 100000
+
+# Directory of the database files that can be harvested, no file can be harvested if not set
+SQLITE_BASE_PATH_CONFIG = 'ckanext.schemingdcat.sqlite_harvester.base_path'
+
 
 class SqliteDatabaseManager(DatabaseManager):
-    def connect(self):
-        self._connection = sqlite3.connect(self.db_path)
+    """
+    Runs the harvest queries on SQLite database files.
+
+    The database is opened read-only (`mode=ro` URI) with memory-mapped I/O, and the
+    statement timeout is enforced with a progress handler.
+    """
+    connection = None
+
+    def connect(self, conn_url, retry=None):
+        """
+        Opens the database read-only.
+
+        Args:
+            conn_url (str): The `file:` URI of the database.
+            retry (int, optional): Unused, opening a local file is not retried.
+
+        Raises:
+            ValueError: If the database cannot be opened.
+        """
+        if self.connection is not None:
+            return
+
+        try:
+            connection = sqlite3.connect(conn_url, uri=True)
+            connection.execute('PRAGMA query_only = ON')
+            connection.execute(f'PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}')
+            connection.execute(f'PRAGMA cache_size = -{int(SQLITE_CACHE_SIZE // 1024)}')
+            connection.execute('PRAGMA temp_store = MEMORY')
+            # Check that the file is a database, opening it is lazy
+            connection.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        except sqlite3.Error as e:
+            raise ValueError('Unable to open the database: %s' % e)
+
+        self.connection = connection
+
+    def check_connection(self, conn_url, retry=None):
+        """
+        Checks that the database can be opened, keeping the connection used by the gather.
+        """
+        self.connect(conn_url, retry)
 
     def disconnect(self):
-        if self._connection:
-            self._connection.close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _set_deadline(self):
+        """
+        Interrupts the statements that run longer than the statement timeout.
+        """
+        deadline = time.monotonic() + self.statement_timeout
+        self.connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_INSTRUCTIONS)
 
     def execute_query(self, query):
-        pass
+        if not self.connection:
+            raise ValueError('Database connection is not established')
+
+        cursor = self.connection.cursor()
+        try:
+            self._set_deadline()
+            cursor.execute(query)
+            results = cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+
+            return results, column_names
+        except sqlite3.Error as e:
+            raise ValueError('Error executing query: %s' % e)
+        finally:
+            cursor.close()
+            self.connection.set_progress_handler(None, 0)
+
+    def execute_query_chunks(self, query, chunk_size=SQL_FETCH_SIZE):
+        """
+        Executes a query and yields its results in chunks of `chunk_size` rows.
 
-# TODO: SQLite Harvester using interfaces
-class SchemingDCATSQLiteHarvester(SchemingDCATSQLHarvester):
+        Args:
+            query (str): The query to execute.
+            chunk_size (int, optional): The number of rows fetched at a time. Defaults to SQL_FETCH_SIZE.
+
+        Yields:
+            tuple: The rows of the chunk and the column names.
+        """
+        if not self.connection:
+            raise ValueError('Database connection is not established')
+
+        cursor = self.connection.cursor()
+        cursor.arraysize = chunk_size
+        try:
+            self._set_deadline()
+            cursor.execute(query)
+            column_names = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield rows, column_names
+        except sqlite3.Error as e:
+            raise ValueError('Error executing query: %s' % e)
+        finally:
+            cursor.close()
+            self.connection.set_progress_handler(None, 0)
+
+
+class SchemingDCATSQLiteHarvester(SchemingDCATPostgresHarvester):
     """
     A custom harvester for harvesting SQLite databases using the schemingdcat extension.
 
-    It extends the base `SchemingDCATSQLHarvester` class.
+    It uses the queries and field mappings of the PostgreSQL harvester. The source URL is
+    the path of the database file (or a `file://` URL), within the directory set in
+    `ckanext.schemingdcat.sqlite_harvester.base_path`, and the tables are referenced with
+    the `main` schema, e.g. `main.datasets.title`.
     """
 
     def info(self):
@@ -31,7 +143,87 @@ class SchemingDCATSQLiteHarvester(SchemingDCATSQLHarvester):
             'title': 'SQLite Database Harvester',
             'description': 'An SQLite database harvester for CKAN'
         }
-    
-    db_manager = SqliteDatabaseManager()
+
+    harvester_type = 'sqlite'
+    _credentials_required = False
     _db_path = None
-    _connection = None
\ No newline at end of file
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.db_manager = SqliteDatabaseManager()
+
+    def _get_db_path(self, source_url):
+        """
+        Returns the real path of the database file of a source URL.
+
+        Relative paths are resolved from the base path, and symbolic links are followed before
+        checking that the file is within it.
+
+        Args:
+            source_url (str): The path of the database file or a `file://` URL.
+
+        Returns:
+            str: The real path of the database file.
+
+        Raises:
+            ValueError: If the base path is not configured or the file is outside it.
+        """
+        base_path = config.get(SQLITE_BASE_PATH_CONFIG)
+        if not base_path:
+            raise ValueError(f'The SQLite harvester requires the "{SQLITE_BASE_PATH_CONFIG}" option with the directory of the database files.')
+        base_path = os.path.realpath(base_path)
+
+        parsed_url = urlparse(source_url)
+        path = unquote(parsed_url.path) if parsed_url.scheme == 'file' else source_url
+        db_path = os.path.realpath(os.path.join(base_path, path))
+
+        if os.path.commonpath([base_path, db_path]) != base_path:
+            raise ValueError(f'The database file "{db_path}" is outside the directory "{base_path}" of the SQLite harvester.')
+
+        return db_path
+
+    def _generate_conn_url(self):
+        '''
+        Generates the read-only `file:` URI of the database from the harvest source URL.
+
+        Returns:
+            str: The database URI.
+
+        Raises:
+            ValueError: If the database type is not supported.
+        '''
+        if self._database_type != self.harvester_type:
+            raise ValueError('Database type not supported.')
+
+        return f'file:{quote(self._db_path)}?mode=ro'
+
+    def _validate_source_url(self, harvest_job, source_url):
+        """
+        Validates that the source URL is the path of a readable database file.
+
+        Args:
+            harvest_job (HarvestJob): The harvest job object.
+            source_url (str): The source URL to validate.
+
+        Returns:
+            bool: True if the database file exists and is readable, False otherwise.
+        """
+        try:
+            self._db_path = self._get_db_path(source_url)
+        except ValueError as e:
+            self._save_gather_error(str(e), harvest_job)
+            return False
+
+        if not os.path.isfile(self._db_path) or not os.access(self._db_path, os.R_OK):
+            self._save_gather_error(f'The database file "{self._db_path}" does not exist or is not readable.', harvest_job)
+            return False
+
+        return True
+
+    def _build_select_clause(self, schema, table, column, alias):
+        # The spatial expressions of the PostgreSQL harvester need PostGIS
+        return f"{schema}.{table}.{column} AS {alias}"
+
+    def _set_search_path(self, schemas):
+        # The tables are always referenced with their schema (main)
+        return ''
@@ -4,22 +4,21 @@ import logging
 import re
 import uuid
 import base64
+import hashlib
 import traceback
 import six
 import dateutil
 
-import gspread
-import pandas as pd
-
 from ckan.logic import NotFound, get_action
 from ckan import logic
 import ckan.plugins as p
 import ckan.model as model
 
-from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
+from ckanext.harvest.model import HarvestObject
 from ckanext.schemingdcat.harvesters.base import SchemingDCATHarvester, RemoteResourceError, ReadError, RemoteSchemaError
 from ckanext.schemingdcat.interfaces import ISchemingDCATHarvester
 from ckanext.schemingdcat.lib.field_mapping import FieldMappingValidator
+from ckanext.schemingdcat.lib.name_allocator import NameAllocator
 
 from ckanext.schemingdcat.config import (
     COMMON_DATE_FORMATS,
@@ -63,7 +62,7 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
     _storage_type = None
     _auth = False
     _credentials = None
-    _names_taken = []
+    _remote_validators = None
 
     def _set_config_credentials(self, storage_type, config_obj):
         """
@@ -199,45 +198,71 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         df.columns = col_names
         return df
    
-    def _read_remote_sheet(self, url, sheet_name, storage_type, engine='openpyxl', harvest_job=None):
+    def _read_remote_workbook(self, url, sheet_names, storage_type, engine='openpyxl', harvest_job=None, validators=None):
         """
-        Reads an Excel sheet from a given URL and returns the data as a pandas DataFrame.
+        Reads several sheets of a remote workbook, downloading and opening it only once.
+
+        The validators of the remote workbook (ETag, Last-Modified, SHA-256) are stored in
+        `self._remote_validators`.
 
         Args:
             url (str): The URL of the Excel file.
-            sheet_name (str): The name of the sheet to read.
+            sheet_names (list): The names of the sheets to read.
             storage_type (str): The type of storage where the Excel file is located. Supported types are 'onedrive', 'gspread', and 'gdrive'.
             engine (str, optional): The engine to use for reading the Excel file. Defaults to 'openpyxl'.
+            harvest_job (HarvestJob, optional): The harvest job used to report gather errors.
+            validators (dict, optional): The validators of a previous read. If the remote workbook
+                has not changed since then, no sheet is read.
 
         Returns:
-            pandas.DataFrame: The data from the specified sheet as a DataFrame.
+            dict or None: A dictionary mapping each sheet name to its data as a pandas DataFrame,
+                or None if the workbook has not changed.
 
         Raises:
-            ReadError: If there is an error reading the sheet.
+            ReadError: If there is an error reading the workbook or any of the sheets.
 
         """
+        # pandas is only imported when the sheets are read, not when the harvester is loaded
+        import pandas as pd
+
+        sheet_names = list(dict.fromkeys(sheet_names))
+        validators = validators or {}
+
         try:
             if storage_type == 'onedrive':
-                if self.auth and self._credentials:
-                    # TODO: Implement the read_excel_sheet method for Onedrive Auth
-                    pass
-                else:
-                    try:
-                        data = pd.read_excel(url, sheet_name=sheet_name, dtype=str, engine=engine)
-                    except pd.errors.ParserError as e:
-                        error_msg = f'Error reading sheet {sheet_name} using URL {url}. Error: {str(e)}'
-                        self._save_gather_error(error_msg, harvest_job)
-                        raise ReadError(error_msg)
+                # TODO: Implement the workbook download for Onedrive Auth, shared links are downloaded anonymously
+                ssl_verify = self.config.get('ssl_verify', True) if self.config else True
+                try:
+                    workbook, self._remote_validators = self._download_remote_file(url, validators=validators, ssl_verify=ssl_verify)
+                    if workbook is None:
+                        return None
+
+                    with workbook:
+                        data = pd.read_excel(workbook, sheet_name=sheet_names, dtype=str, engine=engine)
+                except (RemoteResourceError, pd.errors.ParserError, ValueError) as e:
+                    error_msg = f'Error reading sheets {sheet_names} using URL {url}. Error: {str(e)}'
+                    self._save_gather_error(error_msg, harvest_job)
+                    raise ReadError(error_msg)
 
             elif storage_type in ['gspread', 'gdrive']:
+                import gspread
+
                 if self._auth and self._credentials:
                     try:
                         gc = gspread.service_account_from_dict(self._credentials)
                         sh = gc.open_by_url(url)
-                        worksheet = sh.worksheet(sheet_name)
-                        data = pd.DataFrame(worksheet.get_all_records(), dtype=str)
+                        data = {
+                            sheet_name: pd.DataFrame(sh.worksheet(sheet_name).get_all_records(), dtype=str)
+                            for sheet_name in sheet_names
+                        }
+                        sha256 = hashlib.sha256()
+                        for sheet_name in sheet_names:
+                            sha256.update(data[sheet_name].to_csv(index=False).encode('utf-8'))
+                        self._remote_validators = {'sha256': sha256.hexdigest()}
+                        if validators.get('sha256') == self._remote_validators['sha256']:
+                            return None
                     except gspread.exceptions.APIError as e:
-                        msg_error = f'Error reading sheet {sheet_name} using URL {url}. Error: {str(e)}. If the file is an XLS file, it needs to be converted to a Google Sheet.'
+                        msg_error = f'Error reading sheets {sheet_names} using URL {url}. Error: {str(e)}. If the file is an XLS file, it needs to be converted to a Google Sheet.'
                         self._save_gather_error(msg_error, harvest_job)
                         raise ReadError(msg_error)
                 else:
@@ -250,10 +275,32 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
                 self._save_gather_error(msg_error, harvest_job)
                 raise ValueError(msg_error)
 
-            return data.fillna('')
+            return {sheet_name: df.fillna('') for sheet_name, df in data.items()}
 
         except Exception as e:
-            raise ReadError(f'Error reading sheet {sheet_name} using URL {url}. Error: {str(e)}')
+            raise ReadError(f'Error reading sheets {sheet_names} using URL {url}. Error: {str(e)}')
+
+    def _read_remote_sheet(self, url, sheet_name, storage_type, engine='openpyxl', harvest_job=None):
+        """
+        Reads an Excel sheet from a given URL and returns the data as a pandas DataFrame.
+
+        To read more than one sheet of the same workbook use `_read_remote_workbook`,
+        which downloads the file only once.
+
+        Args:
+            url (str): The URL of the Excel file.
+            sheet_name (str): The name of the sheet to read.
+            storage_type (str): The type of storage where the Excel file is located. Supported types are 'onedrive', 'gspread', and 'gdrive'.
+            engine (str, optional): The engine to use for reading the Excel file. Defaults to 'openpyxl'.
+
+        Returns:
+            pandas.DataFrame: The data from the specified sheet as a DataFrame.
+
+        Raises:
+            ReadError: If there is an error reading the sheet.
+
+        """
+        return self._read_remote_workbook(url, [sheet_name], storage_type, engine=engine, harvest_job=harvest_job)[sheet_name]
 
     def _clean_table_datasets(self, data):
         """
@@ -269,7 +316,7 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         data.columns = data.columns.str.strip().str.replace('\n', '').str.replace('\t', '')
 
         # Remove all fields that are a nan float and trim all spaces of the values
-        data = data.apply(lambda x: x.str.strip() if x.dtype == 'object' else x)
+        data = self._strip_object_columns(data)
         data = data.fillna(value='')
 
         # Convert table to list of dicts
@@ -291,8 +338,8 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         if dataset_id_colname is None:
             dataset_id_colname = 'dataset_id'
 
-        # Select only the columns of type 'object' and apply the strip() method to them
-        data.loc[:, data.dtypes == object] = data.select_dtypes(include=['object']).apply(lambda x: x.str.strip())
+        # Trim all spaces of the values of the columns of type 'object'
+        data = self._strip_object_columns(data)
 
         # Remove prefixes from column names in the distributions dataframe if prefix_colnames is not None
         if prefix_colnames is not None:
@@ -307,7 +354,7 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
 
         if not data.empty:
             # Group distributions by dataset_id and convert to list of dicts
-            return data.groupby(dataset_id_colname).apply(lambda x: x.to_dict('records')).to_dict()
+            return self._group_records(data, dataset_id_colname)
         else:
             log.debug('No distributions loaded. Check "distribution.%s" fields', dataset_id_colname)
             return None
@@ -328,9 +375,8 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         if distribution_id_colname is None:
             distribution_id_colname = 'resource_id'
 
-        # Select only the columns of type 'object' and apply the strip() method to them
-        object_cols = data.select_dtypes(include=['object']).columns
-        data[object_cols] = data[object_cols].apply(lambda x: x.str.strip())
+        # Trim all spaces of the values of the columns of type 'object'
+        data = self._strip_object_columns(data)
 
         # Remove prefixes from column names in the datadictionaries dataframe
         new_column_names = {col: re.sub(re.compile(rf'{prefix_colnames}(_info)?_'), '', col).replace('info.', '') for col in data.columns}
@@ -341,49 +387,11 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
             data = data[data[distribution_id_colname].notna() & (data[distribution_id_colname] != '')]
 
             # Group datadictionaries by resource_id and convert to list of dicts
-            return data.groupby(distribution_id_colname).apply(lambda x: x.to_dict('records')).to_dict()
+            return self._group_records(data, distribution_id_colname)
         else:
             log.debug('No datadictionaries loaded. Check "datadictionary.%s" fields', distribution_id_colname)
             return None
 
-    def _add_distributions_and_datadictionaries_to_datasets(self, table_datasets, table_distributions_grouped, table_datadictionaries_grouped, identifier_field='identifier', alternate_identifier_field='alternate_identifier', inspire_id_field='inspire_id', datadictionary_id_field="id"):
-        """
-        Add distributions (CKAN resources) and datadictionaries to each dataset object.
-    
-        Args:
-            table_datasets (list): List of dataset objects.
-            table_distributions_grouped (dict): Dictionary of distributions grouped by dataset identifier.
-            table_datadictionaries_grouped (dict): Dictionary of datadictionaries grouped by dataset identifier.
-            identifier_field (str, optional): Field name for the identifier. Defaults to 'identifier'.
-            alternate_identifier_field (str, optional): Field name for the alternate identifier. Defaults to 'alternate_identifier'.
-            inspire_id_field (str, optional): Field name for the inspire id. Defaults to 'inspire_id'.
-            datadictionary_id_field (str, optional): Field name for the datadictionary id. Defaults to 'id'.
-    
-        Returns:
-            list: List of dataset objects with distributions (CKAN resources) and datadictionaries added.
-    
-        Notes:
-            If 'dataset_id_field' is specified in the Harvester configuration, it will be used as the primary identifier field.
-            Otherwise, the function will fall back to using 'identifier_field', 'alternate_identifier_field', and 'inspire_id_field' in that order.
-        """
-        try:
-            dataset_id_field = self.config.get('dataset_id_field', None)
-            return [
-                {
-                    **d,
-                    'resources': [
-                        {**dr, 'datadictionaries': table_datadictionaries_grouped.get(dr[datadictionary_id_field], []) if table_datadictionaries_grouped else []}
-                        for dr in table_distributions_grouped.get(
-                            d.get(dataset_id_field) if dataset_id_field else d.get(identifier_field) or d.get(alternate_identifier_field) or d.get(inspire_id_field), []
-                        )
-                    ]
-                }
-                for d in table_datasets
-            ]
-        except Exception as e:
-            log.error("Error while adding distributions and datadictionaries to datasets: %s", str(e))
-            raise
-
     def _process_content(self, content_dicts, source_url, distribution_prefix_colnames, dataset_id_colname, datadictionary_prefix_colnames, distribution_id_colname):
         """
         Process the content of the harvested dataset.
@@ -721,7 +729,6 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         log.debug('In SchemingDCATXLSHarvester gather_stage with harvest source: %s and remote sheet: %s', harvest_source_title, source_url)
         
         content_dicts = {}
-        self._names_taken = []
         
         # Get config options
         if harvest_job.source.config:
@@ -743,8 +750,12 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
             remote_xls_base_url = self._get_storage_base_url(source_url, self._storage_type)
             remote_sheet_download_url = self._get_storage_url(source_url, self._storage_type)
         
-        # Check if the remote file is valid
-        is_valid = self._check_accesible_url(remote_sheet_download_url, harvest_job, self._auth)
+        # Check if the remote file is valid. Onedrive workbooks are downloaded only once
+        # when reading the sheets, so download errors are reported there.
+        if self._storage_type == 'onedrive':
+            is_valid = True
+        else:
+            is_valid = self._check_accesible_url(remote_sheet_download_url, harvest_job, self._auth)
         
         if not is_valid:
             log.error(f'The URL is not accessible. The harvest source: "{harvest_source_title}" has finished.')
@@ -780,18 +791,28 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         # Read sheets
         if is_valid:
             try:
+                #TODO: Implement self._load_datadictionaries() method.
+                sheetnames = {
+                    'datasets': dataset_sheetname,
+                    'distributions': distribution_sheetname,
+                    'datadictionaries': datadictionary_sheetname
+                }
+                sheetnames = {key: sheetname for key, sheetname in sheetnames.items() if sheetname}
+
+                self._remote_validators = None
                 try:
-                    content_dicts['datasets'] = self._read_remote_sheet(remote_sheet_download_url, dataset_sheetname, self._storage_type )
+                    workbook = self._read_remote_workbook(remote_sheet_download_url, sheetnames.values(), self._storage_type, harvest_job=harvest_job, validators=self._get_remote_validators(harvest_job))
                 except RemoteResourceError as e:
                     self._save_gather_error('Error reading the remote Excel datasets sheet: {0}'.format(e), harvest_job)
                     return False
-                
-                if distribution_sheetname:
-                    content_dicts['distributions'] = self._read_remote_sheet(remote_sheet_download_url, distribution_sheetname, self._storage_type, harvest_job)
-                    
-                #TODO: Implement self._load_datadictionaries() method.
-                if datadictionary_sheetname:
-                    content_dicts['datadictionaries'] = self._read_remote_sheet(remote_sheet_download_url, datadictionary_sheetname, self._storage_type, harvest_job)
+
+                if workbook is None:
+                    log.info('The remote file of the harvest source "%s" has not changed since the last error-free job. No changes to harvest.', harvest_source_title)
+                    self._save_remote_validators(harvest_job, self._remote_validators)
+                    return []
+
+                for key, sheetname in sheetnames.items():
+                    content_dicts[key] = workbook[sheetname]
 
                 # after_download interface
                 for harvester in p.PluginImplementations(ISchemingDCATHarvester):
@@ -870,6 +891,10 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
             skipped_datasets = 0  # Counter for omitted datasets
             identifier_counts = {}  # To track the frequency of identifiers
 
+            # Load the existing names of the datasets without a name in a single query
+            name_allocator = NameAllocator()
+            name_allocator.preload(dataset.get('title') for dataset in clean_datasets if not dataset.get('name'))
+
             for dataset in clean_datasets:
                 #log.debug('dataset: %s', dataset)
 
@@ -878,11 +903,9 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
                 
                 try:
                     if not dataset.get('name'):
-                        dataset['name'] = self._gen_new_name(dataset['title'])
-                    while dataset['name'] in self._names_taken:
-                        suffix = sum(name.startswith(dataset['name'] + '-') for name in self._names_taken) + 1
-                        dataset['name'] = '{}-{}'.format(dataset['name'], suffix)
-                    self._names_taken.append(dataset['name'])
+                        dataset['name'] = name_allocator.allocate(dataset['title'])
+                    else:
+                        dataset['name'] = name_allocator.reserve(dataset['name'])
         
                     # If the dataset has no identifier, use an UUID
                     if not dataset.get('identifier'):
@@ -938,6 +961,9 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         # Get objects/datasets to delete (ie in the DB but not in the source)
         delete = set(guids_in_db) - set(guids_in_harvest)
         change = guids_in_db & guids_in_harvest
+
+        # Skip the datasets that are identical to the ones already imported
+        change, content_hashes = self._get_changed_guids(harvest_job, change, datasets_to_harvest)
         
         log.debug(f"Number of skipped datasets: {skipped_datasets}")
         log.debug(f'guids_in_harvest ({len(guids_in_harvest)})')
@@ -946,48 +972,23 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         log.debug(f'delete ({len(delete)})')
         log.debug(f'change ({len(change)})')
         
-        ids = []
-        for guid in new:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    extras=[HarvestObjectExtra(key='status', value='new')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in change:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='change')])
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
-        
-        for guid in delete:
-            dataset = datasets_to_harvest.get(guid)
-            if dataset:
-                obj = HarvestObject(guid=guid, job=harvest_job, content=json.dumps(dataset),
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status', value='delete')])
-                model.Session.query(HarvestObject).\
-                    filter_by(guid=guid).\
-                    update({'current': False}, False)
-                obj.save()
-                ids.append({'id': obj.id, 'name': dataset['name'], 'identifier': dataset['identifier']})
-            else:
-                log.warning(f'Dataset for GUID {guid} not found in datasets_to_harvest')
+        harvest_objects = self._build_harvest_objects(new, change, delete, datasets_to_harvest, guid_to_package_id, content_hashes)
+
+        try:
+            ids = self._save_harvest_objects(harvest_job, harvest_objects)
+        except Exception as e:
+            self._save_gather_error('Error saving the harvest objects: %r / %s' % (e, traceback.format_exc()), harvest_job)
+            return []
         
         log.debug('Number of elements in clean_datasets: %s and object_ids: %s', len(clean_datasets), len(ids))
+
+        # Store the remote file validators, they are used by the next job if this one is error-free
+        self._save_remote_validators(harvest_job, self._remote_validators)
         
         # Log clean_datasets/ ids
         #self._log_export_clean_datasets_and_ids(harvest_source_title, clean_datasets, ids)
 
-        return [id_dict['id'] for id_dict in ids]
+        return ids
     
     def fetch_stage(self, harvest_object):
         # Nothing to do here - we got the package dict in the search in the gather stage
@@ -1023,7 +1024,7 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
             log.error('No harvest object received')
             return False   
         
-        self._set_config(harvest_object.source.config)
+        self._set_harvest_job_context(harvest_object)
         
         if self.force_import:
             status = 'change'
@@ -1039,11 +1040,7 @@ class SchemingDCATXLSHarvester(SchemingDCATHarvester):
         if status == 'delete':
             override_local_datasets = self.config.get("override_local_datasets", False)
             if override_local_datasets is True:
-                # Delete package
-                context.update({
-                    'ignore_auth': True,
-                })
-                p.toolkit.get_action('package_delete')(context, {'id': harvest_object.package_id})
+                self._delete_package(harvest_object, context)
                 log.info('The override_local_datasets configuration is %s. Package %s deleted with GUID: %s' % (override_local_datasets, harvest_object.package_id, harvest_object.guid))
 
                 return True
@@ -36,6 +36,7 @@ from ckanext.harvest.utils import (
 )
 
 import ckanext.schemingdcat.config as sdct_config
+from ckanext.schemingdcat.lib.member_capacity import get_user_capacity
 from ckanext.schemingdcat.utils import (
     get_facets_dict,
     public_file_exists,
@@ -2094,18 +2095,10 @@ def schemingdcat_user_is_org_member(
 
     result = False
     if org_id is not None:
-        member_list_action = p.toolkit.get_action("schemingdcat_member_list")
-        org_members = member_list_action(
-            data_dict={"id": org_id, "object_type": "user"}
-        )
-        for member_id, _, member_role in org_members:
-            if user.id == member_id:
-                #log.debug('member_role: %s and role: %s', member_role, role)
-                
-                # Check direct match
-                if role is None or member_role.lower() == role.lower():
-                    result = True
-                break
+        member_role = get_user_capacity(user.id, org_id)
+        # Check direct match
+        if member_role is not None and (role is None or member_role == role.lower()):
+            result = True
     return result
 
 @lru_cache(maxsize=1)
@@ -1,5 +1,7 @@
 import logging
+import multiprocessing
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dateutil.parser import parse
 from owslib.iso import MD_Metadata
@@ -24,6 +26,7 @@ from ckanext.schemingdcat.config import (
     PROTOCOL_MAPPING,
     SERVICE_INDICATORS,
     DCAT_SERVICE_TYPES,
+    CSW_EXTRACTION_CHUNKSIZE,
 )
 
 log = logging.getLogger(__name__)
@@ -1359,3 +1362,80 @@ class CSWMetadataExtractor:
             }
         except Exception:
             return {}
+
+
+# Extractor of each extraction worker process, built once by `_init_extraction_worker`
+_worker_extractor = None
+
+# CKAN options read by the extractor, passed to the extraction worker processes
+_EXTRACTION_CONFIG_KEYS = ('ckan.locale_default', 'ckan.site_url', 'ckan_url', 'ckan.root_path')
+
+
+def _init_extraction_worker(debug, extraction_config):
+    """
+    Initializes an extraction worker process with the CKAN options of the harvester
+    and its own CSWMetadataExtractor.
+    """
+    global _worker_extractor
+    config.update(extraction_config)
+    _worker_extractor = CSWMetadataExtractor(debug=debug)
+
+
+def _extract_record(record_id, xml_content):
+    """
+    Extracts the metadata of a record from its XML in an extraction worker.
+
+    Returns:
+        tuple: (record_id, metadata dict or None, error message or None).
+    """
+    try:
+        metadata = MD_Metadata(etree.fromstring(xml_content))
+        return record_id, _worker_extractor.extract_from_csw(metadata, xml_content), None
+    except Exception as e:
+        return record_id, None, str(e)
+
+
+def extract_records(records, workers=1, debug=False, chunksize=CSW_EXTRACTION_CHUNKSIZE):
+    """
+    Extracts the metadata of CSW records, in parallel processes if `workers` > 1.
+
+    The extraction is CPU bound (OWSLib MD_Metadata traversal, XPath, codelist mapping),
+    so the raw XML of the records is sent to a pool of processes, each one with its own
+    CSWMetadataExtractor. The processes are spawned instead of forked, so they do not inherit
+    the database connections, queue consumers or threads of the harvester, and receive the
+    CKAN options read by the extractor (_EXTRACTION_CONFIG_KEYS).
+
+    Args:
+        records (list): Tuples (record_id, MD_Metadata) as returned by the CSW client.
+        workers (int, optional): The number of worker processes. Defaults to 1 (no pool).
+        debug (bool, optional): Enable the debug mode of the extractor. Defaults to False.
+        chunksize (int, optional): The number of records sent to a worker at a time. Defaults to CSW_EXTRACTION_CHUNKSIZE.
+
+    Yields:
+        tuple: (record_id, metadata dict or None, error message or None), in the order of the records.
+    """
+    if workers <= 1 or len(records) <= 1:
+        extractor = CSWMetadataExtractor(debug=debug)
+        for record_id, metadata in records:
+            try:
+                yield record_id, extractor.extract_from_csw(metadata, metadata.xml), None
+            except Exception as e:
+                yield record_id, None, str(e)
+        return
+
+    record_ids = [record_id for record_id, _ in records]
+    xml_contents = [
+        metadata.xml if isinstance(metadata.xml, bytes) else etree.tostring(metadata.xml)
+        for _, metadata in records
+    ]
+
+    extraction_config = {key: config.get(key) for key in _EXTRACTION_CONFIG_KEYS if config.get(key) is not None}
+
+    log.debug('Extracting %s CSW records with %s processes', len(records), workers)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_extraction_worker,
+        initargs=(debug, extraction_config)
+    ) as executor:
+        yield from executor.map(_extract_record, record_ids, xml_contents, chunksize=chunksize)
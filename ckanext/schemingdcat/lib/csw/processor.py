@@ -1,18 +1,28 @@
+import copy
 import logging
+import hashlib
 import urllib3
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timezone
+from dateutil.parser import isoparse
 from lxml import etree
 
 from owslib.iso import MD_Metadata
 from owslib.csw import CatalogueServiceWeb as OwsCatalogueServiceWeb
 from owslib.util import Authentication
-from owslib.fes import PropertyIsLike, PropertyIsEqualTo, SortBy, SortProperty
+from owslib.fes import PropertyIsLike, PropertyIsEqualTo, PropertyIsGreaterThanOrEqualTo, And, SortBy, SortProperty
 from urllib.parse import urlparse, urlunparse, urlencode, parse_qsl
 
 from ckanext.schemingdcat.config import (
     CSW_DEFAULT_LIMIT,
     CQL_QUERY_DEFAULT,
     CQL_SEARCH_TERM_DEFAULT,
-    OUTPUT_SCHEMA
+    OUTPUT_SCHEMA,
+    CSW_PAGING_MAX_WORKERS,
+    CSW_IDENTIFIERS_MAXRECORDS,
+    CSW_MODIFIED_PROPERTY,
+    CSW_QUERYABLE_PATTERN
 )
 
 log = logging.getLogger(__name__)
@@ -106,21 +116,37 @@ class SchemingDCATCatalogueServiceWeb(object):
                         outputschema=OUTPUT_SCHEMA,
                         maxrecords=75, 
                         startposition=0, 
-                        sortproperty='dc:identifier'):
+                        sortproperty='dc:identifier',
+                        max_workers=CSW_PAGING_MAX_WORKERS,
+                        modified_since=None,
+                        modified_property=CSW_MODIFIED_PROPERTY):
         """
         Retrieve records from a CSW server.
 
+        A single `hits` request gets the number of matching records, then the pages of
+        `maxrecords` records are requested concurrently. If the server returns fewer
+        records than requested (its own page size limit), the missing positions are
+        requested again with the smaller page size.
+
         Args:
             typenames (str, optional): The typeNames to query against. Defaults to "csw:Record".
             limit (int, optional): The maximum number of records to return. No records are returned if 0. Defaults to None.
             esn (str, optional): The ElementSetName 'full', 'brief' or 'summary'. Defaults to 'summary'.
             outputschema (str, optional): The outputSchema. Defaults to 'http://www.opengis.net/cat/csw/2.0.2'.
-            page (int, optional): The number of records to return per page. Defaults to 30.
+            maxrecords (int, optional): The number of records to request per page. Defaults to 75.
             startposition (int, optional): Requests a slice of the result set, starting at this position. Defaults to 0.
             sortproperty (str, optional): The sortProperty. Defaults to 'dc:identifier'.
+            max_workers (int, optional): The number of pages requested concurrently. Defaults to CSW_PAGING_MAX_WORKERS.
+            modified_since (str, optional): Only request the records modified since this ISO 8601 date. Defaults to None.
+            modified_property (str, optional): The queryable of the modification date. Defaults to CSW_MODIFIED_PROPERTY.
 
         Returns:
-            record_ids (list): A list of record identifiers from the CSW server.
+            record_ids (list): A list of record identifiers from the CSW server. An empty list if
+                the request fails, unless `modified_since` is set.
+
+        Raises:
+            Exception: If a request of an incremental query (`modified_since`) fails, so a failed
+                or unsupported modification date constraint is not taken for no modified records.
 
         Additional Information:
             getrecords2 (OWSLib): Construct and process a GetRecords request in order to retrieve metadata records from a CSW.
@@ -141,89 +167,15 @@ class SchemingDCATCatalogueServiceWeb(object):
             - hopcount: number of message hops before search is terminated (default is 1)
         """
         try:
-            self.csw.sortby = SortBy([SortProperty(sortproperty)])
-            record_ids = []
-            all_records = {}
-
-            # Base query parameters
-            csw_args = {
-                "typenames": typenames,
-                "esn": esn,
-                "maxrecords": maxrecords,
-                "outputschema": outputschema,
-                "sortby": self.csw.sortby,
-                "startposition": startposition,
-                "resulttype": "results"
-            }
-
-            log.info("Making CSW request: 'getrecords2()': %s", csw_args)
-
-            # Try first without constraints
-            self.csw.getrecords2(**csw_args)
-            
-            if self.csw.response is None:
-                log.error("No response from CSW server")
-                return []
-
-            # If we have search parameters, try with them
-            if cql_query and cql_search_term:                
-                # Normalize query property name
-                query_property = cql_query
-                if not ':' in query_property:
-                    query_property = 'csw:' + query_property.capitalize()
-                
-                if cql_use_like:
-                    search_term = f"%{cql_search_term}%"
-                    constraint = PropertyIsLike(query_property, search_term)
-                else:
-                    constraint = PropertyIsEqualTo(query_property, cql_search_term)
-                
-                log.debug('Using search constraints - Query: %s, Term: %s', query_property, cql_search_term)
-                csw_args["constraints"] = [constraint]
-                
-                # Try with constraints
-                self.csw.getrecords2(**csw_args)
-                
-                # Log request/response for debugging
-                log.debug("Matches found: %d", self.csw.results.get('matches', 0))
-
-            elif cql:
-                log.debug('Using raw CQL: %s', cql)
-                csw_args["cql"] = cql
-                self.csw.getrecords2(**csw_args)
-
-            # Process results
-            if self.csw.results['matches'] == 0:
-                log.warning("No matches found with current query")
-                # Try without constraints as fallback
-                csw_args.pop("constraints", None)
-                self.csw.getrecords2(**csw_args)
-                if self.csw.results['matches'] == 0:
-                    return []
-
-            # Process pagination and collect records
-            nextrecord = startposition
-            while nextrecord is not None:
-                all_records.update(self.csw.records)
-                record_ids.extend(self.csw.records.keys())
-
-                if limit and len(record_ids) >= limit:
-                    break
-
-                if (self.csw.results['returned'] > 0 and 
-                    0 < self.csw.results['nextrecord'] <= self.csw.results['matches']):
-                    nextrecord = self.csw.results['nextrecord']
-                    csw_args["startposition"] = nextrecord
-                    self.csw.getrecords2(**csw_args)
-                else:
-                    nextrecord = None
-
-            # Apply limit if specified
-            if limit:
-                record_ids = record_ids[:limit]
-
-            # Restore all records
+            csw_args = self._get_query_args(
+                cql, cql_query, cql_search_term, cql_use_like, typenames, esn,
+                outputschema, sortproperty, modified_since, modified_property
+            )
+            matches, all_records = self._get_records(csw_args, limit, maxrecords, startposition, max_workers)
+            record_ids = list(all_records.keys())
+
             self.csw.records = all_records
+            self.csw.results = {'matches': matches, 'returned': len(record_ids), 'nextrecord': 0}
             log.info('Total CSW records found: %d', len(record_ids))
             
             return record_ids
@@ -234,7 +186,204 @@ class SchemingDCATCatalogueServiceWeb(object):
                 log.debug("CSW Response: %s", self.csw.response)
             if hasattr(self.csw, 'request'):
                 log.debug("CSW Request: %s", self.csw.request)
+            if modified_since:
+                raise
             return []
+
+    def get_csw_identifiers(self, cql=None, cql_query=None,
+                            cql_search_term=None, cql_use_like=False,
+                            typenames="csw:Record",
+                            limit=CSW_DEFAULT_LIMIT,
+                            outputschema=OUTPUT_SCHEMA,
+                            maxrecords=CSW_IDENTIFIERS_MAXRECORDS,
+                            sortproperty='dc:identifier',
+                            max_workers=CSW_PAGING_MAX_WORKERS):
+        """
+        Lists the identifiers of all the records matching the query, requesting the
+        `brief` element set only.
+
+        Unlike `get_csw_records`, the records previously retrieved are kept, and errors
+        are raised instead of returning an empty list, so callers can tell an empty
+        catalogue from a failed listing.
+
+        Args:
+            See `get_csw_records`.
+
+        Returns:
+            list: The record identifiers.
+
+        Raises:
+            Exception: If a GetRecords request fails.
+        """
+        csw_args = self._get_query_args(
+            cql, cql_query, cql_search_term, cql_use_like, typenames, "brief",
+            outputschema, sortproperty
+        )
+        _, records = self._get_records(csw_args, limit, maxrecords, 0, max_workers, csw=copy.copy(self.csw))
+        log.info('Total CSW identifiers listed: %d', len(records))
+
+        return list(records.keys())
+
+    def _get_query_args(self, cql, cql_query, cql_search_term, cql_use_like, typenames, esn,
+                        outputschema, sortproperty, modified_since=None, modified_property=CSW_MODIFIED_PROPERTY):
+        """
+        Builds the `getrecords2` arguments (without paging) of a query.
+
+        Returns:
+            dict: The `getrecords2` arguments.
+        """
+        sortby = SortBy([SortProperty(sortproperty)])
+        self.csw.sortby = sortby
+
+        # Base query parameters
+        csw_args = {
+            "typenames": typenames,
+            "esn": esn,
+            "outputschema": outputschema,
+            "sortby": sortby,
+        }
+
+        constraints = []
+        if cql_query and cql_search_term:                
+            # Normalize query property name
+            query_property = cql_query
+            if not ':' in query_property:
+                query_property = 'csw:' + query_property.capitalize()
+            
+            if cql_use_like:
+                search_term = f"%{cql_search_term}%"
+                constraints.append(PropertyIsLike(query_property, search_term))
+            else:
+                constraints.append(PropertyIsEqualTo(query_property, cql_search_term))
+            
+            log.debug('Using search constraints - Query: %s, Term: %s', query_property, cql_search_term)
+
+        elif cql:
+            if modified_since:
+                # OWSLib does not combine raw CQL with filter constraints, so the values are
+                # validated before adding them to the query text
+                if not CSW_QUERYABLE_PATTERN.fullmatch(modified_property or ''):
+                    raise ValueError(f'Invalid modified_property: {modified_property!r}')
+                modified_date = isoparse(modified_since)
+                if modified_date.tzinfo:
+                    modified_date = modified_date.astimezone(timezone.utc)
+                modified_since = modified_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+                cql = f"({cql}) AND {modified_property} >= '{modified_since}'"
+            log.debug('Using raw CQL: %s', cql)
+            csw_args["cql"] = cql
+
+        if modified_since and not cql:
+            log.debug('Using modification date constraint - Query: %s, Since: %s', modified_property, modified_since)
+            constraints.append(PropertyIsGreaterThanOrEqualTo(modified_property, modified_since))
+
+        if len(constraints) > 1:
+            csw_args["constraints"] = [And(constraints)]
+        elif constraints:
+            csw_args["constraints"] = constraints
+
+        return csw_args
+
+    def _get_records(self, csw_args, limit, maxrecords, startposition, max_workers, csw=None):
+        """
+        Requests all the records of a query: a single `hits` request gets the number of
+        matching records, then the pages are requested concurrently.
+
+        Args:
+            csw_args (dict): The `getrecords2` arguments, see `_get_query_args`.
+            limit (int): The maximum number of records to return, or None.
+            maxrecords (int): The number of records to request per page.
+            startposition (int): The position of the first record.
+            max_workers (int): The number of pages requested concurrently.
+            csw (OwsCatalogueServiceWeb, optional): The client used for the `hits` request. Defaults to `self.csw`.
+
+        Returns:
+            tuple: The number of matching records and an OrderedDict with the records, in the order of the result set.
+        """
+        csw = csw or self.csw
+
+        # CSW positions start at 1
+        startposition = max(startposition, 1)
+
+        log.info("Making CSW request: 'getrecords2()' (hits): %s", csw_args)
+        csw.getrecords2(resulttype="hits", startposition=startposition, maxrecords=0, **csw_args)
+
+        if csw.response is None:
+            raise CSWNotFoundError("No response from CSW server")
+
+        matches = csw.results.get('matches', 0)
+        log.debug("Matches found: %d", matches)
+        if matches == 0:
+            log.warning("No matches found with current query")
+            return 0, OrderedDict()
+
+        total = matches - startposition + 1
+        if limit:
+            total = min(total, limit)
+
+        pages = self._get_records_pages(csw_args, startposition, total, maxrecords, max_workers)
+
+        all_records = OrderedDict()
+        for position in sorted(pages):
+            all_records.update(pages[position])
+
+        # Apply limit if specified
+        if limit and len(all_records) > limit:
+            all_records = OrderedDict(list(all_records.items())[:limit])
+
+        return matches, all_records
+
+    def _get_records_page(self, csw_args, startposition, maxrecords):
+        """
+        Requests a page of records with its own copy of the OWSLib client, so pages can be
+        requested from several threads (`getrecords2` stores the response in the client).
+
+        Returns:
+            OrderedDict: The records of the page.
+        """
+        csw = copy.copy(self.csw)
+        csw.getrecords2(resulttype="results", startposition=startposition, maxrecords=maxrecords, **csw_args)
+        return csw.records
+
+    def _get_records_pages(self, csw_args, startposition, total, maxrecords, max_workers):
+        """
+        Requests the pages of records covering `total` positions from `startposition`,
+        with at most `max_workers` requests in flight.
+
+        Returns:
+            dict: The records of each page, by start position.
+        """
+        pages = {}
+        page_size = maxrecords
+        # At least one request in flight, or no page would ever be requested
+        max_workers = max(int(max_workers or 1), 1)
+        # Ranges of positions (start, count) still to be requested
+        pending_ranges = deque([(startposition, total)])
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending_ranges or futures:
+                while pending_ranges and len(futures) < max_workers:
+                    start, count = pending_ranges.popleft()
+                    size = min(count, page_size)
+                    futures[executor.submit(self._get_records_page, csw_args, start, size)] = (start, size)
+                    if count > size:
+                        pending_ranges.appendleft((start + size, count - size))
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, size = futures.pop(future)
+                    records = future.result()
+                    pages[start] = records
+
+                    returned = len(records)
+                    if 0 < returned < size:
+                        # The server limits the page size, request the rest of the page again
+                        if returned < page_size:
+                            log.debug('CSW server returned %s of %s records per page', returned, page_size)
+                            page_size = returned
+                        pending_ranges.append((start + returned, size - returned))
+
+        return pages
         
     def get_metadata_record(self, record_id):
         """
@@ -255,4 +404,27 @@ class SchemingDCATCatalogueServiceWeb(object):
             return metadata, xml_content
         except Exception as e:
             log.error(f"Error getting metadata record for ID {record_id}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def get_records_hash(self, record_ids):
+        """
+        Computes a SHA-256 of the XML of the given records, independent of the paging order.
+
+        The GetRecords response envelope (e.g. the SearchResults timestamp) is not included,
+        so the hash only changes when the records themselves change.
+
+        Args:
+            record_ids (list): The CSW record identifiers retrieved with `get_csw_records`.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        sha256 = hashlib.sha256()
+        for record_id in sorted(record_ids):
+            record = self.csw.records.get(record_id)
+            sha256.update(record_id.encode('utf-8'))
+            if record is not None and record.xml is not None:
+                xml = record.xml if isinstance(record.xml, bytes) else etree.tostring(record.xml)
+                sha256.update(xml)
+
+        return sha256.hexdigest()
@@ -1,12 +1,20 @@
 import os
+import stat
+import time
+import hashlib
 import tempfile
 import logging
+import requests
 from saxonche import PySaxonProcessor
 from rdflib import Graph
+from ckantoolkit import config
 
 from ckanext.schemingdcat.config import (
     XLST_MAPPINGS_DIR,
-    DEFAULT_XSLT_FILE
+    DEFAULT_XSLT_FILE,
+    XSLT_CACHE_DIR,
+    XSLT_CACHE_TTL,
+    XSLT_DOWNLOAD_TIMEOUT
 )
 
 XML_FORMAT = 'xml'
@@ -14,86 +22,217 @@ RDF_FORMAT = 'xml'
 
 log = logging.getLogger(__name__)
 
+# Saxon processor and compiled stylesheets (by SHA-256 of the stylesheet) shared by the transformers of the process
+_saxon_processor = None
+_xslt_executables = {}
+
+
+def get_saxon_processor():
+    """
+    Returns the Saxon processor shared by the transformers of this process.
+    """
+    global _saxon_processor
+
+    if _saxon_processor is None:
+        _saxon_processor = PySaxonProcessor(license=False)
+
+    return _saxon_processor
+
+
+def get_xslt_cache_dir():
+    """
+    Returns the directory of the cached stylesheets, created only accessible by the CKAN user.
+
+    It is `{ckan.storage_path}/schemingdcat_xslt` if the storage path is set, XSLT_CACHE_DIR
+    (in the temporary directory) otherwise.
+
+    Returns:
+        str: The path of the directory.
+
+    Raises:
+        PermissionError: If the directory is not owned by the CKAN user or other users can write
+            to it, as it could contain stylesheets planted by them.
+    """
+    storage_path = config.get('ckan.storage_path')
+    cache_dir = os.path.join(storage_path, 'schemingdcat_xslt') if storage_path else XSLT_CACHE_DIR
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    cache_dir_stat = os.lstat(cache_dir)
+    if not stat.S_ISDIR(cache_dir_stat.st_mode) or cache_dir_stat.st_uid != os.getuid():
+        raise PermissionError(f"The stylesheet cache {cache_dir} is not a directory owned by the CKAN user.")
+    if cache_dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"The stylesheet cache {cache_dir} is writable by other users.")
+    if cache_dir_stat.st_mode & 0o077:
+        os.chmod(cache_dir, 0o700)
+
+    return cache_dir
+
+
+def get_cached_stylesheet(url, ttl=XSLT_CACHE_TTL):
+    """
+    Downloads a remote stylesheet to the local cache, unless it was downloaded less than `ttl` seconds ago.
+
+    The cached file is named after the SHA-256 of the URL, in the directory of `get_xslt_cache_dir`.
+    If the download fails and a cached copy exists, the cached copy is used.
+
+    Args:
+        url (str): The URL of the stylesheet.
+        ttl (int, optional): Seconds a cached stylesheet is used without downloading it again. Defaults to XSLT_CACHE_TTL.
+
+    Returns:
+        str: The path of the cached stylesheet.
+    """
+    cache_dir = get_xslt_cache_dir()
+    cached_path = os.path.join(cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.xsl')
+
+    if os.path.isfile(cached_path) and time.time() - os.path.getmtime(cached_path) < ttl:
+        return cached_path
+
+    try:
+        response = requests.get(url, timeout=XSLT_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if os.path.isfile(cached_path):
+            log.warning(f"Unable to download the stylesheet {url}, using the cached copy: {e}")
+            return cached_path
+        raise
+
+    # Write to a temporary file first, so other processes never read a partial stylesheet
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as temp_file:
+        temp_file.write(response.content)
+    os.replace(temp_file.name, cached_path)
+    log.debug(f"Stylesheet {url} cached in {cached_path}")
+
+    return cached_path
+
+
 class XSLTTransformer:
+    """
+    Transforms XML records with an XSLT stylesheet.
+
+    The stylesheet (a file of the mappings directory, or a URL cached locally) is compiled
+    once per process and content, and the records are transformed from memory.
+
+    Args:
+        xslt_file (str, optional): A filename of XLST_MAPPINGS_DIR or a URL. Defaults to DEFAULT_XSLT_FILE.
+        debug_mode (bool, optional): Save the last transformed record for debugging. Defaults to False.
+    """
     def __init__(self, xslt_file=None, debug_mode=False):
         if xslt_file is None:
             xslt_file = DEFAULT_XSLT_FILE
 
         log.debug(f"Initializing XSLTTransformer with xslt_file: {xslt_file}")
 
-        xslt_path = xslt_file
-        if not xslt_file.startswith('http://') and not xslt_file.startswith('https://'):
+        if xslt_file.startswith('http://') or xslt_file.startswith('https://'):
+            xslt_path = get_cached_stylesheet(xslt_file)
+        else:
             xslt_path = os.path.join(XLST_MAPPINGS_DIR, xslt_file)
             if not os.path.isfile(xslt_path):
                 raise FileNotFoundError(f"The file{xslt_path} does not exist in the mappings ({XLST_MAPPINGS_DIR}) directory.")
             xslt_path = os.path.abspath(xslt_path)
 
+        self.xslt_file = xslt_file
         self.xslt_path = xslt_path
-        self.processor = PySaxonProcessor(license=False)
-        self.xslt_processor = self.processor.new_xslt30_processor()
+        self.processor = get_saxon_processor()
+        self.executable = self._get_executable(xslt_path)
         self.debug_mode = debug_mode
 
         log.debug("XSLTTransformer initialized correctly.")
 
-    def transform(self, xml_content):
-        """Transforms XML content using XSLT and returns serialized RDF.
+    def _get_executable(self, xslt_path):
+        """
+        Returns the compiled stylesheet, compiling it only if its content was not compiled before.
+        """
+        with open(xslt_path, 'rb') as f:
+            stylesheet_hash = hashlib.sha256(f.read()).hexdigest()
+
+        executable = _xslt_executables.get(stylesheet_hash)
+        if executable is None:
+            log.debug(f"Compiling stylesheet {xslt_path}")
+            xslt_processor = self.processor.new_xslt30_processor()
+            executable = xslt_processor.compile_stylesheet(stylesheet_file=xslt_path)
+            if executable is None or getattr(xslt_processor, 'exception_occurred', False):
+                raise Exception(f"Error compiling the XSLT stylesheet {self.xslt_file}")
+            _xslt_executables[stylesheet_hash] = executable
+
+        return executable
+
+    def transform_to_string(self, xml_content):
+        """Transforms XML content using XSLT and returns the raw output of the stylesheet.
+
+        Args:
+            xml_content (str or bytes): The XML content to transform.
+
+        Returns:
+            str: The output of the stylesheet (RDF/XML).
+
+        Raises:
+            Exception: If an error occurs during the transformation process.
+        """
+        if isinstance(xml_content, bytes):
+            xml_content = xml_content.decode('utf-8')
+
+        source_node = self.processor.parse_xml(xml_text=xml_content)
+        result = self.executable.transform_to_string(xdm_node=source_node)
+        if result is None or getattr(self.executable, 'exception_occurred', False):
+            raise Exception("Error in XSLT transformation")
+
+        # Only for debugging purposes. Export the original XML content and the transformed RDF content.
+        if self.debug_mode:
+            self.debug_xml_and_rdf_output_files(result, xml_content)
+
+        return result
+
+    def transform(self, xml_content, graph=None):
+        """Transforms XML content using XSLT and returns serialized RDF, or adds it to a graph.
+
+        If a graph is given (e.g. the graph of the RDFParser that reads the datasets), the
+        output of the stylesheet is parsed once and its triples are added to the graph,
+        without serializing it again. Only the triples of the records that are parsed
+        without errors are added.
 
         Args:
             xml_content (str): The XML content to transform.
+            graph (rdflib.Graph, optional): The graph the triples are added to. Defaults to None.
 
         Returns:
-            str: The transformed RDF content serialized in RDF/XML format.
+            str or rdflib.Graph: The transformed RDF content serialized in RDF/XML format, or the graph if given.
 
         Raises:
             Exception: If an error occurs during the transformation process.
         """
         log.debug("Starting XML transformation.")
         try:
-            if isinstance(xml_content, bytes):
-                xml_content = xml_content.decode('utf-8')
-    
-            with tempfile.NamedTemporaryFile(delete=False, suffix="." + XML_FORMAT, mode='w', encoding='utf-8') as temp_file:
-                temp_file.write(xml_content)
-                temp_file_path = temp_file.name
-    
-            result = self.xslt_processor.transform_to_string(
-                stylesheet_file=self.xslt_path,
-                source_file=temp_file_path
-            )
-            if self.xslt_processor.exception_occurred:
-                for error in self.xslt_processor.get_error_message():
-                    log.error(f"Error in XSLT transformation: {error}")
-                raise Exception("Error in XSLT transformation")
-    
-            # Parse result as RDF and serialize in RDF/XML
+            result = self.transform_to_string(xml_content)
+
+            # Parse result as RDF
             g = Graph()
             g.parse(data=result, format=XML_FORMAT)
-            rdf_result = g.serialize(format=RDF_FORMAT)
-    
-            # Only for debugging purposes. Export the original XML content and the transformed RDF content.
-            if self.debug_mode:
-                self.debug_xml_and_rdf_output_files(rdf_result, xml_content)
 
-            return rdf_result
+            if graph is not None:
+                graph += g
+                return graph
+
+            return g.serialize(format=RDF_FORMAT)
         except Exception as e:
             log.error(f"Failure to transform XML content: {e}")
             raise
 
     def debug_xml_and_rdf_output_files(self, rdf_result, xml_content):
         """Debug XML and RDF output files by saving the last of them to the output directory for debugging purposes.
-    
+
         Args:
             rdf_result (str): The transformed RDF content.
             xml_content (str): The original XML content.
         """
         output_dir = os.path.join(os.path.dirname(__file__), 'output')
         os.makedirs(output_dir, exist_ok=True)
-    
+
         files = {
             'transformed_output.rdf': rdf_result,
             'original_xml_content.xml': xml_content
         }
-    
+
         for filename, content in files.items():
             file_path = os.path.join(output_dir, filename)
             with open(file_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,209 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ckanext.schemingdcat.config import (
+    FORMAT_PROBE_TIMEOUT,
+    FORMAT_PROBE_MAX_WORKERS,
+    FORMAT_PROBE_BUDGET,
+    FORMAT_PROBE_CACHE_TTL,
+    FORMAT_PROBE_FAILED_TTL,
+    FORMAT_PROBE_MEMORY_CACHE_SIZE,
+)
+
+log = logging.getLogger(__name__)
+
+
+class FormatProber:
+    """
+    Probes the Content-Type of resource URLs with HEAD requests.
+
+    Requests share a pooled HTTP session and have strict timeouts. The probes of a dataset
+    (or any list of URLs) run in a thread pool within a time budget, and the results are kept
+    in a bounded in-memory TTL cache and in the `schemingdcat_resource_format_cache` table, so
+    later harvests reuse them. The table is accessed with its own connection, so its errors are
+    only logged and never affect the transaction of the dataset being imported. URLs that could
+    not be probed are cached (in memory only) for a shorter time, and the callers fall back to
+    `mimetypes`.
+
+    Args:
+        timeout (tuple, optional): The (connect, read) timeout of each request. Defaults to FORMAT_PROBE_TIMEOUT.
+        max_workers (int, optional): The number of concurrent requests. Defaults to FORMAT_PROBE_MAX_WORKERS.
+        ttl (int, optional): Seconds a Content-Type is cached. Defaults to FORMAT_PROBE_CACHE_TTL.
+        failed_ttl (int, optional): Seconds a failed probe is cached. Defaults to FORMAT_PROBE_FAILED_TTL.
+        cache_size (int, optional): Maximum number of URLs cached in memory. Defaults to FORMAT_PROBE_MEMORY_CACHE_SIZE.
+    """
+    def __init__(self, timeout=FORMAT_PROBE_TIMEOUT, max_workers=FORMAT_PROBE_MAX_WORKERS,
+                 ttl=FORMAT_PROBE_CACHE_TTL, failed_ttl=FORMAT_PROBE_FAILED_TTL,
+                 cache_size=FORMAT_PROBE_MEMORY_CACHE_SIZE):
+        """
+        Initialize FormatProber with an empty cache and a pooled HTTP session.
+        """
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get_cached(self, url):
+        """
+        Returns a tuple (found, content_type) from the in-memory cache.
+        """
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return False, None
+
+            content_type, expires = entry
+            if expires < time.time():
+                del self._cache[url]
+                return False, None
+
+            self._cache.move_to_end(url)
+            return True, content_type
+
+    def _set_cached(self, url, content_type, ttl):
+        """
+        Stores a Content-Type (None for a failed probe) in the in-memory cache.
+        """
+        with self._lock:
+            self._cache[url] = (content_type, time.time() + ttl)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _probe(self, url):
+        """
+        Sends a HEAD request to the URL and returns its Content-Type, or None.
+        """
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            return response.headers.get('content-type')
+        except requests.RequestException as e:
+            log.debug('Could not probe the format of %s: %s', url, e)
+            return None
+
+    def _load_stored(self, urls):
+        """
+        Loads the Content-Type of the URLs stored in the database into the in-memory cache.
+
+        Returns:
+            dict: A dictionary mapping each stored URL to its Content-Type.
+        """
+        from ckanext.schemingdcat.harvesters.model import ResourceFormatCache
+
+        try:
+            stored = ResourceFormatCache.get_many(urls, self.ttl)
+        except Exception as e:
+            log.warning('Could not read the resource format cache: %s', e)
+            return {}
+
+        for url, content_type in stored.items():
+            self._set_cached(url, content_type, self.ttl)
+
+        return stored
+
+    def _store(self, content_types):
+        """
+        Stores the probed Content-Type of the URLs in the database.
+        """
+        from ckanext.schemingdcat.harvesters.model import ResourceFormatCache
+
+        try:
+            ResourceFormatCache.set_many(content_types)
+        except Exception as e:
+            log.warning('Could not update the resource format cache: %s', e)
+
+    def probe_many(self, urls, budget=FORMAT_PROBE_BUDGET):
+        """
+        Gets the Content-Type of the given URLs, probing the ones not cached concurrently.
+
+        Probes that do not finish within the budget are left unresolved (None).
+
+        Args:
+            urls (iterable): The resource URLs.
+            budget (int, optional): Maximum seconds spent probing. Defaults to FORMAT_PROBE_BUDGET.
+
+        Returns:
+            dict: A dictionary mapping each URL to its Content-Type, or None.
+        """
+        content_types = {}
+        pending = []
+        for url in dict.fromkeys(url for url in urls if url):
+            found, content_type = self._get_cached(url)
+            if found:
+                content_types[url] = content_type
+            else:
+                pending.append(url)
+
+        if pending:
+            stored = self._load_stored(pending)
+            content_types.update(stored)
+            pending = [url for url in pending if url not in stored]
+
+        if not pending:
+            return content_types
+
+        probed = {}
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending)))
+        try:
+            futures = {executor.submit(self._probe, url): url for url in pending}
+            done, not_done = wait(futures, timeout=budget)
+
+            for future in done:
+                probed[futures[future]] = future.result()
+
+            if not_done:
+                log.warning('Format probing budget (%ss) exhausted, %s URLs not probed', budget, len(not_done))
+                for future in not_done:
+                    future.cancel()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for url in pending:
+            content_type = probed.get(url)
+            self._set_cached(url, content_type, self.ttl if content_type else self.failed_ttl)
+            content_types[url] = content_type
+
+        self._store({url: content_type for url, content_type in probed.items() if content_type})
+
+        return content_types
+
+    def get_content_type(self, url):
+        """
+        Gets the Content-Type of a URL from the cache or probing it.
+
+        Args:
+            url (str): The resource URL.
+
+        Returns:
+            str: The Content-Type, or None if it could not be probed.
+        """
+        return self.probe_many([url]).get(url)
+
+
+_format_prober = None
+
+
+def get_format_prober():
+    """
+    Returns the FormatProber shared by the harvesters of this process.
+    """
+    global _format_prober
+
+    if _format_prober is None:
+        _format_prober = FormatProber()
+
+    return _format_prober
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+
+from flask import g, has_request_context
+
+from ckan import model
+
+from ckanext.schemingdcat.config import (
+    MEMBER_CAPACITY_CACHE_TTL,
+    MEMBER_CAPACITY_CACHE_SIZE
+)
+
+log = logging.getLogger(__name__)
+
+# Capacities by (user_id, org_id) with the time they expire, shared by the requests of the process
+_capacities = {}
+_capacities_lock = threading.Lock()
+# Incremented when the cache is cleared, so lookups started before are not stored
+_capacities_generation = 0
+
+# Attribute of the request globals (flask.g) with the capacities looked up in the request
+REQUEST_CACHE_ATTRIBUTE = '_schemingdcat_member_capacities'
+
+
+def _get_request_cache():
+    """
+    Returns the capacities looked up in the current request, or None outside a request.
+    """
+    if not has_request_context():
+        return None
+
+    request_cache = g.get(REQUEST_CACHE_ATTRIBUTE)
+    if request_cache is None:
+        request_cache = {}
+        setattr(g, REQUEST_CACHE_ATTRIBUTE, request_cache)
+
+    return request_cache
+
+
+def _query_user_capacity(user_id, org_id):
+    """
+    Returns the capacity of an active user member of an organization, querying only its membership.
+    """
+    group = model.Group.get(org_id)
+    if group is None:
+        return None
+
+    # The first active row, as a user may have duplicate member rows
+    member = model.Session.query(model.Member.capacity) \
+        .filter(model.Member.group_id == group.id) \
+        .filter(model.Member.table_name == 'user') \
+        .filter(model.Member.table_id == user_id) \
+        .filter(model.Member.state == 'active') \
+        .first()
+
+    return member.capacity.lower() if member and member.capacity else None
+
+
+def get_user_capacity(user_id, org_id, request_only=False):
+    """
+    Returns the capacity (e.g. 'admin', 'editor' or 'member') of a user in an organization.
+
+    The capacities are cached for the current request and, for MEMBER_CAPACITY_CACHE_TTL seconds,
+    for the rest of the requests of the process. The cache is cleared by the member signals
+    (see `clear_user_capacities`), but only in the process that handles them, so the
+    authorization checks skip the cache of the process (`request_only`).
+
+    Args:
+        user_id (str): The id of the user.
+        org_id (str): The id or name of the organization.
+        request_only (bool, optional): Only use the cache of the current request. Defaults to False.
+
+    Returns:
+        str or None: The capacity in lower case, or None if the user is not an active member.
+    """
+    # The capacities not read from the cache of the process are kept apart in the request
+    request_cache = _get_request_cache()
+    if request_cache is not None:
+        for cached_key in ((user_id, org_id, True), (user_id, org_id, request_only)):
+            if cached_key in request_cache:
+                return request_cache[cached_key]
+
+    if request_only:
+        capacity = _query_user_capacity(user_id, org_id)
+        if request_cache is not None:
+            request_cache[(user_id, org_id, True)] = capacity
+        return capacity
+
+    key = (user_id, org_id)
+
+    now = time.monotonic()
+    with _capacities_lock:
+        cached = _capacities.get(key)
+        generation = _capacities_generation
+
+    if cached is not None and cached[1] > now:
+        capacity = cached[0]
+    else:
+        capacity = _query_user_capacity(user_id, org_id)
+        with _capacities_lock:
+            if generation == _capacities_generation:
+                if len(_capacities) >= MEMBER_CAPACITY_CACHE_SIZE:
+                    _capacities.clear()
+                _capacities[key] = (capacity, now + MEMBER_CAPACITY_CACHE_TTL)
+
+    if request_cache is not None:
+        request_cache[(user_id, org_id, False)] = capacity
+
+    return capacity
+
+
+def clear_user_capacities():
+    """
+    Clears the cached capacities of the process and of the current request.
+    """
+    global _capacities_generation
+
+    with _capacities_lock:
+        _capacities.clear()
+        _capacities_generation += 1
+
+    request_cache = _get_request_cache()
+    if request_cache is not None:
+        request_cache.clear()
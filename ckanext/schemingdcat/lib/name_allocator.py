@@ -0,0 +1,154 @@
+import re
+import uuid
+import logging
+
+from sqlalchemy import or_
+
+from ckan import model
+from ckan.lib.munge import munge_title_to_name
+from ckantoolkit import config
+
+from ckanext.schemingdcat.config import NAME_ALLOCATOR_BATCH_SIZE
+
+log = logging.getLogger(__name__)
+
+# Maximum number appended to a name with the 'number-sequence' append type
+MAX_NUMBER_APPENDED = 999
+# Characters appended to a name with the 'random-hex' append type
+RANDOM_HEX_CHARS = 5
+
+
+class NameAllocator:
+    """
+    Allocates unique dataset names (URL friendly) following the rules of
+    `HarvesterBase._gen_new_name` from ckanext-harvest.
+
+    The package names that share a prefix with the requested names are loaded
+    with a single query (`preload`) and kept in a set, together with the names
+    already handed out, so each name is allocated without querying the database
+    again.
+
+    Args:
+        append_type (str, optional): 'number-sequence' or 'random-hex'. Defaults to
+            the `ckanext.harvest.default_dataset_name_append` option.
+    """
+    def __init__(self, append_type=None):
+        """
+        Initialize NameAllocator with an empty name index.
+        """
+        if append_type is None:
+            append_type = config.get('ckanext.harvest.default_dataset_name_append', 'number-sequence')
+        if append_type not in ('number-sequence', 'random-hex'):
+            raise NotImplementedError('append_type cannot be %s' % append_type)
+
+        self.append_type = append_type
+        self.max_length = model.PACKAGE_NAME_MAX_LENGTH
+        self._append_max_chars = len(str(MAX_NUMBER_APPENDED)) if append_type == 'number-sequence' else RANDOM_HEX_CHARS
+        self._taken = set()
+        self._allocated = set()
+        self._loaded_prefixes = set()
+        self._counters = {}
+
+    def _get_ideal_name(self, title):
+        """
+        Returns the URL friendly name of a title (or name), truncated to the maximum length.
+        """
+        ideal_name = munge_title_to_name(title)
+        ideal_name = re.sub('-+', '-', ideal_name)
+        return ideal_name[:self.max_length]
+
+    def _get_prefix(self, ideal_name):
+        """
+        Returns the prefix shared by an ideal name and all the names derived from it.
+        """
+        return ideal_name[:self.max_length - self._append_max_chars]
+
+    def preload(self, titles):
+        """
+        Loads the existing package names for the prefixes of the given titles (or names).
+
+        Prefixes already loaded are skipped. The names are loaded with one query
+        per NAME_ALLOCATOR_BATCH_SIZE prefixes.
+
+        Args:
+            titles (iterable): Titles or names of the datasets to allocate.
+        """
+        prefixes = {self._get_prefix(self._get_ideal_name(title)) for title in titles if title}
+        prefixes = sorted(prefixes - self._loaded_prefixes)
+
+        for i in range(0, len(prefixes), NAME_ALLOCATOR_BATCH_SIZE):
+            batch = prefixes[i:i + NAME_ALLOCATOR_BATCH_SIZE]
+            query = model.Session.query(model.Package.name) \
+                .filter(or_(*[model.Package.name.ilike(u'%s%%' % prefix) for prefix in batch]))
+            self._taken.update(name for name, in query)
+            self._loaded_prefixes.update(batch)
+
+        log.debug('Name index loaded with %s names for %s prefixes', len(self._taken), len(self._loaded_prefixes))
+
+    def allocate(self, title, existing_name=None):
+        """
+        Returns a unique name based on a title (or name) and reserves it.
+
+        If the ideal name is taken, a number (or random hex characters) is appended,
+        continuing from the last number handed out for that name.
+
+        Args:
+            title (str): The title or name of the dataset.
+            existing_name (str, optional): The current name of the dataset, if it already
+                exists. It is kept if it is based on the ideal name.
+
+        Returns:
+            str: The unique name, or None if all the numbers are taken.
+        """
+        ideal_name = self._get_ideal_name(title)
+        prefix = self._get_prefix(ideal_name)
+        if prefix not in self._loaded_prefixes:
+            self.preload([ideal_name])
+
+        if existing_name == ideal_name:
+            name = ideal_name
+        elif ideal_name not in self._taken:
+            name = ideal_name
+        elif existing_name and existing_name.startswith(ideal_name):
+            # The existing dataset already has a name based on the ideal one
+            name = existing_name
+        elif self.append_type == 'number-sequence':
+            name = None
+            counter = self._counters.get(ideal_name, 0) + 1
+            while counter <= MAX_NUMBER_APPENDED:
+                candidate_name = ideal_name[:self.max_length - len(str(counter))] + str(counter)
+                if candidate_name not in self._taken:
+                    name = candidate_name
+                    break
+                counter += 1
+            self._counters[ideal_name] = counter
+            if name is None:
+                return None
+        else:
+            name = prefix + str(uuid.uuid4())[:RANDOM_HEX_CHARS]
+            while name in self._taken:
+                name = prefix + str(uuid.uuid4())[:RANDOM_HEX_CHARS]
+
+        self._taken.add(name)
+        self._allocated.add(name)
+        return name
+
+    def reserve(self, name):
+        """
+        Reserves a name provided by the remote source.
+
+        The name is kept as is unless it was already handed out by this allocator,
+        in which case a new unique name based on it is allocated.
+
+        Args:
+            name (str): The name of the dataset.
+
+        Returns:
+            str: The reserved name.
+        """
+        if name in self._allocated:
+            return self.allocate(name)
+
+        self._taken.add(name)
+        self._allocated.add(name)
+        return name
@@ -7,6 +7,8 @@ import ckan.logic.auth as auth
 
 from ckanext.harvest.utils import DATASET_TYPE_NAME as CKANEXT_HARVEST_DATASET_TYPE_NAME
 
+from ckanext.schemingdcat.lib.member_capacity import get_user_capacity
+
 log = logging.getLogger(__name__)
 
 _check_access = logic.check_access
@@ -39,15 +41,10 @@ def package_update(next_auth, context, data_dict=None):
             else:
                 org_id = data_dict.get("owner_org", package.owner_org)
                 if org_id is not None:
-                    # Using the schemingdcat_member_list action to obtain correct roles
-                    members = p.toolkit.get_action("schemingdcat_member_list")(
-                        data_dict={"id": org_id, "object_type": "user"}
-                    )
-                    #log.debug('members:%s', members)
-                    for member_id, _, role in members:
-                        if member_id == user.id and role.lower() == "admin":
-                            result["success"] = True
-                            break
+                    # Capacity of the user, cached for this request only, as other processes
+                    # do not see the membership changes that clear the cache of the process
+                    if get_user_capacity(user.id, org_id, request_only=True) == "admin":
+                        result["success"] = True
                     else:
                         result["msg"] = (
                             f"Only administrators of organization {org_id!r} are "
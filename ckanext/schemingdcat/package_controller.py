@@ -8,16 +8,104 @@ from ckanext.scheming.plugins import (
 
 import ckanext.schemingdcat.helpers as sdct_helpers
 from ckanext.schemingdcat.utils import remove_private_keys
+from ckanext.schemingdcat.lib.member_capacity import get_user_capacity
 
 import logging
 import sys
 import ast
+import re
+from functools import lru_cache
 
 FACET_OPERATOR_PARAM_NAME = '_facet_operator'
 FACET_SORT_PARAM_NAME = '_%s_sort'
 
+# Plain Solr field names allowed in 'fl' when there are private fields (no wildcards, aliases or functions)
+FL_FIELD_PATTERN = re.compile(r'^[A-Za-z0-9_\-\.]+$')
+# Stored serialised datasets of the search index
+STORED_DATASET_FIELDS = ('data_dict', 'validated_data_dict')
+
 log = logging.getLogger(__name__)
 
+# Index plans compiled from the expanded scheming schemas, by dataset type
+_index_plans = {}
+
+
+def get_index_plan(dataset_type):
+    """
+    Returns the index plan of a dataset type, compiled once from its scheming schema.
+
+    The plan maps each repeating subfield of the schema to the `extras_{field_name}__` prefix
+    of its flattened keys, so the schema is not walked for every indexed dataset. It is
+    compiled again if the schemas are reloaded.
+
+    Args:
+        dataset_type (str): The dataset type.
+
+    Returns:
+        dict: The index plan, or None if the dataset type has no scheming schema.
+    """
+    schema = SchemingDatasetsPlugin.instance._expanded_schemas.get(dataset_type)
+    if schema is None:
+        return None
+
+    index_plan = _index_plans.get(dataset_type)
+    if index_plan is None or index_plan['schema'] is not schema:
+        index_plan = {
+            'schema': schema,
+            'repeating_subfields': {
+                field['field_name']: 'extras_{field_name}__'.format(field_name=field['field_name'])
+                for field in schema['dataset_fields'] if 'repeating_subfields' in field
+            },
+        }
+        _index_plans[dataset_type] = index_plan
+
+    return index_plan
+
+
+@lru_cache(maxsize=8)
+def _compile_private_fields(private_fields):
+    """
+    Compiles the private fields once into the keys and `fl` prefixes excluded for the API.
+    """
+    extras_fields = tuple(f'extras_{field}' for field in private_fields)
+    return frozenset(private_fields + extras_fields), extras_fields
+
+
+def get_private_fields():
+    """
+    Returns the private fields of `ckanext.schemingdcat.api.private_fields`, compiled once.
+
+    Returns:
+        tuple: The set of private keys (including their `extras_` twins) and the tuple of
+            `extras_` prefixes excluded from the Solr `fl` projection.
+    """
+    private_fields = p.toolkit.config.get('ckanext.schemingdcat.api.private_fields', [])
+
+    # Ensure private_fields is a list of strings
+    if not isinstance(private_fields, list) or not all(isinstance(field, str) for field in private_fields):
+        private_fields = []
+
+    return _compile_private_fields(tuple(private_fields))
+
+
+def parse_stringified_list(value):
+    """
+    Parses a stringified list, trying JSON before the (slower) `ast.literal_eval`.
+
+    Args:
+        value (str): The stringified list, e.g. '["a", "b"]' or "['a', 'b']".
+
+    Returns:
+        list: The parsed value.
+
+    Raises:
+        ValueError, SyntaxError: If the value is not a valid list literal.
+    """
+    try:
+        return json.loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
 
 class PackageController():
 
@@ -53,7 +141,9 @@ class PackageController():
         Modifies search parameters before executing a search.
     
         This method adjusts the 'fq' (filter query) parameter based on the 'facet.field' value in the search parameters.
-        It also removes private fields from 'fl' parameters.
+        It also restricts the 'fl' parameter to plain field names that are not private, so Solr never
+        returns them (see `_clean_fl`). Without 'fl' the results are the stored `data_dict`, whose
+        private fields are removed by `after_dataset_search`.
     
         Args:
             search_params (dict): The search parameters to be modified. Expected to contain 'facet.field' and 'fq'.
@@ -64,18 +154,12 @@ class PackageController():
         Raises:
             Exception: Captures and logs any exception that occurs during the modification of search parameters.
         """
-        try:            
-            private_fields = p.toolkit.config.get('ckanext.schemingdcat.api.private_fields', [])
-            
-            # Ensure private_fields is a list of strings
-            if not isinstance(private_fields, list) or not all(isinstance(field, str) for field in private_fields):
-                private_fields = []
-
+        try:
             # Clean 'fl' parameter
             if 'fl' in search_params and search_params['fl'] is not None:
-                fl_fields = search_params['fl']
-                fl_fields = [field for field in fl_fields if field not in private_fields and not any(field.startswith(f'extras_{pf}') for pf in private_fields)]
-                search_params.update({'fl': fl_fields})
+                private_fields, extras_prefixes = get_private_fields()
+                if private_fields:
+                    search_params.update({'fl': self._clean_fl(search_params['fl'], private_fields, extras_prefixes)})
         
             facet_field = search_params.get('facet.field', '')
             #log.debug("facet.field: %s", facet_field)
@@ -101,33 +185,34 @@ class PackageController():
 
     def after_dataset_search(self, search_results, search_params):
         """
-        Process the search results after a search, efficiently removing private keys.
-    
+        Removes the private keys from the search results.
+
+        The stored `data_dict` and `validated_data_dict` keep the private fields, as `package_show`
+        may return the indexed `validated_data_dict`, so they are removed from the results here.
+
         Args:
             search_results (dict): The search results dictionary to be processed.
             search_params (dict): The search parameters used for the search.
-    
+
         Returns:
             dict: The processed search results dictionary with private keys removed from each result.
         """
         try:
-            private_fields = p.toolkit.config.get('ckanext.schemingdcat.api.private_fields', [])
-            
-            # Ensure private_fields is a list of strings
-            if not isinstance(private_fields, list) or not all(isinstance(field, str) for field in private_fields):
-                private_fields = []
-    
-            # Precompute the set of fields to remove, including 'extras_' prefixed fields
-            fields_to_remove = set(private_fields + [f"extras_{field}" for field in private_fields])
-    
-            # Process each result in the search results
+            private_fields, _ = get_private_fields()
+            if not private_fields:
+                return search_results
+
             for result in search_results.get('results', []):
-                for field in fields_to_remove:
-                    result.pop(field, None)  # Removes the field if it exists
-    
+                for field in private_fields.intersection(result):
+                    del result[field]
+                # Stored datasets requested with 'fl'
+                for field in STORED_DATASET_FIELDS:
+                    if field in result:
+                        result[field] = self._strip_private_fields(result[field], private_fields)
+
         except Exception as e:
             log.error("[after_dataset_search] Error: %s", e)
-    
+
         return search_results
 
     # CKAN < 2.10
@@ -136,25 +221,57 @@ class PackageController():
     
     def before_dataset_index(self, data_dict):
         """
-        Processes the data dictionary before dataset indexing.
-    
+        Processes the data dictionary before dataset indexing, in a single pass over its keys.
+
+        - Removes the `extras_*` and `res_extras_*` keys that contain empty lists or lists of empty strings.
+        - Converts stringified lists to actual lists (keys starting with `extras_`, `res_` and
+          the stored `data_dict` and `validated_data_dict` are excluded). JSON is tried first, then `ast.literal_eval`.
+        - Flattens the repeating subfields of the index plan of the dataset type (see
+          `_flatten_repeating_subfield`).
+        - Converts dict fields to JSON strings. Solr cannot index dict fields, which leads to
+          errors such as "missing required field" in CKAN 2.10.4 with Solr 9 (https://github.com/ckan/ckan/issues/8423,
+          https://github.com/ckan/ckan/issues/7750, https://github.com/ckan/ckan/issues/7730).
+        - The stored `data_dict` and `validated_data_dict` are kept untouched (with their private
+          fields, removed from the search results by `after_dataset_search`).
+
         Args:
             data_dict (dict): The data dictionary to be processed.
-    
+
         Returns:
             dict: The processed data dictionary.
         """
-        # Remove empty extras keys
-        data_dict = self.remove_empty_extras_keys(data_dict)
+        index_plan = get_index_plan(data_dict.get('type'))
+        repeating_subfields = index_plan['repeating_subfields'] if index_plan else {}
+        flattened_values = {}
 
-        # Convert stringified lists to actual lists
-        data_dict = self.convert_stringified_lists(data_dict)
+        for key, value in list(data_dict.items()):
+            if key in STORED_DATASET_FIELDS:
+                continue
 
-        # Flatten repeating subfields
-        data_dict = self.flatten_repeating_subfields(data_dict)
+            is_excluded = key.startswith('extras_') or key.startswith('res_')
 
-        # Convert dict fields to JSON strings to avoid errors in Solr 9
-        data_dict = self._before_index_dump_dicts(data_dict)
+            # Convert stringified lists to actual lists
+            if not is_excluded and isinstance(value, str) and value.startswith('[') and value.endswith(']'):
+                try:
+                    value = data_dict[key] = parse_stringified_list(value)
+                except (ValueError, SyntaxError) as e:
+                    log.error("Error converting stringified list for key '%s': %s", key, e)
+
+            if key in repeating_subfields:
+                if isinstance(value, list):
+                    self._flatten_repeating_subfield(repeating_subfields[key], value, flattened_values)
+                del data_dict[key]
+
+            elif isinstance(value, list):
+                # Remove empty extras keys
+                if (key.startswith('extras_') or key.startswith('res_extras_')) and all(not item.strip() for item in value if isinstance(item, str)):
+                    del data_dict[key]
+
+            elif isinstance(value, dict):
+                # Convert dict fields to JSON strings to avoid errors in Solr 9
+                data_dict[key] = json.dumps(value)
+
+        data_dict.update({key: ' '.join(values) for key, values in flattened_values.items()})
 
         return data_dict
 
@@ -209,67 +326,11 @@ class PackageController():
         return facet_titles
 
     # Additional methods
-    def convert_stringified_lists(self, data_dict):
-        """
-        Converts stringified lists in the data dictionary to actual lists.
-    
-        Args:
-            data_dict (dict): The data dictionary to be processed.
-    
-        Returns:
-            dict: The processed data dictionary with actual lists.
-    
-        This function iterates over the items in the data dictionary and converts
-        any stringified lists (strings that start with '[' and end with ']') into
-        actual lists. Keys that start with 'extras_', 'res_', or are 'validated_data_dict'
-        are excluded from this conversion.
-        """
-        # Excluded items
-        excluded_keys = [
-            key for key in data_dict 
-            if key.startswith('extras_') or key.startswith('res_') or key == 'validated_data_dict'
-        ]
-    
-        # Filter data dictionary
-        filter_data_dict = {
-            key: value for key, value in data_dict.items()
-            if key not in excluded_keys
-        }
-    
-        for key, value in filter_data_dict.items():
-            if isinstance(value, str) and value.startswith('[') and value.endswith(']'):
-                try:
-                    data_dict[key] = ast.literal_eval(value)
-                except (ValueError, SyntaxError) as e:
-                    log.error("Error converting stringified list for key '%s': %s", key, e)
-    
-        return data_dict
-    
-    def remove_empty_extras_keys(self, data_dict):
-        """
-        Remove extra_* and res_extras_* keys that contain empty lists or lists of empty strings.
-
-        Args:
-            data_dict (dict): The data dictionary to be processed.
-
-        Returns:
-            dict: The processed data dictionary with empty extras keys removed.
-        """
-        keys_to_remove = []
-        for key, value in data_dict.items():
-            if (key.startswith('extras_') or key.startswith('res_extras_')) and isinstance(value, list):
-                if all(not item.strip() for item in value if isinstance(item, str)):
-                    keys_to_remove.append(key)
-
-        for key in keys_to_remove:
-            data_dict.pop(key, None)
-
-        return data_dict
-    
-    def flatten_repeating_subfields(self, data_dict):
+    @staticmethod
+    def _flatten_repeating_subfield(prefix, items, flattened_values):
         """
         Based on https://github.com/ckan/ckanext-scheming/pull/414
-        
+
         Notes:
             Index suitable repeating dataset fields in before_dataset_index to prevent failures
             on unmodified solr schema. This will allow hitting results in most text and list
@@ -279,69 +340,80 @@ class PackageController():
             `extras_{field_name}__{key}`,a text Solr field that will allow free-text search on
             its value. Again, if you require more precise handling of a particular subfield,
             you will need to customize the Solr schema to add particular fields needed.
-    
+
         Args:
-            data_dict (dict): The data dictionary to be processed.
-    
+            prefix (str): The `extras_{field_name}__` prefix of the flattened keys.
+            items (list): The values (dicts) of the repeating field.
+            flattened_values (dict): The values of each flattened key, joined with spaces by the caller.
+        """
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            for key, value in item.items():
+                if isinstance(value, dict):
+                    continue
+                if isinstance(value, list):
+                    value = ' '.join(str(v) for v in value)
+                flattened_values.setdefault(prefix + key, []).append(str(value))
+
+    @staticmethod
+    def _clean_fl(fl_fields, private_fields, extras_prefixes):
+        """
+        Restricts the Solr field list to plain field names that are not private.
+
+        The entries may hold several fields separated by spaces or commas. Wildcards (e.g. `*` or
+        `extras_*`), aliases, functions and transformers are removed, as they could return private fields.
+
+        Args:
+            fl_fields (list or str): The 'fl' parameter of the search.
+            private_fields (frozenset): The private keys, including their `extras_` twins.
+            extras_prefixes (tuple): The `extras_` prefixes of the private fields.
+
         Returns:
-            dict: The processed data dictionary with flattened repeating subfields.
+            list: The allowed field names.
         """
-        schemas = SchemingDatasetsPlugin.instance._expanded_schemas
-        if data_dict['type'] not in schemas:
-            return data_dict
-    
-        schema = schemas[data_dict['type']]
-    
-        for field in schema['dataset_fields']:
-            if field['field_name'] in data_dict and 'repeating_subfields' in field:
-                flattened_values = {}
-                for item in data_dict[field['field_name']]:
-                    for key, value in item.items():
-                        if isinstance(value, dict):
-                            continue
-                        if isinstance(value, list):
-                            value = ' '.join(value)
-                        new_key = 'extras_{field_name}__{key}'.format(
-                            field_name=field["field_name"], key=key
-                        )
-                        if new_key not in flattened_values:
-                            flattened_values[new_key] =  str(value)
-                        else:
-                            flattened_values[new_key] += ' ' + str(value)
-    
-                data_dict.update(flattened_values)
-                data_dict.pop(field['field_name'], None)
-    
-        return data_dict
+        if isinstance(fl_fields, str):
+            fl_fields = [fl_fields]
+
+        allowed_fields = []
+        for entry in fl_fields:
+            for field in re.split(r'[\s,]+', str(entry)):
+                if not field:
+                    continue
+                if FL_FIELD_PATTERN.match(field) and field not in private_fields and not field.startswith(extras_prefixes):
+                    allowed_fields.append(field)
+                else:
+                    log.debug("[before_dataset_search] Field '%s' removed from 'fl'", field)
+
+        return allowed_fields
 
-    def _before_index_dump_dicts(self, data_dict):
+    @staticmethod
+    def _strip_private_fields(stored_dict, private_fields):
         """
-        Converts dict fields in the data dictionary to JSON strings.
-    
-        This function is necessary to ensure that all fields in the data dictionary
-        can be indexed by Solr. Solr cannot directly index fields of type dict, 
-        which can lead to errors such as "missing required field" even when the 
-        field is present in the data dictionary. By converting dict fields to JSON 
-        strings, we ensure that the data is in a format that Solr can handle.
-    
-        This issue (https://github.com/ckan/ckan/issues/8423) has been observed in CKAN versions 2.10.4 and Solr 9, where 
-        attempts to upload resources to the Datastore resulted in errors due to 
-        the presence of dict fields in the data dictionary. The solution involves 
-        transforming these fields into strings before indexing, as discussed in 
-        the following issues:
-        - CKAN - Custom plugin/theme error datastore using fluent presets https://github.com/ckan/ckan/issues/7750
-        - Solr error: missing required field https://github.com/ckan/ckan/issues/7730
-    
+        Removes the private fields from a JSON serialised dataset stored in the search index.
+
+        The dataset is only parsed if the serialised string contains one of the private keys.
+
         Args:
-            data_dict (dict): The data dictionary to be processed.
-    
+            stored_dict (str): The JSON serialised dataset.
+            private_fields (frozenset): The private keys to remove.
+
         Returns:
-            dict: The processed data dictionary with dict fields as JSON strings.
+            str: The JSON serialised dataset without private fields.
         """
-        for key, value in data_dict.items():
-            if isinstance(value, dict):
-                data_dict[key] = json.dumps(value)
-        return data_dict
+        if not isinstance(stored_dict, str) or not any(f'"{field}"' in stored_dict for field in private_fields):
+            return stored_dict
+
+        try:
+            dataset_dict = json.loads(stored_dict)
+        except ValueError as e:
+            log.error("Error removing the private fields of the indexed dataset: %s", e)
+            return stored_dict
+
+        for field in private_fields:
+            dataset_dict.pop(field, None)
+
+        return json.dumps(dataset_dict)
 
     def package_controller_config(self, default_facet_operator):
         self.default_facet_operator = default_facet_operator
@@ -415,12 +487,8 @@ class PackageController():
             if data_dict is not None:
                 org_id = data_dict.get("owner_org")
                 if org_id is not None:
-                    members = p.toolkit.get_action("schemingdcat_member_list")(
-                        data_dict={"id": org_id, "object_type": "user"}
-                    )
-                    for member_id, _, role in members:
-                        if member_id == user.id and role.lower() in private_fields_roles:
-                            return data_dict
+                    if get_user_capacity(user.id, org_id) in private_fields_roles:
+                        return data_dict
                     data_dict = remove_private_keys(data_dict)
                 else:
                     data_dict = remove_private_keys(data_dict)
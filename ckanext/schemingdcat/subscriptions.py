@@ -12,6 +12,7 @@ from ckanext.schemingdcat.config import (
     DCAT_AP_DATASTORE_DATASERVICE
 )
 from ckanext.schemingdcat.helpers import schemingdcat_get_ckan_site_url
+from ckanext.schemingdcat.lib.member_capacity import clear_user_capacities
 
 log = logging.getLogger(__name__)
 
@@ -35,6 +36,21 @@ def get_subscriptions():
             {"sender": "organization_update", "receiver": schemingdcat_stats_changed},
             {"sender": "organization_delete", "receiver": schemingdcat_stats_changed},
             {"sender": "datastore_create", "receiver": schemingdcat_update_dcat_dataservice},
+            {"sender": "harvest_jobs_run", "receiver": schemingdcat_harvest_jobs_run},
+            {"sender": "member_create", "receiver": schemingdcat_members_changed},
+            {"sender": "member_delete", "receiver": schemingdcat_members_changed},
+            {"sender": "organization_member_create", "receiver": schemingdcat_members_changed},
+            {"sender": "organization_member_delete", "receiver": schemingdcat_members_changed},
+            {"sender": "group_member_create", "receiver": schemingdcat_members_changed},
+            {"sender": "group_member_delete", "receiver": schemingdcat_members_changed},
+            # The update and patch of an organization/group with a users list replace its members
+            {"sender": "organization_update", "receiver": schemingdcat_members_changed},
+            {"sender": "organization_patch", "receiver": schemingdcat_members_changed},
+            {"sender": "group_update", "receiver": schemingdcat_members_changed},
+            {"sender": "group_patch", "receiver": schemingdcat_members_changed},
+            {"sender": "organization_delete", "receiver": schemingdcat_members_changed},
+            {"sender": "organization_purge", "receiver": schemingdcat_members_changed},
+            {"sender": "user_delete", "receiver": schemingdcat_members_changed},
         ]
     }
     
@@ -55,6 +71,33 @@ def schemingdcat_stats_changed(sender: str, **kwargs: Any):
     except Exception as e:
         log.error(f"Failed to Update Open Data site statistics: {e}")
 
+def schemingdcat_harvest_jobs_run(sender: str, **kwargs: Any):
+    """
+    Handles the event when the harvest jobs are run and indexes the packages imported in batch
+    mode (`import_batch_size`) by the finished jobs that are not indexed yet.
+
+    Args:
+        sender (str): The name of the sender that triggered the event.
+        **kwargs (Any): Additional keyword arguments passed to the function.
+    """
+    from ckanext.schemingdcat.harvesters.base import index_finished_jobs_packages
+
+    try:
+        index_finished_jobs_packages()
+    except Exception as e:
+        log.error(f"[{sender}] -> Error indexing the packages of the finished harvest jobs: {e}")
+
+def schemingdcat_members_changed(sender: str, **kwargs: Any):
+    """
+    Handles the event when the members of an organization change and clears the cached capacities of the users.
+
+    Args:
+        sender (str): The name of the sender that triggered the event.
+        **kwargs (Any): Additional keyword arguments passed to the function.
+    """
+    log.debug(f"[{sender}] -> Clear the cached organization capacities")
+    clear_user_capacities()
+
 def schemingdcat_update_dcat_dataservice(sender: str, **kwargs: Any):
     """
     Handles the event when a datastore is created and updates the DCAT dataservice.
@@ -48,4 +48,11 @@ def test_download_rdf_eu_vocabs():
     runner = CliRunner()
     result = runner.invoke(schemingdcat, ["download-rdf-eu-vocabs"])
     assert result.exit_code == 0
-    assert "Downloading EU Vocabularies..." in result.output
\ No newline at end of file
+    assert "Downloading EU Vocabularies..." in result.output
+
+
+def test_search_index_nothing_to_index():
+    runner = CliRunner()
+    result = runner.invoke(schemingdcat, ["search-index", "--since", "2999-01-01"])
+    assert result.exit_code == 0
+    assert "No datasets to index." in result.output
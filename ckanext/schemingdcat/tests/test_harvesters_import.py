@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Third-party modules that only the harvest stages need
+HEAVY_MODULES = ['pandas', 'gspread', 'psycopg2', 'owslib', 'saxonche', 'shapely', 'lxml', 'rdflib']
+
+# Imports a harvester entry point in a clean interpreter and reports the heavy
+# modules it loads (not the ones already loaded by CKAN).
+IMPORT_SCRIPT = '''
+import json, sys
+
+import ckan.plugins
+
+loaded = set(sys.modules)
+import ckanext.schemingdcat.harvesters as harvesters
+if {name!r}:
+    getattr(harvesters, {name!r})
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules and m not in loaded)))
+'''
+
+
+def get_loaded_heavy_modules(name=None):
+    output = subprocess.check_output(
+        [sys.executable, '-c', IMPORT_SCRIPT.format(name=name, heavy=HEAVY_MODULES)]
+    )
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+class TestHarvestersImport:
+
+    def test_package_import_does_not_load_harvesters(self):
+        assert get_loaded_heavy_modules() == []
+
+    @pytest.mark.parametrize('name, allowed_modules', [
+        ('SchemingDCATCKANHarvester', []),
+        ('SchemingDCATXLSHarvester', []),
+        ('SchemingDCATPostgresHarvester', []),
+        ('SchemingDCATSQLiteHarvester', []),
+        # OWSLib and lxml are imported by the ckanext-spatial base class, rdflib by the
+        # ckanext-dcat RDF parser
+        ('SchemingDCATCSWHarvester', ['owslib', 'lxml', 'rdflib']),
+    ])
+    def test_harvester_entry_point_does_not_load_heavy_modules(self, name, allowed_modules):
+        modules = get_loaded_heavy_modules(name)
+        assert [m for m in modules if m not in allowed_modules] == []
@@ -0,0 +1,159 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ckan.plugins as p
+from ckanext.scheming.plugins import SchemingDatasetsPlugin
+
+from ckanext.schemingdcat.package_controller import PackageController, parse_stringified_list, _compile_private_fields
+
+# Dataset schema with repeating subfields (contact, publisher and creator)
+REPEATING_SUBFIELDS_SCHEMA = {
+    'dataset_fields': [
+        {'field_name': 'title'},
+        {'field_name': 'theme'},
+        {'field_name': 'contact', 'repeating_subfields': [{'field_name': 'name'}, {'field_name': 'email'}, {'field_name': 'roles'}]},
+        {'field_name': 'publisher', 'repeating_subfields': [{'field_name': 'name'}]},
+        {'field_name': 'creator', 'repeating_subfields': [{'field_name': 'name'}]},
+    ],
+}
+
+
+class TestBeforeDatasetIndex:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('["a", "b"]', ['a', 'b']),
+        ("['a', 'b']", ['a', 'b']),
+        ('[]', []),
+    ])
+    def test_parse_stringified_list(self, value, expected):
+        assert parse_stringified_list(value) == expected
+
+    def test_parse_stringified_list_invalid(self):
+        with pytest.raises((ValueError, SyntaxError)):
+            parse_stringified_list('[a, b')
+
+    def test_before_dataset_index(self, monkeypatch):
+        monkeypatch.setattr(SchemingDatasetsPlugin, 'instance', SimpleNamespace(
+            _expanded_schemas={'dataset': REPEATING_SUBFIELDS_SCHEMA}
+        ), raising=False)
+        stored_dict = json.dumps({'name': 'dataset'})
+
+        index_dict = PackageController().before_dataset_index({
+            'id': 'dataset-id',
+            'type': 'dataset',
+            'title': 'Dataset',
+            'data_dict': stored_dict,
+            'validated_data_dict': stored_dict,
+            'extras_empty': ['', ' '],
+            'res_extras_empty': [],
+            'extras_keywords': ['a', ''],
+            'extras_stringified': '["x"]',
+            'res_format': '["CSV"]',
+            'theme': '["http://example.com/a", "http://example.com/b"]',
+            'tags_list': "['a', 'b']",
+            'flags': '["a", true, null]',
+            'invalid': '[a, b]',
+            'contact': [
+                {'name': 'Alice', 'email': 'alice@example.com', 'roles': ['author', 'editor'], 'address': {'city': 'Madrid'}},
+                {'name': 'Bob'},
+            ],
+            'publisher': '[{"name": "Org"}]',
+            'creator': 'Carol',
+            'spatial_resolution': {'value': 1},
+        })
+
+        # The result of the previous four passes (empty extras, stringified lists, repeating
+        # subfields and dicts), except for the JSON literals and the repeating field that is
+        # not a list (see below)
+        assert index_dict == {
+            'id': 'dataset-id',
+            'type': 'dataset',
+            'title': 'Dataset',
+            'data_dict': stored_dict,
+            'validated_data_dict': stored_dict,
+            'extras_keywords': ['a', ''],
+            'extras_stringified': '["x"]',
+            'res_format': '["CSV"]',
+            'theme': ['http://example.com/a', 'http://example.com/b'],
+            'tags_list': ['a', 'b'],
+            # JSON true/null are now parsed (ast.literal_eval left the string)
+            'flags': ['a', True, None],
+            'invalid': '[a, b]',
+            'extras_contact__name': 'Alice Bob',
+            'extras_contact__email': 'alice@example.com',
+            'extras_contact__roles': 'author editor',
+            'extras_publisher__name': 'Org',
+            # The repeating field 'creator' is dropped, as it is not a list (it used to fail)
+            'spatial_resolution': '{"value": 1}',
+        }
+
+    def test_flatten_repeating_subfield(self):
+        flattened_values = {}
+        PackageController._flatten_repeating_subfield('extras_contact__', [
+            {'name': 'Alice', 'email': 'alice@example.com', 'roles': ['author', 'editor'], 'address': {'city': 'Madrid'}},
+            {'name': 'Bob'},
+        ], flattened_values)
+
+        assert flattened_values == {
+            'extras_contact__name': ['Alice', 'Bob'],
+            'extras_contact__email': ['alice@example.com'],
+            'extras_contact__roles': ['author editor'],
+        }
+
+    def test_strip_private_fields(self):
+        private_fields, extras_prefixes = _compile_private_fields(('contact_email',))
+        stored_dict = json.dumps({'name': 'dataset', 'contact_email': 'alice@example.com', 'extras_contact_email': 'alice@example.com'})
+
+        assert extras_prefixes == ('extras_contact_email',)
+        assert json.loads(PackageController._strip_private_fields(stored_dict, private_fields)) == {'name': 'dataset'}
+
+    def test_strip_private_fields_not_present(self):
+        private_fields, _ = _compile_private_fields(('contact_email',))
+        stored_dict = json.dumps({'name': 'dataset'})
+
+        assert PackageController._strip_private_fields(stored_dict, private_fields) is stored_dict
+
+
+@pytest.mark.usefixtures("with_plugins")
+class TestPrivateFields:
+
+    @pytest.fixture(autouse=True)
+    def private_fields(self, monkeypatch):
+        monkeypatch.setitem(p.toolkit.config, 'ckanext.schemingdcat.api.private_fields', ['contact_email'])
+
+    def test_index_and_search(self):
+        dataset_dict = {'id': 'dataset-id', 'name': 'dataset', 'type': 'dataset', 'contact_email': 'alice@example.com'}
+        index_dict = PackageController().before_dataset_index({
+            'id': 'dataset-id',
+            'type': 'dataset',
+            'extras_contact_email': 'alice@example.com',
+            'data_dict': json.dumps(dataset_dict),
+            'validated_data_dict': json.dumps(dataset_dict),
+        })
+
+        # package_show may return the indexed validated_data_dict, so it keeps the private fields
+        assert json.loads(index_dict['validated_data_dict']) == dataset_dict
+
+        search_params = PackageController().before_dataset_search({
+            'q': '*:*',
+            'fl': ['id name', 'extras_contact_email', 'contact_email', '*', 'extras_*', 'extras_con*', 'email:extras_contact_email'],
+        })
+
+        assert search_params['fl'] == ['id', 'name']
+
+        search_results = PackageController().after_dataset_search({'results': [json.loads(index_dict['data_dict'])]}, search_params)
+
+        assert 'contact_email' not in search_results['results'][0]
+
+    def test_after_dataset_search_removes_private_fields(self):
+        search_results = PackageController().after_dataset_search({
+            'results': [
+                {'name': 'dataset', 'contact_email': 'alice@example.com', 'extras_contact_email': 'alice@example.com'},
+                {'data_dict': json.dumps({'name': 'dataset', 'contact_email': 'alice@example.com'})},
+            ]
+        }, {})
+
+        assert search_results['results'][0] == {'name': 'dataset'}
+        assert json.loads(search_results['results'][1]['data_dict']) == {'name': 'dataset'}
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+
+import pytest
+
+from ckantoolkit import config
+
+from ckanext.schemingdcat.harvesters.sql.sqlite import SchemingDCATSQLiteHarvester, SqliteDatabaseManager, SQLITE_BASE_PATH_CONFIG
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db_path = tmp_path / 'catalogue.sqlite'
+    connection = sqlite3.connect(str(db_path))
+    connection.execute('CREATE TABLE datasets (id TEXT PRIMARY KEY, title TEXT, modified INTEGER)')
+    connection.execute('CREATE TABLE distributions (id TEXT PRIMARY KEY, dataset_id TEXT, url TEXT)')
+    connection.executemany('INSERT INTO datasets VALUES (?, ?, ?)', [('ds-%s' % i, 'Dataset %s' % i, i) for i in range(25)])
+    connection.executemany('INSERT INTO distributions VALUES (?, ?, ?)', [('dr-%s' % i, 'ds-%s' % i, 'http://example.com/%s' % i) for i in range(25)])
+    connection.commit()
+    connection.close()
+    return db_path
+
+
+class TestSqliteDatabaseManager:
+
+    def test_execute_query_chunks(self, sqlite_db):
+        db_manager = SqliteDatabaseManager()
+        db_manager.connect('file:%s?mode=ro' % sqlite_db)
+
+        chunks = list(db_manager.execute_query_chunks('SELECT id, title FROM main.datasets', chunk_size=10))
+        db_manager.disconnect()
+
+        assert [len(rows) for rows, _ in chunks] == [10, 10, 5]
+        assert chunks[0][1] == ['id', 'title']
+
+    def test_connection_is_read_only(self, sqlite_db):
+        db_manager = SqliteDatabaseManager()
+        db_manager.connect('file:%s?mode=ro' % sqlite_db)
+
+        with pytest.raises(ValueError):
+            db_manager.execute_query("DELETE FROM main.datasets")
+        db_manager.disconnect()
+
+    def test_missing_database(self, tmp_path):
+        with pytest.raises(ValueError):
+            SqliteDatabaseManager().connect('file:%s?mode=ro' % (tmp_path / 'missing.sqlite'))
+
+
+class TestSchemingDCATSQLiteHarvester:
+
+    def test_build_query(self, sqlite_db):
+        harvester = SchemingDCATSQLiteHarvester()
+        query = harvester._build_query({
+            'identifier': {'field_name': 'main.datasets.id'},
+            'title_translated': {'languages': {'en': {'field_name': 'main.datasets.title'}}},
+        }, where="main.datasets.modified > 20")
+
+        harvester.db_manager.connect('file:%s?mode=ro' % sqlite_db)
+        results, column_names = harvester.db_manager.execute_query(query)
+        harvester.db_manager.disconnect()
+
+        assert column_names == ['identifier', 'title_translated-en']
+        assert sorted(row[0] for row in results) == ['ds-21', 'ds-22', 'ds-23', 'ds-24']
+
+    def test_get_db_path(self, sqlite_db, monkeypatch):
+        monkeypatch.setitem(config, SQLITE_BASE_PATH_CONFIG, str(sqlite_db.parent))
+        harvester = SchemingDCATSQLiteHarvester()
+
+        assert harvester._get_db_path('catalogue.sqlite') == os.path.realpath(sqlite_db)
+        assert harvester._get_db_path('file://%s' % sqlite_db) == os.path.realpath(sqlite_db)
+
+    @pytest.mark.parametrize('source_url', ['/etc/passwd', '../catalogue.sqlite', 'file:///etc/passwd'])
+    def test_get_db_path_outside_base_path(self, sqlite_db, monkeypatch, source_url):
+        monkeypatch.setitem(config, SQLITE_BASE_PATH_CONFIG, str(sqlite_db.parent))
+
+        with pytest.raises(ValueError):
+            SchemingDCATSQLiteHarvester()._get_db_path(source_url)
+
+    def test_get_db_path_without_base_path(self, sqlite_db, monkeypatch):
+        monkeypatch.delitem(config, SQLITE_BASE_PATH_CONFIG, raising=False)
+
+        with pytest.raises(ValueError):
+            SchemingDCATSQLiteHarvester()._get_db_path(str(sqlite_db))
@@ -38,6 +38,7 @@ setup(
         schemingdcat_ckan_harvester=ckanext.schemingdcat.harvesters:SchemingDCATCKANHarvester
         schemingdcat_xls_harvester=ckanext.schemingdcat.harvesters:SchemingDCATXLSHarvester
         schemingdcat_postgres_harvester=ckanext.schemingdcat.harvesters:SchemingDCATPostgresHarvester
+        schemingdcat_sqlite_harvester=ckanext.schemingdcat.harvesters:SchemingDCATSQLiteHarvester
         schemingdcat_csw_harvester=ckanext.schemingdcat.harvesters:SchemingDCATCSWHarvester
         #schemingdcat_ows_harvester=ckanext.schemingdcat.harvesters:SchemingDCATOWSHarvester     
         